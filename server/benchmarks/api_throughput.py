@@ -0,0 +1,82 @@
+"""Drive the full API in-process against the in-memory backend and report request rates.
+
+No server or MongoDB is needed: requests go through the ASGI app (middleware, routing,
+validation, caches) directly, so the numbers show the API's own overhead per request.
+
+Usage (from the server directory):
+    python -m benchmarks.api_throughput --objects 1000 --concurrency 64 --seconds 5
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from main import app
+from src.basemodels.admin_base_models import AdmissionLimitsUpdate
+from src.db import get_db
+from src.metrics import Histogram
+from src.middleware.admission import admission
+from src.repository import InMemoryDatabase
+
+
+async def setup(client: httpx.AsyncClient, objects: int) -> list:
+    """Create a schema and ``objects`` objects, returning their ids."""
+    schema = {"schema_name": "SIM-bench", "fields": {"environment": {"type": "str", "enum": ["Dev_1", "Dev_2"]}}}
+    schema_id = (await client.post("/schemas/", json=schema)).json()["_id"]
+    ids = []
+    for i in range(objects):
+        body = {"schema_id": schema_id, "fields": {"environment": ["Dev_1", "Dev_2"][i % 2]}}
+        ids.append((await client.post("/objects/", json=body)).json()["_id"])
+    return ids
+
+
+async def worker(client: httpx.AsyncClient, ids: list, deadline: float, latencies: dict, holder: str):
+    while time.perf_counter() < deadline:
+        object_id = random.choice(ids)
+        for name, method, path, body in (
+            ("read", "GET", f"/objects/{object_id}", None),
+            ("reserve", "POST", f"/objects/{object_id}/reserve", {"holder": holder}),
+            ("release", "POST", f"/objects/{object_id}/release", {"holder": holder}),
+        ):
+            started = time.perf_counter()
+            await client.request(method, path, json=body)
+            latencies[name].observe(time.perf_counter() - started)
+
+
+async def run(objects: int, concurrency: int, seconds: float) -> dict:
+    db = InMemoryDatabase()
+
+    async def override_get_db():
+        yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    # One process generates all the load, so per-client rate limits would only measure the limiter
+    admission.update(AdmissionLimitsUpdate(rate_per_second=1e9, burst=10 ** 9))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        ids = await setup(client, objects)
+        latencies = {name: Histogram() for name in ("read", "reserve", "release")}
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(worker(client, ids, deadline, latencies, f"w{i}") for i in range(concurrency)))
+
+    return {
+        name: {"requests_per_second": round(histogram.count / seconds), **histogram.report()}
+        for name, histogram in latencies.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.objects, args.concurrency, args.seconds)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
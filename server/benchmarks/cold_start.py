@@ -0,0 +1,88 @@
+"""Measure how long a fresh API process takes to serve its first requests.
+
+Starts the API in a subprocess against a running MongoDB and records the time until the
+first response of any kind, until /ready reports warm-up is done, and the latency of the
+first object creation for each schema.
+
+Usage (from the server directory):
+    python -m benchmarks.cold_start --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for(client: httpx.Client, path: str, started: float, timeout: float, expect_ok: bool) -> float:
+    """Poll ``path`` until it responds (successfully, if ``expect_ok``), returning seconds since ``started``."""
+    while time.perf_counter() - started < timeout:
+        try:
+            response = client.get(path)
+            if not expect_ok or response.status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"{path} did not respond within {timeout} seconds")
+
+
+def first_creates(client: httpx.Client) -> list:
+    """Create one object per schema that has a string-only example, returning each request's latency."""
+    latencies = []
+    for schema in client.get("/schemas/").json():
+        fields = schema["fields"]
+        if not all(field.get("type", "str") == "str" and not field.get("regex") for field in fields.values()):
+            continue
+        body = {"schema_id": schema["_id"],
+                "fields": {name: (field.get("enum") or ["x"])[0] for name, field in fields.items()}}
+        started = time.perf_counter()
+        client.post("/objects/", json=body)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def run_once(port: int, timeout: float) -> dict:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=SERVER_DIR
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            first_response = wait_for(client, "/ready", started, timeout, expect_ok=False)
+            ready = wait_for(client, "/ready", started, timeout, expect_ok=True)
+            creates = first_creates(client)
+        return {
+            "first_response_s": first_response,
+            "ready_s": ready,
+            "first_create_max_s": max(creates) if creates else None,
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    runs = [run_once(args.port, args.timeout) for _ in range(args.runs)]
+    summary = {
+        key: statistics.median(run[key] for run in runs if run[key] is not None)
+        for key in runs[0] if any(run[key] is not None for run in runs)
+    }
+    print(json.dumps({"runs": runs, "median": summary}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Measure how much object validation delays other work on the event loop.
+
+Creates objects of a schema with many regex-constrained fields, validated inline (on the
+event loop), on the thread pool and on the process pool in turn. Meanwhile a probe task
+asks to wake every ``--interval`` seconds and records how late it actually wakes up; that
+lateness is what every other request on the worker waits on top of its own work.
+
+Usage (from the server directory):
+    python -m benchmarks.event_loop_lag --fields 200 --requests 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from main import app
+from src import validation
+from src.basemodels.admin_base_models import AdmissionLimitsUpdate
+from src.db import get_db
+from src.metrics import Histogram
+from src.middleware.admission import admission
+from src.repository import InMemoryDatabase
+
+MODES = ("inline", "thread", "process")
+
+
+async def probe(interval: float, lag: Histogram, stop: asyncio.Event):
+    """Record how late the event loop wakes a task that sleeps for ``interval`` seconds."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag.observe(max(0.0, time.perf_counter() - started - interval))
+
+
+async def run_mode(client: httpx.AsyncClient, mode: str, fields: int, requests: int, concurrency: int,
+                   interval: float) -> dict:
+    definitions = {f"f{i}": {"type": "str", "regex": r"^(?:[a-z0-9]+[-_.]?)*[a-z0-9]+@example\.com$"}
+                   for i in range(fields)}
+    schema = {"schema_name": f"lag-{mode}", "validation": mode, "fields": definitions}
+    schema_id = (await client.post("/schemas/", json=schema)).json()["_id"]
+    body = {"schema_id": schema_id, "fields": {name: f"user.{i}-name_{i}@example.com" for i, name in enumerate(definitions)}}
+    # The first request compiles the model (and, for processes, starts the pool); keep it out of the measurement
+    await client.post("/objects/", json=body)
+
+    lag, latency = Histogram(), Histogram()
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(interval, lag, stop))
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.post("/objects/", json=body)
+            response.raise_for_status()
+            latency.observe(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+    return {
+        "requests_per_second": round(requests / elapsed, 1),
+        "loop_lag": lag.report(),
+        "request_latency": latency.report(),
+    }
+
+
+async def run(fields: int, requests: int, concurrency: int, interval: float) -> dict:
+    db = InMemoryDatabase()
+
+    async def override_get_db():
+        yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    admission.update(AdmissionLimitsUpdate(rate_per_second=1e9, burst=10 ** 9))
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return {mode: await run_mode(client, mode, fields, requests, concurrency, interval) for mode in MODES}
+    finally:
+        validation.shutdown_pools()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fields", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--interval", type=float, default=0.005)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.fields, args.requests, args.concurrency, args.interval)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Measure object search latency on a large schema.
+
+Loads ``--objects`` SIMs with random MSISDNs and IMSIs straight into the repository (and
+the n-gram side index), then times searches through the API: prefix searches served by the
+field's index, substring searches served by the n-gram index, and for comparison the
+unindexed way, a regex over every object of the schema.
+
+Runs against MongoDB at ``--mongo-uri`` (``MONGO_URI`` by default), in a scratch database
+dropped afterwards, since that is where the field indexes serve prefix searches. ``--memory``
+uses the in-memory backend instead; it has no range scans, so its prefix search figures are
+full scans of the schema's objects and only the substring figures are meaningful. The
+backend is reported with the results.
+
+Usage (from the server directory):
+    python -m benchmarks.search_latency --objects 1000000 --searches 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime
+
+import httpx
+from bson import ObjectId
+
+from main import app
+from src import search
+from src.basemodels.admin_base_models import AdmissionLimitsUpdate
+from src.db import get_db
+from src.metrics import Histogram
+from src.middleware.admission import admission
+from src.repository import InMemoryDatabase, MongoDatabase
+
+LOAD_CHUNK_SIZE = 10000
+
+
+async def load(db, client: httpx.AsyncClient, objects: int) -> dict:
+    """Create a SIM schema with searchable msisdn and imsi fields and ``objects`` objects of it."""
+    fields = {"msisdn": {"type": "str", "searchable": True}, "imsi": {"type": "str", "searchable": True}}
+    schema_id = (await client.post("/schemas/", json={"schema_name": "SIM-search", "fields": fields})).json()["_id"]
+    schema = await db.schemas.find_one({"_id": ObjectId(schema_id)})
+    now = datetime.now()
+    for start in range(0, objects, LOAD_CHUNK_SIZE):
+        chunk = [{
+            "schema_id": schema_id,
+            "fields": {"msisdn": f"44{random.randrange(10 ** 9):09d}", "imsi": f"23430{random.randrange(10 ** 10):010d}"},
+            "created_at": now,
+            "updated_at": now,
+        } for _ in range(min(LOAD_CHUNK_SIZE, objects - start))]
+        await db.objects.insert_many(chunk)
+        await search.index_objects(db, schema, chunk)
+    return schema
+
+
+async def timed(client: httpx.AsyncClient, searches: int, params) -> dict:
+    latency = Histogram()
+    results = 0
+    for _ in range(searches):
+        started = time.perf_counter()
+        response = await client.get("/objects/search", params=params())
+        response.raise_for_status()
+        latency.observe(time.perf_counter() - started)
+        results += len(response.json()["objects"])
+    return {"latency": latency.report(), "results_per_search": round(results / searches, 1)}
+
+
+async def timed_scan(db, schema_id: str, searches: int, limit: int) -> dict:
+    """Substring search without an index: an unanchored regex over every object of the schema."""
+    latency = Histogram()
+    for _ in range(searches):
+        term = re.escape(f"{random.randrange(10 ** 5):05d}")
+        started = time.perf_counter()
+        query = {"schema_id": schema_id, "fields.msisdn": {"$regex": term}}
+        [obj async for obj in db.objects.find(query, sort=[("_id", 1)], limit=limit)]
+        latency.observe(time.perf_counter() - started)
+    return {"latency": latency.report()}
+
+
+async def run(objects: int, searches: int, limit: int, mongo_uri: str = None) -> dict:
+    if mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        name = f"search-bench-{ObjectId()}"
+        mongo = AsyncIOMotorClient(mongo_uri)
+        db = MongoDatabase(mongo[name])
+    else:
+        db = InMemoryDatabase()
+
+    async def override_get_db():
+        yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    admission.update(AdmissionLimitsUpdate(rate_per_second=1e9, burst=10 ** 9))
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            started = time.perf_counter()
+            schema = await load(db, client, objects)
+            loaded = time.perf_counter() - started
+            schema_id = str(schema["_id"])
+
+            def prefix(digits: int):
+                return lambda: {"schema_id": schema_id, "field": "msisdn", "limit": limit,
+                                "prefix": f"44{random.randrange(10 ** digits):0{digits}d}"}
+
+            def contains(digits: int):
+                return lambda: {"schema_id": schema_id, "field": "msisdn", "limit": limit,
+                                "contains": f"{random.randrange(10 ** digits):0{digits}d}"}
+
+            return {
+                "backend": "mongodb" if mongo_uri else "memory (prefix searches are full scans)",
+                "objects": objects,
+                "load_seconds": round(loaded, 1),
+                "prefix_7_digits": await timed(client, searches, prefix(5)),
+                "prefix_4_digits": await timed(client, searches, prefix(2)),
+                "contains_5_digits": await timed(client, searches, contains(5)),
+                "contains_3_digits": await timed(client, searches, contains(3)),
+                "unindexed_contains_5_digits": await timed_scan(db, schema_id, searches, limit),
+            }
+    finally:
+        if mongo_uri:
+            await mongo.drop_database(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=1000000)
+    parser.add_argument("--searches", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--memory", action="store_true", help="use the in-memory backend instead of MongoDB")
+    args = parser.parse_args()
+    mongo_uri = None if args.memory else args.mongo_uri
+    print(json.dumps(asyncio.run(run(args.objects, args.searches, args.limit, mongo_uri)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,73 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 
+from src import validation
+from src.audit import audit
+from src.db import get_database
+from src.invalidation import channel
+from src.metrics import metrics
+from src.middleware.admission import AdmissionMiddleware, admission
+from src.middleware.compression import CompressionMiddleware
+from src.middleware.request_id import RequestIdMiddleware
+from src.routes.adminrouter import router as admin_router
 from src.routes.objectrouter import router as object_router  # Import the object router
+from src.routes.reservationrouter import router as reservation_router
 from src.routes.schemarouter import router as schema_router
+from src.warmup import readiness, run_warm_up
+
+# Number of worker processes; each keeps its own caches, kept coherent by the invalidation channel
+API_WORKERS = int(os.environ.get("API_WORKERS", "1"))
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", "8000"))
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    db = get_database()
+    await channel.start(db)
+    # Limits changed through the admin API outlive the worker that received them
+    await admission.load(db)
+    await audit.start(db)
+    # Warm up in the background so the worker can answer liveness checks; /ready reports when it's done
+    warm_up_task = asyncio.create_task(run_warm_up(db))
+    yield
+    warm_up_task.cancel()
+    await channel.stop()
+    await audit.stop(db)
+    validation.shutdown_pools()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
+# Runs before compression and sheds load before any other work is done
+app.add_middleware(AdmissionMiddleware)
+# Outermost, so even rejected requests get an id to report
+app.add_middleware(RequestIdMiddleware)
 
 # Include the routers
 app.include_router(schema_router, prefix="/schemas", tags=["schemas"])
 app.include_router(object_router, prefix="/objects", tags=["objects"])
+app.include_router(reservation_router, prefix="/ws", tags=["reservations"])
+app.include_router(admin_router, prefix="/admin", tags=["admin"])
+
+
+@app.get("/ready", tags=["health"])
+async def ready():
+    """Report whether this worker has finished warming up; returns 503 until it has."""
+    return JSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
+
+
+@app.get("/metrics", tags=["health"])
+async def read_metrics():
+    """Report this worker's counters, latency histograms and component statistics."""
+    return metrics.report()
+
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    # Multiple workers need the app as an import string so each process can load it
+    uvicorn.run("main:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import os
+import weakref
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError
+
+from src.events import broker
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Entries are written to one collection per month, e.g. "audit_202610"
+AUDIT_COLLECTION_PREFIX = "audit_"
+# Seconds between flushes of buffered entries to the database
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("AUDIT_FLUSH_INTERVAL", "1"))
+# Buffered entries that trigger a flush before the interval is up
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", "500"))
+# Entries held while the database is unreachable; the oldest are dropped beyond this
+AUDIT_MAX_BUFFER = int(os.environ.get("AUDIT_MAX_BUFFER", "100000"))
+# Days entries are kept before the database expires them
+AUDIT_RETENTION_DAYS = int(os.environ.get("AUDIT_RETENTION_DAYS", "90"))
+# Events whose document is copied into the entry, so past field values can be looked up
+AUDIT_FIELD_EVENTS = ("created", "updated")
+
+
+class InvalidCursor(ValueError):
+    """Raised when a history cursor was not returned by a previous history query."""
+
+
+def partition_name(at: datetime) -> str:
+    """The collection holding the entries of the month of ``at``."""
+    return f"{AUDIT_COLLECTION_PREFIX}{at:%Y%m}"
+
+
+def local_time(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert a timezone-aware time, e.g. a query parameter ending in ``Z``, to the naive local time entries use."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def _months(start: datetime, end: datetime) -> List[datetime]:
+    """The first day of every month from ``end`` back to ``start``, newest first."""
+    month = end.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    months = []
+    while month >= start.replace(day=1, hour=0, minute=0, second=0, microsecond=0):
+        months.append(month)
+        month = (month - timedelta(days=1)).replace(day=1)
+    return months
+
+
+def encode_cursor(entry: dict) -> str:
+    """The cursor resuming a history query after ``entry``."""
+    return f"{entry['at'].isoformat()}|{entry['_id']}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        at, _id = cursor.split("|")
+        return local_time(datetime.fromisoformat(at)), ObjectId(_id)
+    except (ValueError, InvalidId):
+        raise InvalidCursor("Invalid history cursor")
+
+
+class AuditLog:
+    """Append-only log of object changes and reservations, written in batches.
+
+    Writing an audit document alongside every write would double its latency, so the log
+    listens to the event broker, buffers entries in memory and flushes them with one
+    ``insert_many`` per month partition every ``flush_interval`` seconds, or sooner once
+    ``batch_size`` entries are waiting. Entries carry their own ids, so a flush retried after
+    a partial failure doesn't write anything twice. Each partition is indexed on object id
+    and time, and expires entries ``retention_days`` after they were written.
+
+    Each worker logs the writes it served; entries still buffered when a worker dies are lost.
+
+    Attributes:
+        flush_interval (float): Seconds between flushes.
+        batch_size (int): Buffered entries that trigger an early flush.
+        retention_days (int): Days entries are kept.
+    """
+
+    def __init__(self, flush_interval: float = AUDIT_FLUSH_INTERVAL, batch_size: int = AUDIT_BATCH_SIZE,
+                 max_buffer: int = AUDIT_MAX_BUFFER, retention_days: int = AUDIT_RETENTION_DAYS):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+        self._buffer: deque = deque()
+        self._max_buffer = max_buffer
+        self._lock = asyncio.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._indexed = weakref.WeakSet()
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0
+
+    def record(self, event_type: str, schema_id: str, object_id: Any, data: Optional[dict]):
+        """Buffer an entry for a published event; registered as a broker listener."""
+        entry = {
+            "_id": ObjectId(),
+            "object_id": str(object_id),
+            "schema_id": schema_id,
+            "type": event_type,
+            "at": datetime.now(),
+        }
+        if data is not None:
+            entry["holder"] = data.get("released_by") if event_type == "released" else data.get("reserved_by")
+            entry["reserved_until"] = data.get("reserved_until")
+            if event_type in AUDIT_FIELD_EVENTS:
+                entry["fields"] = data.get("fields")
+        if len(self._buffer) >= self._max_buffer:
+            self._buffer.popleft()
+            self.dropped += 1
+        self._buffer.append(entry)
+        if len(self._buffer) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+
+    async def _partition(self, db, at: datetime):
+        collection = db[partition_name(at)]
+        if collection not in self._indexed:
+            await collection.create_index([("object_id", 1), ("at", -1), ("_id", -1)])
+            await collection.create_index("at", expire_after=self.retention_days * 86400)
+            self._indexed.add(collection)
+        return collection
+
+    async def flush(self, db) -> int:
+        """Write every buffered entry, keeping those that could not be written for the next flush.
+
+        Args:
+            db: The database to write to.
+
+        Returns:
+            int: The number of entries written.
+        """
+        async with self._lock:
+            entries = list(self._buffer)
+            self._buffer.clear()
+            partitions: Dict[str, List[dict]] = {}
+            for entry in entries:
+                partitions.setdefault(partition_name(entry["at"]), []).append(entry)
+
+            written, failed = 0, []
+            for batch in partitions.values():
+                try:
+                    collection = await self._partition(db, batch[0]["at"])
+                    await collection.insert_many(batch, ordered=False)
+                    written += len(batch)
+                except BulkWriteError as e:
+                    # Duplicates were written by an earlier, partly failed flush
+                    retry = {error["index"] for error in e.details.get("writeErrors", []) if error.get("code") != 11000}
+                    written += len(batch) - len(retry)
+                    failed.extend(batch[index] for index in sorted(retry))
+                except Exception:
+                    logger.exception("Failed to write %d audit entries", len(batch))
+                    failed.extend(batch)
+
+            if failed:
+                self.failures += 1
+                # Put them back ahead of entries recorded meanwhile, still within the buffer's bound
+                self._buffer.extendleft(reversed(failed))
+                while len(self._buffer) > self._max_buffer:
+                    self._buffer.popleft()
+                    self.dropped += 1
+            self.written += written
+            return written
+
+    async def history(self, db, object_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                      limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Return the entries of an object in a time range, newest first.
+
+        Args:
+            db: The database to read from.
+            object_id (str): The object.
+            start (Optional[datetime]): The earliest time, inclusive; the retention period if omitted.
+            end (Optional[datetime]): The latest time, exclusive; now if omitted. Aware times are
+                converted to local time, like the naive times entries are recorded in.
+            limit (int): Maximum number of entries to return.
+            cursor (Optional[str]): The ``next`` cursor of the previous page.
+
+        Returns:
+            Tuple[List[dict], Optional[str]]: The entries and the cursor of the next page, or None if this is the last.
+
+        Raises:
+            InvalidCursor: If ``cursor`` is malformed.
+        """
+        # Entries of this worker's own recent writes are still buffered
+        await self.flush(db)
+        end = local_time(end) or datetime.now()
+        start = local_time(start) or end - timedelta(days=self.retention_days)
+        query: dict = {"object_id": object_id, "at": {"$gte": start, "$lt": end}}
+        if cursor is not None:
+            at, _id = decode_cursor(cursor)
+            query = {"$and": [query, {"$or": [{"at": {"$lt": at}}, {"at": at, "_id": {"$lt": _id}}]}]}
+            end = min(end, at + timedelta(microseconds=1))
+
+        entries: List[dict] = []
+        for month in _months(start, end):
+            collection = db[partition_name(month)]
+            async for entry in collection.find(query, sort=[("at", -1), ("_id", -1)], limit=limit + 1 - len(entries)):
+                entries.append(entry)
+            if len(entries) > limit:
+                break
+        if len(entries) > limit:
+            entries = entries[:limit]
+            return entries, encode_cursor(entries[-1])
+        return entries, None
+
+    async def start(self, db):
+        """Start flushing buffered entries in the background.
+
+        Args:
+            db: The database to write to.
+        """
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(db))
+
+    async def _run(self, db):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to flush the audit log")
+
+    async def stop(self, db):
+        """Stop the background task and write the entries still buffered.
+
+        Args:
+            db: The database to write to.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wake = None
+        await self.flush(db)
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failures,
+        }
+
+
+audit = AuditLog()
+broker.add_listener(audit.record)
+metrics.register_collector("audit", audit.stats)
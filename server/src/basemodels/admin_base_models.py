@@ -0,0 +1,70 @@
+import os
+from typing import Dict, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+ROUTE_CLASSES = ("read", "write", "bulk")
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+class AdmissionLimits(BaseModel):
+    """Limits applied by the admission control middleware.
+
+    Attributes:
+        rate_per_second (float): Requests per second each API key may make on average.
+        burst (int): Requests an idle API key may make at once before being rate limited.
+        max_in_flight (Dict[str, int]): Requests executing at once per route class (read, write, bulk).
+        max_queue (Dict[str, int]): Requests allowed to wait for a slot per route class before being shed.
+        queue_timeout (float): Latency budget in seconds a request may spend waiting for a slot.
+    """
+    rate_per_second: float = Field(default=_env_float("ADMISSION_RATE_PER_SECOND", 100), gt=0)
+    burst: int = Field(default=int(_env_float("ADMISSION_BURST", 200)), ge=1)
+    max_in_flight: Dict[str, int] = Field(default_factory=lambda: {
+        "read": int(_env_float("ADMISSION_MAX_IN_FLIGHT_READ", 256)),
+        "write": int(_env_float("ADMISSION_MAX_IN_FLIGHT_WRITE", 64)),
+        "bulk": int(_env_float("ADMISSION_MAX_IN_FLIGHT_BULK", 2)),
+    })
+    max_queue: Dict[str, int] = Field(default_factory=lambda: {
+        "read": int(_env_float("ADMISSION_MAX_QUEUE_READ", 1024)),
+        "write": int(_env_float("ADMISSION_MAX_QUEUE_WRITE", 256)),
+        "bulk": int(_env_float("ADMISSION_MAX_QUEUE_BULK", 4)),
+    })
+    queue_timeout: float = Field(default=_env_float("ADMISSION_QUEUE_TIMEOUT", 0.5), gt=0)
+
+
+class AdmissionLimitsUpdate(BaseModel):
+    """Request to change some of the admission limits at runtime.
+
+    Attributes:
+        rate_per_second (Optional[float]): New per-key request rate.
+        burst (Optional[int]): New per-key burst size.
+        max_in_flight (Optional[Dict[str, int]]): New in-flight limits for the given route classes.
+        max_queue (Optional[Dict[str, int]]): New queue lengths for the given route classes.
+        queue_timeout (Optional[float]): New queueing latency budget in seconds.
+    """
+    rate_per_second: Optional[float] = Field(default=None, gt=0)
+    burst: Optional[int] = Field(default=None, ge=1)
+    max_in_flight: Optional[Dict[str, int]] = None
+    max_queue: Optional[Dict[str, int]] = None
+    queue_timeout: Optional[float] = Field(default=None, gt=0)
+
+    @model_validator(mode="after")
+    def route_classes(self) -> 'AdmissionLimitsUpdate':
+        """Validate that per-class limits name known route classes and are not negative.
+
+        Raises:
+            ValueError: If a route class is unknown or a limit is negative.
+
+        Returns:
+            AdmissionLimitsUpdate: The validated update.
+        """
+        for limits in (self.max_in_flight or {}, self.max_queue or {}):
+            unknown = set(limits) - set(ROUTE_CLASSES)
+            if unknown:
+                raise ValueError(f"Unknown route classes: {', '.join(sorted(unknown))}")
+            if any(value < 0 for value in limits.values()):
+                raise ValueError("Limits must not be negative")
+        return self
@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from bson import ObjectId
+from pydantic import BaseModel, Field, field_serializer
+
+from src.basemodels.schema_base_models import PyObjectId
+
+ImportFormat = Literal["csv", "ndjson"]
+
+
+class ImportRowError(BaseModel):
+    """A row of an import that could not be stored.
+
+    Attributes:
+        row (int): The 1-based number of the data row (not counting a CSV header).
+        error (str): Why the row was rejected.
+    """
+    row: int
+    error: str
+
+
+class ImportJob(BaseModel):
+    """Progress and outcome of an object import, stored in the ``imports`` collection.
+
+    Attributes:
+        id (PyObjectId): The job id.
+        schema_id (str): The schema the objects are imported into.
+        format (ImportFormat): The upload format.
+        status (Literal['running', 'completed', 'failed']): Whether the import is still running.
+        bytes_read (int): Bytes of the upload read so far.
+        rows (int): Data rows read so far.
+        inserted (int): Objects stored so far.
+        failed (int): Rows rejected so far.
+        errors (List[ImportRowError]): The first rejected rows and why; ``failed`` counts them all.
+        detail (Optional[str]): Why the import failed as a whole.
+        started_at (datetime): When the import started.
+        updated_at (datetime): When progress was last recorded.
+        finished_at (Optional[datetime]): When the import finished.
+        rows_per_second (Optional[float]): Average throughput so far.
+    """
+    id: PyObjectId = Field(alias="_id", default_factory=ObjectId)
+    schema_id: str
+    format: ImportFormat
+    status: Literal["running", "completed", "failed"] = "running"
+    bytes_read: int = 0
+    rows: int = 0
+    inserted: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = Field(default_factory=list)
+    detail: Optional[str] = None
+    started_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+    rows_per_second: Optional[float] = None
+
+    # Kept as an ObjectId when stored, a string in API responses
+    @field_serializer("id", when_used="json")
+    def serialize_object_id(self, v: ObjectId, _info):
+        return str(v)
+
+    model_config = {
+        "populate_by_name": True,
+        "arbitrary_types_allowed": True,
+    }
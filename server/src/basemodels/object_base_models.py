@@ -1,3 +1,5 @@
+from typing import Optional
+
 from bson import ObjectId
 from pydantic import BaseModel, Field, field_serializer
 
@@ -50,3 +52,18 @@ class CreateObjectRequest(BaseModel):
         "arbitrary_types_allowed": True,
         "exclude_none": True
     }
+
+
+class BulkOperationResponse(BaseModel):
+    """Response model for bulk updates and deletes of objects matching a filter.
+
+    Attributes:
+        matched_count (int): The number of objects matching the filter.
+        modified_count (Optional[int]): The number of objects updated.
+        deleted_count (Optional[int]): The number of objects deleted.
+        dry_run (bool): Whether the operation only counted the matching objects.
+    """
+    matched_count: int
+    modified_count: Optional[int] = None
+    deleted_count: Optional[int] = None
+    dry_run: bool = False
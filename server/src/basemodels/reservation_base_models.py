@@ -0,0 +1,86 @@
+from typing import Any, Dict, Literal, Optional
+
+from bson import ObjectId
+from pydantic import BaseModel, Field, field_serializer
+
+from src.basemodels.schema_base_models import PyObjectId
+
+
+class ReserveRequest(BaseModel):
+    """Request to reserve a specific object.
+
+    Attributes:
+        holder (str): Who is taking the reservation, e.g. a user or test rig name.
+        lease_seconds (Optional[int]): Release the reservation automatically after this many seconds.
+    """
+    holder: str = Field(min_length=1)
+    lease_seconds: Optional[int] = Field(default=None, gt=0)
+
+
+class ReleaseRequest(BaseModel):
+    """Request to release an object reserved by ``holder``.
+
+    Attributes:
+        holder (str): The holder the reservation was taken by.
+    """
+    holder: str = Field(min_length=1)
+
+
+class AllocateRequest(BaseModel):
+    """Request to reserve any free object of a schema matching the given field values.
+
+    Attributes:
+        schema_id (PyObjectId): The schema of the object to allocate.
+        holder (str): Who is taking the reservation.
+        fields (Dict[str, Any]): Field values the allocated object must have.
+        lease_seconds (Optional[int]): Release the reservation automatically after this many seconds.
+    """
+    schema_id: PyObjectId
+    holder: str = Field(min_length=1)
+    fields: Dict[str, Any] = Field(default_factory=dict)
+    lease_seconds: Optional[int] = Field(default=None, gt=0)
+
+    @field_serializer("schema_id")
+    def serialize_object_id(self, v: ObjectId, _info):
+        """Serialize the ObjectId to a string.
+
+        Args:
+            v (ObjectId): The ObjectId to serialize.
+            _info: Additional information for serialization.
+
+        Returns:
+            str: The serialized string representation of the ObjectId.
+        """
+        return str(v)
+
+    model_config = {
+        "populate_by_name": True,
+        "arbitrary_types_allowed": True
+    }
+
+
+class ReservationCommand(BaseModel):
+    """A single command sent over the reservation WebSocket.
+
+    Attributes:
+        id (str): Client-chosen request id echoed back on the matching reply.
+        op (Literal['reserve', 'release', 'allocate']): The operation to perform.
+        object_id (Optional[str]): The object to reserve or release.
+        schema_id (Optional[PyObjectId]): The schema to allocate from.
+        holder (str): Who is taking or releasing the reservation.
+        fields (Dict[str, Any]): Field values an allocated object must have.
+        lease_seconds (Optional[int]): Release the reservation automatically after this many seconds.
+        wait (Optional[float]): Seconds an allocation waits for a matching object to be freed.
+    """
+    id: str
+    op: Literal["reserve", "release", "allocate"]
+    object_id: Optional[str] = None
+    schema_id: Optional[PyObjectId] = None
+    holder: str = Field(min_length=1)
+    fields: Dict[str, Any] = Field(default_factory=dict)
+    lease_seconds: Optional[int] = Field(default=None, gt=0)
+    wait: Optional[float] = Field(default=None, gt=0)
+
+    model_config = {
+        "arbitrary_types_allowed": True
+    }
@@ -5,6 +5,8 @@ from bson import ObjectId
 from pydantic import BaseModel, Field, GetCoreSchemaHandler, field_serializer, model_validator
 from pydantic_core import core_schema
 
+ValidationMode = Literal["inline", "thread", "process"]
+
 
 class PyObjectId(ObjectId):
     """Custom ObjectId class for Pydantic models.
@@ -75,6 +77,8 @@ class FieldDefinition(BaseModel):
         default (Optional[Any]): Default value for the field.
         min (Optional[float]): Minimum value for numeric fields.
         max (Optional[float]): Maximum value for numeric fields.
+        searchable (Optional[bool]): Index the field's n-grams so objects can be searched by substring.
+        unique (Optional[bool]): No two objects of the schema may share a value of the field.
     """
 
     model_config = {
@@ -93,6 +97,8 @@ class FieldDefinition(BaseModel):
     default: Optional[Any] = None
     min: Optional[float] = None
     max: Optional[float] = None
+    searchable: Optional[bool] = None
+    unique: Optional[bool] = None
 
     def _validate_str(self):
         """Validate constraints specific to string fields.
@@ -156,6 +162,12 @@ class FieldDefinition(BaseModel):
         if self.type == "list":
             self._validate_list()
 
+        if self.searchable and self.type != "str":
+            raise ValueError("searchable is only supported for strings")
+
+        if self.unique and self.type == "list":
+            raise ValueError("unique is not supported for lists")
+
         return self
 
 
@@ -172,9 +184,15 @@ class CreateSchemaRequest(BaseModel):
         fields (Dict[str, FieldDefinition]): A dictionary containing the field definitions for the schema,
             where the keys are field names, and the values are `FieldDefinition` objects
             describing the field's properties.
+        snapshot (Optional[bool]): Keep an in-memory columnar snapshot of the schema's objects to
+            answer filtered counts without querying the database.
+        validation (Optional[ValidationMode]): Where objects of this schema are validated: on the event
+            loop ("inline"), on a thread pool or on a process pool. By default only large payloads are offloaded.
     """
     schema_name: str
     fields: Dict[str, FieldDefinition]
+    snapshot: Optional[bool] = None
+    validation: Optional[ValidationMode] = None
 
     model_config = {
         "populate_by_name": True,
@@ -194,9 +212,13 @@ class SchemaUpdateRequest(BaseModel):
         schema_name (Optional[str]): The name of the schema to update. It is optional and can be
             left as None if not provided.
         fields (Optional[Dict[str, FieldDefinition]]): A dictionary of field definitions associated with the schema.
+        snapshot (Optional[bool]): Enable or disable the in-memory snapshot of the schema's objects.
+        validation (Optional[ValidationMode]): Where objects of this schema are validated.
     """
     schema_name: Optional[str] = None
     fields: Optional[Dict[str, FieldDefinition]] = None
+    snapshot: Optional[bool] = None
+    validation: Optional[ValidationMode] = None
 
     model_config = {
         "populate_by_name": True,
@@ -306,9 +328,14 @@ class CreatedSchemaResponse(BaseModel):
     }
 
 
-example_create_request = CreateSchemaRequest(schema_name="SIM", fields={
-    "imsi": FieldDefinition(type="str", required=True, regex=r"$2343(0|3)\d{10}"),
-    "msisdn": FieldDefinition(type="str", required=True, regex=r"44\d{9}"),
-    "environment": FieldDefinition(type="str", required=True, enum=["Dev_1", "Dev_2", "Stable_1", "Stable_2", "Production"]),
-    "use_count": FieldDefinition(type="int", required=True, default=0, min=0, max=10000),
-})
+# Plain data rather than a CreateSchemaRequest so importing this module doesn't build and validate models
+EXAMPLE_CREATE_REQUEST = {
+    "schema_name": "SIM",
+    "fields": {
+        "imsi": {"type": "str", "required": True, "regex": r"$2343(0|3)\d{10}"},
+        "msisdn": {"type": "str", "required": True, "regex": r"44\d{9}"},
+        "environment": {"type": "str", "required": True,
+                        "enum": ["Dev_1", "Dev_2", "Stable_1", "Stable_2", "Production"]},
+        "use_count": {"type": "int", "required": True, "default": 0, "min": 0, "max": 10000},
+    },
+}
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import re
+from typing import Iterable, List, Optional, Set
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from src.invalidation import INVALIDATION_POLL_INTERVAL
+from src.repository.base import drop_index_if_exists
+
+logger = logging.getLogger(__name__)
+
+# Objects carry the unique field names of their schema here, e.g. {"imsi": True}; only marked objects are constrained
+UNIQUE_MARKER = "unique_fields"
+# One index per unique field name is shared by every schema declaring it, e.g. "unique_msisdn"
+UNIQUE_INDEX_PREFIX = "unique_"
+_UNIQUE_INDEX_NAME = re.compile(rf"index: {UNIQUE_INDEX_PREFIX}(\S+)")
+
+_remarks: Set[asyncio.Task] = set()
+
+
+class ConstraintError(ValueError):
+    """Raised when a unique constraint can't be enforced because existing objects already break it."""
+
+
+class UniqueIndexError(Exception):
+    """Raised when the unique index of a field can't be created.
+
+    Attributes:
+        field (str): The unique field.
+        conflict (bool): Whether an existing index with the same name or keys but other options is in the way.
+    """
+
+    def __init__(self, field: str, error: OperationFailure):
+        self.field = field
+        # IndexOptionsConflict, IndexKeySpecsConflict
+        self.conflict = error.code in (85, 86)
+        super().__init__(f"The unique index of {field} can't be created: {error}")
+
+
+def unique_fields(schema: Optional[dict]) -> List[str]:
+    """The fields of a schema declared ``unique``."""
+    return [name for name, field in ((schema or {}).get("fields") or {}).items() if field.get("unique")]
+
+
+def unique_marker(schema: Optional[dict]) -> Optional[dict]:
+    """The marker objects of a schema are written with, or None if it has no unique fields."""
+    return {name: True for name in unique_fields(schema)} or None
+
+
+def unique_index_name(name: str) -> str:
+    return f"{UNIQUE_INDEX_PREFIX}{name}"
+
+
+async def ensure_unique_indexes(db, names: Iterable[str]):
+    """Create the unique index of every field name given, if it doesn't exist yet.
+
+    The index on ``(schema_id, fields.<name>)`` only covers objects whose marker lists the
+    field and that have a value for it, so uniqueness holds within each schema declaring the
+    field unique, and objects leaving an optional field out are not constrained. MongoDB
+    checks it as part of every insert and update, without a query beforehand.
+
+    Indexes are shared by name rather than created per schema, so the collection stays well
+    below MongoDB's 64 indexes however many schemas declare unique fields. Partial indexes
+    need MongoDB 3.2 or later.
+
+    Args:
+        db: The database dependency.
+        names (Iterable[str]): The unique field names.
+
+    Raises:
+        UniqueIndexError: If an index can't be created, e.g. the collection has too many indexes.
+    """
+    for name in names:
+        try:
+            await db.objects.create_index(
+                [("schema_id", 1), (f"fields.{name}", 1)], unique=True, name=unique_index_name(name),
+                partial_filter={f"{UNIQUE_MARKER}.{name}": True, f"fields.{name}": {"$exists": True}},
+            )
+        except OperationFailure as e:
+            raise UniqueIndexError(name, e)
+
+
+async def _mark(db, query: dict, marker: Optional[dict]):
+    update = {"$set": {UNIQUE_MARKER: marker}} if marker else {"$unset": {UNIQUE_MARKER: ""}}
+    await db.objects.update_many(query, update)
+
+
+async def mark_objects(db, schema_id: str, previous: Optional[dict], schema: dict):
+    """Bring the markers of a schema's objects in line with the schema's unique fields, before it is saved.
+
+    Objects marked with a newly unique field enter its index, so existing duplicates fail the
+    update; the objects marked so far are then put back as they were.
+
+    Args:
+        db: The database dependency.
+        schema_id (str): The schema's id.
+        previous (Optional[dict]): The schema document before the update.
+        schema (dict): The schema document as it will be saved.
+
+    Raises:
+        ConstraintError: If existing objects already share a value of a field made unique.
+        UniqueIndexError: If the index of a field made unique can't be created.
+    """
+    await ensure_unique_indexes(db, unique_fields(schema))
+    try:
+        await _mark(db, {"schema_id": schema_id}, unique_marker(schema))
+    except DuplicateKeyError as e:
+        await _mark(db, {"schema_id": schema_id}, unique_marker(previous))
+        raise ConstraintError(f"Objects already share values of {conflicting_field(e.details)}; "
+                              f"it can't be made unique")
+
+
+def schedule_remark(db, schema_id: str, schema: dict, delay: float = 2 * INVALIDATION_POLL_INTERVAL):
+    """Mark objects other workers created with the old markers until they saw the schema change.
+
+    Runs in the background once every worker has dropped the old schema from its cache.
+    """
+    marker = unique_marker(schema)
+
+    async def run():
+        await asyncio.sleep(delay)
+        try:
+            await _mark(db, {"schema_id": schema_id, UNIQUE_MARKER: {"$ne": marker}}, marker)
+        except DuplicateKeyError as e:
+            logger.error("Objects of schema %s created during its update share values of unique field %s",
+                         schema_id, conflicting_field(e.details))
+        except Exception:
+            logger.exception("Failed to mark the objects of schema %s", schema_id)
+
+    task = asyncio.create_task(run())
+    _remarks.add(task)
+    task.add_done_callback(_remarks.discard)
+
+
+async def drop_unused_indexes(db, schema: dict, remaining: List[dict]):
+    """Drop the unique indexes of a deleted schema's fields no remaining schema declares unique.
+
+    Args:
+        db: The database dependency.
+        schema (dict): The deleted schema document.
+        remaining (List[dict]): The schema documents left.
+    """
+    used = {name for other in remaining for name in unique_fields(other)}
+    for name in set(unique_fields(schema)) - used:
+        await drop_index_if_exists(db.objects, unique_index_name(name))
+
+
+def conflicting_field(details: Optional[dict]) -> Optional[str]:
+    """The field whose unique constraint a duplicate key error reports, or None if it isn't one of ours.
+
+    Args:
+        details (Optional[dict]): The error's details (or a bulk write error's write error).
+    """
+    details = details or {}
+    for key in details.get("keyPattern") or {}:
+        if key.startswith("fields."):
+            return key[len("fields."):]
+    # Older servers only name the index in the message
+    match = _UNIQUE_INDEX_NAME.search(details.get("errmsg", ""))
+    return match.group(1) if match else None
+
+
+def duplicate_message(details: Optional[dict]) -> str:
+    """Describe a duplicate key error for a client, naming the conflicting field."""
+    field = conflicting_field(details)
+    return f"Duplicate value for unique field {field}" if field else "Duplicate key"
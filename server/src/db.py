@@ -1,11 +1,22 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from src.monitoring import CommandTimer, PoolTimer
+from src.repository import Database, MongoDatabase
+
 MONGO_URI = "mongodb://localhost:27017"
+DB_NAME = "reservation-system"
+
+# Per-collection command latencies, pool waits and slow operations are reported at /metrics and in the log
+client = AsyncIOMotorClient(MONGO_URI, event_listeners=[CommandTimer(), PoolTimer()])
+database = MongoDatabase(client[DB_NAME])
+
 
-client = AsyncIOMotorClient(MONGO_URI)
+def get_database() -> Database:
+    """Return the application database handle for code running outside a request (e.g. startup tasks)."""
+    return database
 
 
 # ✅ async generator for dependency injection
 async def get_db():
-    db = client['reservation-system']
+    db = get_database()
     yield db
@@ -0,0 +1,193 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Iterable, List, Optional, Set
+from uuid import uuid4
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+logger = logging.getLogger(__name__)
+
+# Number of past events kept in memory so disconnected clients can resume
+EVENT_HISTORY_SIZE = int(os.environ.get("EVENT_HISTORY_SIZE", "10000"))
+# Events buffered per subscriber before it is considered too slow and dropped
+EVENT_SUBSCRIBER_BUFFER = int(os.environ.get("EVENT_SUBSCRIBER_BUFFER", "1000"))
+# Seconds events are still kept after the last subscriber leaves, so it can reconnect and resume
+EVENT_RESUME_WINDOW = float(os.environ.get("EVENT_RESUME_WINDOW", "300"))
+
+
+class ResumeTokenExpired(Exception):
+    """Raised when a subscriber asks to resume from an event no longer held in history."""
+
+
+class Subscription:
+    """A single consumer of the event feed with its own bounded buffer.
+
+    When the buffer overflows the subscription is dropped: events already buffered are
+    still delivered, then iteration stops so the client can reconnect with the id of the
+    last event it received.
+
+    Attributes:
+        schema_ids (Optional[Set[str]]): Schemas to receive events for, or None for all.
+        dropped (bool): Whether the subscription overflowed its buffer.
+    """
+
+    def __init__(self, schema_ids: Optional[Set[str]], buffer_size: int):
+        self.schema_ids = schema_ids
+        self.dropped = False
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+
+    def matches(self, event: dict) -> bool:
+        return self.schema_ids is None or event["schema_id"] in self.schema_ids
+
+    def offer(self, event: dict) -> bool:
+        """Buffer an event, returning False if the subscriber is too slow to keep up."""
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.dropped = True
+            return False
+
+    @property
+    def finished(self) -> bool:
+        """Whether the subscription was dropped and every buffered event has been delivered."""
+        return self.dropped and self._queue.empty()
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        """Wait up to ``timeout`` seconds for the next event.
+
+        Returns:
+            Optional[dict]: The next event, or None if none arrived in time or the subscription is finished.
+        """
+        if self.finished:
+            return None
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    """In-process fan-out of object change events.
+
+    Write paths publish each change once; the broker copies it to every matching
+    subscriber, so the number of subscribers adds no database load. A bounded history
+    lets clients resume from the id of the last event they saw. Each worker process has
+    its own broker and feed of the writes it served; event ids are prefixed with an epoch
+    unique to the broker, so a client resuming on another worker, or after a restart, is
+    told its token expired instead of being replayed unrelated events.
+
+    While nobody is subscribed, and no subscriber left within ``resume_window`` seconds,
+    events are neither encoded nor kept: nobody could receive or resume them. The history
+    is cleared instead, so a token from before the gap expires rather than skipping it.
+
+    In-process components that must react to writes before the response is sent register
+    a listener, which is called synchronously with the raw (unencoded) document, whether
+    or not anybody is subscribed.
+
+    Attributes:
+        epoch (str): Prefix of the ids of this broker's events.
+    """
+
+    def __init__(self, history_size: int = EVENT_HISTORY_SIZE, buffer_size: int = EVENT_SUBSCRIBER_BUFFER,
+                 resume_window: float = EVENT_RESUME_WINDOW):
+        self.buffer_size = buffer_size
+        self.resume_window = resume_window
+        self.epoch = uuid4().hex[:8]
+        self._history: deque = deque(maxlen=history_size)
+        self._subscribers: Set[Subscription] = set()
+        self._sequence = itertools.count(1)
+        self._last_sequence = 0
+        self._resumable_until = 0.0
+        self._listeners: List[Callable[[str, str, Any, Optional[dict]], None]] = []
+
+    def add_listener(self, listener: Callable[[str, str, Any, Optional[dict]], None]):
+        """Register a callback run on every publish with the event type, schema id, object id and document.
+
+        Args:
+            listener (Callable): The callback; it must not block.
+        """
+        self._listeners.append(listener)
+
+    def publish(self, event_type: str, schema_id: Any, object_id: Any, data: Optional[dict] = None) -> dict:
+        """Record an event and deliver it to every matching subscriber.
+
+        Args:
+            event_type (str): The kind of change, e.g. ``"created"`` or ``"deleted"``.
+            schema_id: The id of the schema the object belongs to.
+            object_id: The id of the changed object.
+            data (Optional[dict]): The object document after the change, if any.
+
+        Returns:
+            Optional[dict]: The published event, or None if nobody is subscribed or could resume.
+        """
+        sequence = self._last_sequence = next(self._sequence)
+        for listener in self._listeners:
+            try:
+                listener(event_type, str(schema_id), object_id, data)
+            except Exception:
+                logger.exception("Event listener failed for %s %s", event_type, object_id)
+
+        if not self._subscribers and time.monotonic() >= self._resumable_until:
+            self._history.clear()
+            return None
+
+        event = {
+            "id": f"{self.epoch}-{sequence}",
+            "type": event_type,
+            "schema_id": str(schema_id),
+            "object_id": str(object_id),
+            "time": datetime.now(),
+            "data": jsonable_encoder(data, custom_encoder={ObjectId: str}) if data is not None else None,
+        }
+        self._history.append((sequence, event))
+        for subscriber in list(self._subscribers):
+            if subscriber.matches(event) and not subscriber.offer(event):
+                self.unsubscribe(subscriber)
+        return event
+
+    def subscribe(self, schema_ids: Optional[Iterable[str]] = None, after: Optional[str] = None) -> Subscription:
+        """Create a subscription, optionally replaying the events published after ``after``.
+
+        Args:
+            schema_ids (Optional[Iterable[str]]): Only receive events for these schemas.
+            after (Optional[str]): Resume after the event with this id.
+
+        Returns:
+            Subscription: The new subscription.
+
+        Raises:
+            ResumeTokenExpired: If ``after`` wasn't published by this broker, or events after it have left the history.
+        """
+        subscription = Subscription(set(schema_ids) if schema_ids else None, self.buffer_size)
+
+        if after is not None:
+            epoch, _, sequence = after.rpartition("-")
+            if epoch != self.epoch or not sequence.isdigit():
+                raise ResumeTokenExpired(f"Event {after} was published by another worker or before a restart")
+            after_sequence = int(sequence)
+            oldest = self._history[0][0] if self._history else self._last_sequence + 1
+            if after_sequence < oldest - 1 or after_sequence > self._last_sequence:
+                raise ResumeTokenExpired(f"Events after {after} are no longer available")
+            for sequence, event in self._history:
+                if sequence > after_sequence and subscription.matches(event):
+                    if not subscription.offer(event):
+                        break
+
+        if not subscription.dropped:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Stop delivering events to a subscription, keeping events for a while for it to resume."""
+        self._subscribers.discard(subscription)
+        self._resumable_until = time.monotonic() + self.resume_window
+
+
+broker = EventBroker()
@@ -0,0 +1,41 @@
+from typing import Any, Dict
+
+from src.schema_cache import CachedSchema
+
+# Comparison operators clients may use in an object filter
+FILTER_OPERATORS = {"$eq", "$ne", "$in", "$nin", "$lt", "$lte", "$gt", "$gte"}
+
+
+class FilterError(ValueError):
+    """Raised when an object filter names an unknown field or operator."""
+
+
+def build_object_query(schema: CachedSchema, filters: Dict[str, Any]) -> dict:
+    """Translate a filter on schema fields into a Mongo query on the schema's objects.
+
+    Filters map field names either to a value to match exactly or to a dict of comparison
+    operators, e.g. ``{"environment": "Dev_1", "use_count": {"$lt": 100}}``.
+
+    Args:
+        schema (CachedSchema): The schema the objects belong to.
+        filters (Dict[str, Any]): The filter to translate.
+
+    Returns:
+        dict: The Mongo query.
+
+    Raises:
+        FilterError: If a field is not declared by the schema or an operator is not supported.
+    """
+    declared = schema.schema.get("fields", {})
+    unknown = sorted(set(filters) - set(declared))
+    if unknown:
+        raise FilterError(f"Unknown fields: {', '.join(unknown)}")
+
+    query = {"schema_id": str(schema.schema["_id"])}
+    for name, condition in filters.items():
+        if isinstance(condition, dict):
+            unsupported = sorted(set(condition) - FILTER_OPERATORS)
+            if unsupported:
+                raise FilterError(f"Unsupported operators: {', '.join(unsupported)}")
+        query[f"fields.{name}"] = condition
+    return query
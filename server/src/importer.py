@@ -0,0 +1,368 @@
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import Any, AsyncIterator, Iterator, List, Optional, Set, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from src import search
+from src.events import broker
+from src.constraints import UNIQUE_MARKER, duplicate_message, unique_marker
+from src.basemodels.import_base_models import ImportFormat, ImportJob, ImportRowError
+from src.validation import VALIDATION_PROCESSES, compiled_model, process_pool, worker_schema
+
+logger = logging.getLogger(__name__)
+
+IMPORT_COLLECTION = "imports"
+# Rows validated by a worker and written by one insert_many
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "1000"))
+# Chunks being validated or written at once per import; reading the upload pauses beyond this
+IMPORT_MAX_PENDING_CHUNKS = int(os.environ.get("IMPORT_MAX_PENDING_CHUNKS", str(2 * VALIDATION_PROCESSES)))
+# Rejected rows reported individually per import; further rejections are only counted
+IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", "1000"))
+# Longest row accepted, in characters; a CSV quote left open would otherwise buffer the rest of the upload
+IMPORT_MAX_RECORD_SIZE = int(os.environ.get("IMPORT_MAX_RECORD_SIZE", str(1024 * 1024)))
+# Pieces of the upload received ahead of the parser; receiving pauses beyond this
+IMPORT_MAX_BUFFERED_READS = 16
+# Seconds between progress saves while the upload is still being received
+IMPORT_PROGRESS_INTERVAL = 1.0
+
+_TRUE = {"true", "1", "yes", "y"}
+_FALSE = {"false", "0", "no", "n"}
+
+_imports: Set[asyncio.Task] = set()
+
+
+def _write_error(error: dict) -> str:
+    """The message reported for a row the database refused, naming the unique field it conflicts on."""
+    if error.get("code") == 11000:
+        return duplicate_message(error)
+    return error.get("errmsg", "Write failed")
+
+
+class ImportRejected(ValueError):
+    """Raised when an upload can't be imported at all, e.g. its CSV header names unknown fields."""
+
+
+def coerce_value(field: dict, value: str) -> Any:
+    """Convert a CSV cell to the type of its field definition.
+
+    Args:
+        field (dict): The field definition.
+        value (str): The cell text.
+
+    Returns:
+        Any: The converted value.
+
+    Raises:
+        ValueError: If the text is not a valid value of the field's type.
+    """
+    type_name = field.get("type", "str")
+    if field.get("enum") or type_name not in ("int", "float", "boolean", "bool"):
+        return value
+    if type_name == "int":
+        return int(value)
+    if type_name == "float":
+        return float(value)
+    lowered = value.strip().lower()
+    if lowered in _TRUE:
+        return True
+    if lowered in _FALSE:
+        return False
+    raise ValueError(f"'{value}' is not a boolean")
+
+
+def validate_chunk(schema: dict, format: str, header: Optional[List[str]],
+                   records: List[Tuple[int, str]]) -> Tuple[List[Tuple[int, dict]], List[Tuple[int, str]]]:
+    """Parse, coerce and validate a chunk of rows, in a worker process.
+
+    Args:
+        schema (dict): The schema document (id, name, version and fields).
+        format (str): ``"csv"`` or ``"ndjson"``.
+        header (Optional[List[str]]): The CSV column names.
+        records (List[Tuple[int, str]]): Row numbers and the raw text of each row.
+
+    Returns:
+        tuple: The valid object documents with their row numbers, and the rejected row numbers with the reason.
+    """
+    model = compiled_model(schema)
+    fields_def = schema.get("fields", {})
+    schema_id = str(schema["_id"])
+    marker = unique_marker(schema)
+    now = datetime.now()
+    documents, errors = [], []
+    for row, text in records:
+        try:
+            if format == "csv":
+                values = next(csv.reader([text]))
+                if len(values) != len(header):
+                    raise ValueError(f"expected {len(header)} columns, found {len(values)}")
+                fields = {name: coerce_value(fields_def[name], value) for name, value in zip(header, values) if value != ""}
+            else:
+                fields = json.loads(text)
+                if not isinstance(fields, dict):
+                    raise ValueError("each line must be a JSON object of field values")
+            model(**fields)
+        except Exception as e:
+            errors.append((row, str(e)))
+            continue
+        document = {"schema_id": schema_id, "fields": fields, "created_at": now, "updated_at": now}
+        if marker:
+            document[UNIQUE_MARKER] = dict(marker)
+        documents.append((row, document))
+    return documents, errors
+
+
+class RecordReader:
+    """Splits an upload into rows incrementally, holding at most one partial row between reads.
+
+    A CSV row may span several lines when a quoted value contains a line break. Rows are
+    limited to ``IMPORT_MAX_RECORD_SIZE`` characters, so a quote left open can't make the
+    reader hold the rest of the upload.
+    """
+
+    def __init__(self, format: str):
+        self.format = format
+        self.max_size = IMPORT_MAX_RECORD_SIZE
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._record = ""
+
+    def _check_size(self, size: int):
+        if size > self.max_size:
+            raise ImportRejected(f"A row is longer than {self.max_size} characters; is a quote left open?")
+
+    def feed(self, data: bytes, final: bool = False) -> Iterator[str]:
+        """Yield the complete rows once ``data`` is appended; with ``final`` also the last, unterminated row.
+
+        Raises:
+            ImportRejected: If a row is longer than ``max_size``.
+        """
+        self._buffer += self._decoder.decode(data, final)
+        *lines, self._buffer = self._buffer.split("\n")
+        if final:
+            lines.append(self._buffer)
+            self._buffer = ""
+        for line in lines:
+            self._record += line if not self._record else "\n" + line
+            self._check_size(len(self._record))
+            if self.format == "csv" and self._record.count('"') % 2:
+                continue
+            record, self._record = self._record.rstrip("\r"), ""
+            if record.strip():
+                yield record
+        self._check_size(len(self._record) + len(self._buffer))
+        if final and self._record.strip():
+            yield self._record
+
+
+class ImportPipeline:
+    """Streams one upload into a schema's objects.
+
+    Rows are read from the upload as it arrives, validated in chunks on the worker pool
+    (shared with offloaded object validation) and written with unordered ``insert_many``,
+    with a bounded number of chunks in flight, so memory use doesn't depend on the size of
+    the upload. Searchable fields of the stored objects are indexed, and a ``created`` event
+    is published for each of them, as each chunk is written. Progress is saved to the job
+    document after every chunk so any worker can report it.
+
+    Attributes:
+        job (ImportJob): The job being run.
+    """
+
+    def __init__(self, db, schema: dict, format: ImportFormat, pool: Optional[Executor] = None):
+        self.db = db
+        self.schema = worker_schema(schema)
+        self.job = ImportJob(schema_id=str(schema["_id"]), format=format)
+        self.pool = pool
+        self._header: Optional[List[str]] = None
+        self._created = False
+        self._ready = asyncio.Event()
+        self._started = self._saved_at = time.monotonic()
+
+    async def start(self, stream: AsyncIterator[bytes]) -> ImportJob:
+        """Import an upload as it is received, carrying on in the background once it has been.
+
+        The upload is handed to the import through a small bounded queue, so rows are parsed,
+        validated and written while it arrives, and receiving pauses whenever the import falls
+        behind. The job is returned once the upload is received, while its last chunks are
+        still being written; a CSV header is checked before that.
+
+        Args:
+            stream (AsyncIterator[bytes]): The upload body.
+
+        Returns:
+            ImportJob: The job, running unless it already finished.
+
+        Raises:
+            ImportRejected: If the upload can't be imported, e.g. its CSV header names unknown fields.
+        """
+        await self._create()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=IMPORT_MAX_BUFFERED_READS)
+        task = asyncio.create_task(self.run(self._drain(queue)))
+        _imports.add(task)
+        task.add_done_callback(self._finished)
+        try:
+            async for data in stream:
+                if data and not await self._offer(queue, data, task):
+                    break
+            else:
+                await self._offer(queue, None, task)
+                # Answer a bad CSV header with the upload rather than only in the job
+                await asyncio.wait({asyncio.ensure_future(self._ready.wait()), task},
+                                   return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            # The client went away mid-upload; the job is marked failed
+            task.cancel()
+            raise
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+        return self.job
+
+    @staticmethod
+    async def _offer(queue: asyncio.Queue, data: Optional[bytes], task: asyncio.Task) -> bool:
+        """Queue a piece of the upload, unless the import stops first; returns whether it was queued."""
+        put = asyncio.ensure_future(queue.put(data))
+        await asyncio.wait({put, task}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            return False
+        return True
+
+    @staticmethod
+    async def _drain(queue: asyncio.Queue) -> AsyncIterator[bytes]:
+        while (data := await queue.get()) is not None:
+            yield data
+
+    def _finished(self, task: asyncio.Task):
+        _imports.discard(task)
+        self._ready.set()
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None and not isinstance(error, ImportRejected):
+            logger.error("Import %s into schema %s failed", self.job.id, self.job.schema_id, exc_info=error)
+
+    async def run(self, stream: AsyncIterator[bytes]) -> ImportJob:
+        """Import every row of ``stream``.
+
+        Args:
+            stream (AsyncIterator[bytes]): The upload body.
+
+        Returns:
+            ImportJob: The finished job.
+
+        Raises:
+            ImportRejected: If the upload can't be imported, e.g. its CSV header names unknown fields.
+        """
+        await self._create()
+        reader = RecordReader(self.job.format)
+        pending: deque = deque()
+        chunk: List[Tuple[int, str]] = []
+        try:
+            async for data in self._chunks(stream):
+                self.job.bytes_read += len(data)
+                if self.job.format != "csv":
+                    self._ready.set()
+                for record in reader.feed(data, final=data == b""):
+                    if self.job.format == "csv" and self._header is None:
+                        self._header = self._read_header(record)
+                        self._ready.set()
+                        continue
+                    self.job.rows += 1
+                    chunk.append((self.job.rows, record))
+                    if len(chunk) >= IMPORT_CHUNK_SIZE:
+                        pending.append(self._validate(chunk))
+                        chunk = []
+                    while len(pending) >= IMPORT_MAX_PENDING_CHUNKS:
+                        await self._write(await pending.popleft())
+                # Chunks already validated are written straight away, not only when the next ones back up
+                while pending and pending[0].done():
+                    await self._write(pending.popleft().result())
+                if time.monotonic() - self._saved_at >= IMPORT_PROGRESS_INTERVAL:
+                    # Keeps the bytes received visible while rows are too few to complete a chunk
+                    await self._save()
+            if chunk:
+                pending.append(self._validate(chunk))
+            while pending:
+                await self._write(await pending.popleft())
+        except (Exception, asyncio.CancelledError) as e:
+            for future in pending:
+                future.cancel()
+            await self._fail(e)
+            raise
+
+        self.job.status = "completed"
+        await self._save(finished=True)
+        return self.job
+
+    async def _create(self):
+        if not self._created:
+            await self.db[IMPORT_COLLECTION].insert_one(self.job.model_dump(by_alias=True))
+            self._created = True
+
+    async def _fail(self, error: BaseException):
+        self.job.status = "failed"
+        # A cancelled import, e.g. by the worker shutting down, has no message of its own
+        self.job.detail = str(error) or "Interrupted"
+        await self._save(finished=True)
+
+    @staticmethod
+    async def _chunks(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for data in stream:
+            if data:
+                yield data
+        # An empty read flushes the last row when the upload doesn't end with a line break
+        yield b""
+
+    def _read_header(self, record: str) -> List[str]:
+        header = [name.strip() for name in next(csv.reader([record]))]
+        unknown = sorted(set(header) - set(self.schema.get("fields") or {}))
+        if unknown:
+            raise ImportRejected(f"Unknown fields: {', '.join(unknown)}")
+        return header
+
+    def _validate(self, chunk: List[Tuple[int, str]]) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.pool or process_pool(), validate_chunk,
+                                    self.schema, self.job.format, self._header, chunk)
+
+    async def _write(self, result: tuple):
+        documents, errors = result
+        if documents:
+            rows = [row for row, _ in documents]
+            objects = [document for _, document in documents]
+            try:
+                inserted = await self.db.objects.insert_many(objects, ordered=False)
+                self.job.inserted += len(inserted.inserted_ids)
+            except BulkWriteError as e:
+                self.job.inserted += e.details.get("nInserted", 0)
+                failed = e.details.get("writeErrors", [])
+                errors = errors + [(rows[error["index"]], _write_error(error)) for error in failed]
+                rejected = {error["index"] for error in failed}
+                objects = [document for index, document in enumerate(objects) if index not in rejected]
+            await search.index_objects(self.db, self.schema, objects)
+            for document in objects:
+                broker.publish("created", self.job.schema_id, document["_id"], document)
+        self.job.failed += len(errors)
+        room = IMPORT_MAX_ERRORS - len(self.job.errors)
+        self.job.errors.extend(ImportRowError(row=row, error=error) for row, error in sorted(errors)[:max(room, 0)])
+        await self._save()
+
+    async def _save(self, finished: bool = False):
+        now = datetime.now()
+        self._saved_at = time.monotonic()
+        self.job.updated_at = now
+        if finished:
+            self.job.finished_at = now
+        elapsed = time.monotonic() - self._started
+        self.job.rows_per_second = round(self.job.rows / elapsed, 1) if elapsed else None
+        document = self.job.model_dump(by_alias=True, exclude={"id"})
+        await self.db[IMPORT_COLLECTION].update_one({"_id": self.job.id}, {"$set": document})
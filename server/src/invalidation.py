@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_COLLECTION = "invalidations"
+# Upper bound on how long another worker may keep serving a stale entry after a change is published
+INVALIDATION_POLL_INTERVAL = float(os.environ.get("INVALIDATION_POLL_INTERVAL", "0.5"))
+# ObjectIds are generated by each worker's own clock, so re-scan this far back to catch out-of-order inserts
+INVALIDATION_LOOKBACK_SECONDS = 5
+INVALIDATION_CAPPED_SIZE = 1024 * 1024
+
+
+class InvalidationChannel:
+    """Cross-process cache invalidation channel backed by a capped Mongo collection.
+
+    Every worker process owns one channel. Publishing a message dispatches it to the local
+    handlers straight away and appends it to the shared collection; every other worker picks
+    it up on its next poll, so a change is seen everywhere within ``poll_interval`` seconds.
+
+    Attributes:
+        origin (str): Unique id of this process, used to skip messages it published itself.
+        poll_interval (float): Seconds between polls of the shared collection.
+    """
+
+    def __init__(self, poll_interval: float = INVALIDATION_POLL_INTERVAL):
+        self.origin = uuid4().hex
+        self.poll_interval = poll_interval
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self._seen: deque = deque()
+        self._seen_ids: set = set()
+        self._since: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._outbox: Set[Tuple[str, str]] = set()
+
+    def subscribe(self, kind: str, handler: Callable[[str], None]):
+        """Register a handler called with the key of every message of the given kind.
+
+        Args:
+            kind (str): The message kind, e.g. ``"schema"``.
+            handler (Callable[[str], None]): Called with the invalidated key.
+        """
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def _dispatch(self, kind: str, key: str):
+        for handler in self._handlers.get(kind, []):
+            try:
+                handler(key)
+            except Exception:
+                logger.exception("Invalidation handler failed for %s %s", kind, key)
+
+    async def publish(self, db, kind: str, key: str):
+        """Invalidate ``key`` in this process and broadcast it to every other worker.
+
+        Args:
+            db: The database holding the invalidation collection.
+            kind (str): The message kind.
+            key (str): The key to invalidate.
+        """
+        self._dispatch(kind, key)
+        await db[INVALIDATION_COLLECTION].insert_one(self._message(kind, key))
+
+    def notify(self, kind: str, key: str):
+        """Broadcast ``key`` to every other worker with the next poll, without dispatching it here.
+
+        Meant for changes this process has already applied itself, e.g. object writes its own
+        snapshots followed. Repeated notifications of a key between polls are sent once, so it
+        can be called on every write.
+
+        Args:
+            kind (str): The message kind.
+            key (str): The key to invalidate.
+        """
+        self._outbox.add((kind, key))
+
+    async def flush(self, db):
+        """Send the notifications queued since the previous flush.
+
+        Args:
+            db: The database holding the invalidation collection.
+        """
+        if not self._outbox:
+            return
+        outbox, self._outbox = self._outbox, set()
+        await db[INVALIDATION_COLLECTION].insert_many([self._message(kind, key) for kind, key in outbox])
+
+    def _message(self, kind: str, key: str) -> dict:
+        return {"kind": kind, "key": key, "origin": self.origin, "created_at": datetime.now(timezone.utc)}
+
+    async def poll_once(self, db):
+        """Apply every message published by other workers since the previous poll.
+
+        Args:
+            db: The database holding the invalidation collection.
+        """
+        if self._since is None:
+            self._since = datetime.now(timezone.utc)
+        start = ObjectId.from_datetime(self._since - timedelta(seconds=INVALIDATION_LOOKBACK_SECONDS))
+
+        async for message in db[INVALIDATION_COLLECTION].find({"_id": {"$gt": start}}, sort=[("_id", 1)]):
+            if message["_id"] in self._seen_ids:
+                continue
+            self._remember(message["_id"])
+            if message.get("origin") != self.origin:
+                self._dispatch(message["kind"], message["key"])
+
+        self._since = datetime.now(timezone.utc)
+        self._forget_before(start)
+
+    def _remember(self, message_id: ObjectId):
+        self._seen.append(message_id)
+        self._seen_ids.add(message_id)
+
+    def _forget_before(self, start: ObjectId):
+        while self._seen and self._seen[0] <= start:
+            self._seen_ids.discard(self._seen.popleft())
+
+    async def start(self, db):
+        """Start polling the shared collection in the background, creating it first if needed.
+
+        Args:
+            db: The database holding the invalidation collection.
+        """
+        self._since = datetime.now(timezone.utc)
+        self._task = asyncio.create_task(self._run(db))
+
+    async def _run(self, db):
+        try:
+            await db.create_collection(INVALIDATION_COLLECTION, capped=True, size=INVALIDATION_CAPPED_SIZE)
+        except Exception:
+            # Already created by another worker (or the backend doesn't support capped collections)
+            pass
+
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.flush(db)
+                await self.poll_once(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to poll the invalidation channel")
+
+    async def stop(self):
+        """Stop the background polling task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+channel = InvalidationChannel()
@@ -0,0 +1,115 @@
+import bisect
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _key(name: str, labels: dict) -> Tuple[str, tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+class Histogram:
+    """Fixed-bucket histogram of observed values.
+
+    Attributes:
+        buckets (tuple): Upper bounds of the buckets.
+        counts (list): Observations per bucket, with one extra bucket for values above the last bound.
+        count (int): Total number of observations.
+        total (float): Sum of the observed values.
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in."""
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            seen += count
+            if seen >= target and count:
+                return min(bound, self.max)
+        return self.max
+
+    def report(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.5) if self.count else None,
+            "p99": self.quantile(0.99) if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+
+class Metrics:
+    """In-process registry of counters, histograms and on-demand collectors, reported at GET /metrics.
+
+    Values are per worker process; with several workers each reports its own. Counters and
+    histograms are guarded by a lock, since database monitoring listeners record them from
+    the driver's threads while the event loop reports them.
+    """
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, tuple], float] = defaultdict(float)
+        self._histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        self._collectors: Dict[str, Callable[[], dict]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Add ``value`` to the counter ``name`` with the given labels."""
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record ``value`` in the histogram ``name`` with the given labels."""
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def register_collector(self, name: str, collector: Callable[[], dict]):
+        """Report the result of ``collector()`` under ``name`` each time metrics are read."""
+        self._collectors[name] = collector
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def report(self) -> dict:
+        """Return every metric as JSON-friendly data."""
+        counters, histograms = defaultdict(list), defaultdict(list)
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                counters[name].append({"labels": dict(labels), "value": value})
+            for (name, labels), histogram in self._histograms.items():
+                histograms[name].append({"labels": dict(labels), **histogram.report()})
+        return {
+            "counters": dict(counters),
+            "histograms": dict(histograms),
+            **{name: collector() for name, collector in self._collectors.items()},
+        }
+
+    def reset(self):
+        """Clear every counter and histogram."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,316 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.basemodels.admin_base_models import ROUTE_CLASSES, AdmissionLimits, AdmissionLimitsUpdate
+from src.invalidation import channel
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+API_KEY_HEADER = "x-api-key"
+# Every limits change made through the admin API, replayed in order when a worker starts
+LIMITS_COLLECTION = "admission_limits"
+# Paths that are never limited, so health checks and operators can always get through
+EXEMPT_PATHS = ("/ready", "/metrics", "/admin/", "/docs", "/openapi.json", "/redoc")
+# Streams that stay open indefinitely; they are rate limited but don't hold an execution slot
+LONG_LIVED_PATHS = ("/objects/events",)
+# Allocations asked to wait for an object may take up to ALLOCATION_MAX_WAIT; they don't hold a slot either
+WAITING_PATHS = ("/objects/allocate",)
+# Idle API keys whose buckets are forgotten once more than this many keys have been seen
+MAX_TRACKED_KEYS = 10000
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request or command is rate limited (429) or shed because the server is overloaded (503).
+
+    Attributes:
+        status_code (int): The HTTP status code of the rejection.
+        detail (str): Why it was rejected.
+        retry_after (float): Seconds the client should wait before retrying.
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def client_key(scope: Scope) -> str:
+    """The key a request is rate limited by: its X-API-Key header, falling back to the client address."""
+    key = Headers(scope=scope).get(API_KEY_HEADER)
+    if key:
+        return key
+    client: Optional[Tuple[str, int]] = scope.get("client")
+    return f"ip:{client[0]}" if client else "anonymous"
+
+
+def route_class(method: str, path: str) -> str:
+    """Classify a request as a read, a single-object write or a bulk operation.
+
+    Args:
+        method (str): The HTTP method.
+        path (str): The request path.
+
+    Returns:
+        str: One of ``"read"``, ``"write"`` or ``"bulk"``.
+    """
+    if path.rstrip("/") == "/objects" and method in ("PATCH", "DELETE"):
+        return "bulk"
+    if path.rstrip("/").endswith("/import") and method == "POST":
+        return "bulk"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "read"
+    return "write"
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second up to ``capacity``."""
+
+    def __init__(self, capacity: float):
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, rate: float, capacity: float) -> float:
+        """Take a token if one is available.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until one will be available.
+        """
+        now = time.monotonic()
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / rate
+
+
+class Gate:
+    """Bounds the requests of one route class executing at once, queueing a limited number more.
+
+    Slots are handed directly to the longest-waiting request when one is released, so waiting
+    requests are admitted in FIFO order.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self._waiters: deque = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, max_in_flight: int, max_queue: int, timeout: float) -> bool:
+        """Wait for a slot for at most ``timeout`` seconds.
+
+        Returns:
+            bool: Whether a slot was acquired; if not the request should be shed.
+        """
+        if self.in_flight < max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return True
+        if len(self._waiters) >= max_queue:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        acquired = False
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            acquired = True
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if not acquired:
+                if waiter.done() and not waiter.cancelled():
+                    # A slot was handed over just as the wait timed out or was cancelled; give it back
+                    self.release(max_in_flight)
+                else:
+                    waiter.cancel()
+                    self._waiters.remove(waiter)
+
+    def release(self, max_in_flight: int):
+        """Free a slot and admit waiting requests while there is room under ``max_in_flight``."""
+        self.in_flight -= 1
+        self.admit(max_in_flight)
+
+    def admit(self, max_in_flight: int):
+        """Hand free slots to the longest-waiting requests."""
+        while self._waiters and self.in_flight < max_in_flight:
+            waiter = self._waiters.popleft()
+            self.in_flight += 1
+            waiter.set_result(None)
+
+
+class AdmissionController:
+    """Holds the admission limits, per-key token buckets and per-route-class gates.
+
+    Limits can be changed while the server is running; the new values apply to the next request.
+    """
+
+    def __init__(self, limits: Optional[AdmissionLimits] = None):
+        self.limits = limits or AdmissionLimits()
+        self._buckets: OrderedDict = OrderedDict()
+        self.gates = {name: Gate() for name in ROUTE_CLASSES}
+
+    def update(self, update: AdmissionLimitsUpdate) -> AdmissionLimits:
+        """Apply a partial change to the limits.
+
+        Args:
+            update (AdmissionLimitsUpdate): The limits to change.
+
+        Returns:
+            AdmissionLimits: The limits now in force.
+        """
+        changes = update.model_dump(exclude_none=True)
+        for key in ("max_in_flight", "max_queue"):
+            if key in changes:
+                changes[key] = {**getattr(self.limits, key), **changes[key]}
+        self.limits = self.limits.model_copy(update=changes)
+
+        # Raised in-flight limits admit waiting requests straight away
+        for name, gate in self.gates.items():
+            gate.admit(self.limits.max_in_flight.get(name, 0))
+        return self.limits
+
+    async def save(self, db, update: AdmissionLimitsUpdate):
+        """Record a limits change so workers started later apply it too.
+
+        Args:
+            db: The database holding the limits collection.
+            update (AdmissionLimitsUpdate): The change, as applied by ``update``.
+        """
+        await db[LIMITS_COLLECTION].insert_one({
+            "update": update.model_dump_json(exclude_none=True), "created_at": datetime.now(timezone.utc)
+        })
+
+    async def load(self, db) -> AdmissionLimits:
+        """Apply every recorded limits change on top of the limits configured in the environment.
+
+        Args:
+            db: The database holding the limits collection.
+
+        Returns:
+            AdmissionLimits: The limits now in force.
+        """
+        async for change in db[LIMITS_COLLECTION].find({}, sort=[("_id", 1)]):
+            try:
+                self.update(AdmissionLimitsUpdate.model_validate_json(change["update"]))
+            except ValueError:
+                logger.exception("Ignoring invalid admission limits change %s", change["_id"])
+        return self.limits
+
+    async def admit(self, key: str, name: str, hold_slot: bool = True) -> bool:
+        """Rate limit ``key`` and, if ``hold_slot``, wait for an execution slot of route class ``name``.
+
+        Args:
+            key (str): The API key or client the work is done for.
+            name (str): The route class.
+            hold_slot (bool): Whether the work needs an execution slot; long-lived work only takes a token.
+
+        Returns:
+            bool: Whether a slot is held, to be given back with ``release``.
+
+        Raises:
+            AdmissionRejected: If ``key`` is over its rate, or no slot was free within the queueing budget.
+        """
+        wait = self.take_token(key)
+        if wait:
+            metrics.increment("admission_rejected", reason="rate_limited", route_class=name)
+            raise AdmissionRejected(429, "Rate limit exceeded", wait)
+        if not hold_slot:
+            return False
+        limits = self.limits
+        if not await self.gates[name].acquire(limits.max_in_flight.get(name, 0), limits.max_queue.get(name, 0),
+                                              limits.queue_timeout):
+            metrics.increment("admission_rejected", reason="overloaded", route_class=name)
+            raise AdmissionRejected(503, "Server overloaded, retry later", 1)
+        return True
+
+    def release(self, name: str):
+        """Give back an execution slot of route class ``name`` taken by ``admit``."""
+        self.gates[name].release(self.limits.max_in_flight.get(name, 0))
+
+    def take_token(self, key: str) -> float:
+        """Take a token from ``key``'s bucket, returning the seconds to wait if there is none."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.limits.burst)
+            if len(self._buckets) > MAX_TRACKED_KEYS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(self.limits.rate_per_second, self.limits.burst)
+
+    def report(self) -> dict:
+        return {
+            name: {"in_flight": gate.in_flight, "queued": gate.queued,
+                   "max_in_flight": self.limits.max_in_flight.get(name, 0)}
+            for name, gate in self.gates.items()
+        }
+
+
+admission = AdmissionController()
+metrics.register_collector("admission", admission.report)
+channel.subscribe("admission_limits", lambda key: admission.update(AdmissionLimitsUpdate.model_validate_json(key)))
+
+
+class AdmissionMiddleware:
+    """Rate limit each API key and bound the concurrency of each route class.
+
+    Requests are identified by the X-API-Key header, falling back to the client address.
+    A key over its rate gets 429; a request that can't get an execution slot within the
+    queueing latency budget, or finds the queue full, gets 503. Both carry Retry-After.
+    WebSocket connections are rate limited when they open, and closed with 1013 (try again
+    later) if over the rate; the commands sent over them are admitted one by one by the route.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket") or scope["path"].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        if scope["type"] == "websocket":
+            name, hold_slot = "write", False
+        else:
+            name, hold_slot = route_class(scope["method"], scope["path"]), not self._long_lived(scope)
+        try:
+            held = await self.controller.admit(client_key(scope), name, hold_slot)
+        except AdmissionRejected as e:
+            if scope["type"] == "websocket":
+                await send({"type": "websocket.close", "code": 1013})
+                return
+            await self._reject(e.status_code, e.detail, e.retry_after)(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if held:
+                self.controller.release(name)
+
+    @staticmethod
+    def _long_lived(scope: Scope) -> bool:
+        if scope["path"].startswith(LONG_LIVED_PATHS):
+            return True
+        return scope["path"].rstrip("/") in WAITING_PATHS and b"wait=" in scope.get("query_string", b"")
+
+    @staticmethod
+    def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+        return JSONResponse({"detail": detail}, status_code=status_code,
+                            headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
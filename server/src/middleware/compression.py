@@ -0,0 +1,245 @@
+import os
+import time
+import zlib
+from typing import Callable, Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # listed in requirements.txt; without it br isn't offered
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # listed in requirements.txt; without it zstd isn't offered
+    zstandard = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_LEVEL = int(os.environ.get("COMPRESSION_BROTLI_LEVEL", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.environ.get("COMPRESSION_ZSTD_LEVEL", "3"))
+# Content types that must reach the client unbuffered, e.g. the object event stream
+UNCOMPRESSED_CONTENT_TYPES = ("text/event-stream",)
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encodings() -> Dict[str, Callable[[], object]]:
+    """Return the supported encodings, most preferred first, mapped to a compressor factory."""
+    encodings = {}
+    if zstandard is not None:
+        encodings["zstd"] = lambda: _ZstdCompressor(COMPRESSION_ZSTD_LEVEL)
+    if brotli is not None:
+        encodings["br"] = lambda: _BrotliCompressor(COMPRESSION_BROTLI_LEVEL)
+    encodings["gzip"] = lambda: _GzipCompressor(COMPRESSION_GZIP_LEVEL)
+    return encodings
+
+
+def negotiate(accept_encoding: str, supported) -> Optional[str]:
+    """Pick the most preferred supported encoding the client accepts.
+
+    Args:
+        accept_encoding (str): The request's Accept-Encoding header.
+        supported: Supported encodings in order of preference.
+
+    Returns:
+        Optional[str]: The encoding to use, or None to send the response uncompressed.
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+
+    for encoding in supported:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """Compress responses with the best encoding both sides support (zstd, br or gzip).
+
+    Bodies are compressed incrementally as the application sends them, and each streamed
+    chunk is flushed, so streaming responses are never buffered beyond ``minimum_size`` bytes
+    and the client can decode every chunk as it arrives. Bytes in/out and the CPU
+    time spent compressing are recorded per encoding in the metrics registry.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.encodings[encoding], self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Wraps ``send`` for a single response, deciding whether and how to compress it."""
+
+    def __init__(self, send: Send, encoding: str, compressor_factory: Callable[[], object], minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.compressor_factory = compressor_factory
+        self.minimum_size = minimum_size
+        self._start: Optional[Message] = None
+        self._buffer = b""
+        self._compressor = None
+        self._passthrough = False
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._cpu = 0.0
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self._passthrough = "content-encoding" in headers or content_type.startswith(UNCOMPRESSED_CONTENT_TYPES)
+            if self._passthrough:
+                await self._send(message)
+            else:
+                self._start = message
+            return
+
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._compressor is None:
+            self._buffer += body
+            if len(self._buffer) < self.minimum_size:
+                if not more_body:
+                    await self._send(self._start)
+                    await self._send({"type": "http.response.body", "body": self._buffer})
+                return
+            await self._begin()
+            body, self._buffer = self._buffer, b""
+
+        output = self._compress(body, flush=more_body)
+        if more_body:
+            if output:
+                await self._send({"type": "http.response.body", "body": output, "more_body": True})
+            return
+
+        output += self._finish()
+        await self._send({"type": "http.response.body", "body": output})
+        self._record()
+
+    async def _begin(self):
+        self._compressor = self.compressor_factory()
+        headers = MutableHeaders(raw=self._start["headers"])
+        del headers["content-length"]
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("accept-encoding")
+        await self._send(self._start)
+
+    def _compress(self, data: bytes, flush: bool = False) -> bytes:
+        started = time.thread_time()
+        output = self._compressor.compress(data)
+        if flush:
+            output += self._compressor.flush()
+        self._cpu += time.thread_time() - started
+        self._bytes_in += len(data)
+        self._bytes_out += len(output)
+        return output
+
+    def _finish(self) -> bytes:
+        started = time.thread_time()
+        output = self._compressor.finish()
+        self._cpu += time.thread_time() - started
+        self._bytes_out += len(output)
+        return output
+
+    def _record(self):
+        metrics.increment("compression_responses", encoding=self.encoding)
+        metrics.increment("compression_bytes_in", self._bytes_in, encoding=self.encoding)
+        metrics.increment("compression_bytes_out", self._bytes_out, encoding=self.encoding)
+        metrics.increment("compression_cpu_seconds", self._cpu, encoding=self.encoding)
+
+
+def compression_report() -> dict:
+    """Summarise bytes saved against CPU spent for each encoding used so far."""
+    report = {}
+    for encoding in available_encodings():
+        bytes_in = metrics.counter("compression_bytes_in", encoding=encoding)
+        if not bytes_in:
+            continue
+        bytes_out = metrics.counter("compression_bytes_out", encoding=encoding)
+        cpu = metrics.counter("compression_cpu_seconds", encoding=encoding)
+        report[encoding] = {
+            "responses": metrics.counter("compression_responses", encoding=encoding),
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "ratio": round(bytes_out / bytes_in, 4),
+            "cpu_seconds": round(cpu, 6),
+            "bytes_saved_per_cpu_ms": round((bytes_in - bytes_out) / (cpu * 1000), 1) if cpu else None,
+        }
+    return report
+
+
+metrics.register_collector("compression", compression_report)
@@ -0,0 +1,42 @@
+import re
+from uuid import uuid4
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.monitoring import request_id
+
+REQUEST_ID_HEADER = "x-request-id"
+# Ids supplied by clients are only trusted if they look like one, so they are safe to log
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class RequestIdMiddleware:
+    """Give every HTTP request an id, available to the code serving it through ``monitoring.request_id``.
+
+    The id comes from the X-Request-ID header when the client (or a proxy) sent a valid one,
+    and is generated otherwise. It is returned in the response's X-Request-ID header, so a
+    slow-operation log line can be matched to the call that caused it.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        supplied = Headers(scope=scope).get(REQUEST_ID_HEADER)
+        current = supplied if supplied and _VALID_REQUEST_ID.match(supplied) else uuid4().hex
+        token = request_id.set(current)
+
+        async def send_with_id(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = current
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
@@ -0,0 +1,137 @@
+import logging
+import os
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Database commands slower than this (seconds) are logged with their filter shape and request id
+SLOW_OPERATION_SECONDS = float(os.environ.get("SLOW_OPERATION_SECONDS", "0.1"))
+
+# Id of the HTTP request being served, set by RequestIdMiddleware. Motor runs commands on its
+# executor with a copy of the caller's context, so command listeners see the request's id.
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Where each command keeps its filter, or the list of statements whose filters are under "q"
+_FILTER_KEYS = {
+    "find": "filter", "count": "query", "findAndModify": "query", "distinct": "query",
+    "aggregate": "pipeline", "update": "updates", "delete": "deletes",
+}
+
+
+def redact(value: Any) -> Any:
+    """The shape of a filter: its field names and operators, with every value replaced by ``"?"``."""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Operators like $and take lists of filters; lists of plain values are collapsed
+        shapes = [redact(item) for item in value if isinstance(item, dict)]
+        return shapes or "?"
+    return "?"
+
+
+def command_shape(command_name: str, command: dict) -> Any:
+    """The redacted filter of a database command, or None if it has none (e.g. an insert)."""
+    key = _FILTER_KEYS.get(command_name)
+    if key is None or key not in command:
+        return None
+    if command_name in ("update", "delete"):
+        return [redact(statement.get("q", {})) for statement in command[key][:1]]
+    return redact(command[key])
+
+
+def _collection(command_name: str, command: dict) -> str:
+    name = command.get("collection") if command_name == "getMore" else command.get(command_name)
+    return name if isinstance(name, str) else "-"
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Records the latency of every database command per collection and command, and logs slow ones.
+
+    Listener methods run on Motor's executor threads; their calls into the metrics registry
+    are serialised by the registry's lock, so concurrent commands are all counted.
+
+    Attributes:
+        slow_seconds (float): Commands taking longer than this are logged.
+    """
+
+    def __init__(self, slow_seconds: float = SLOW_OPERATION_SECONDS):
+        self.slow_seconds = slow_seconds
+        self._started: Dict[Tuple[Any, int], Tuple[str, Any, Optional[str]]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        command = event.command
+        self._started[(event.connection_id, event.request_id)] = (
+            _collection(event.command_name, command), command_shape(event.command_name, command), request_id.get()
+        )
+
+    def _finished(self, event, outcome: str):
+        collection, shape, request = self._started.pop((event.connection_id, event.request_id), ("-", None, None))
+        seconds = event.duration_micros / 1e6
+        metrics.observe("db_command_seconds", seconds, collection=collection, command=event.command_name)
+        if outcome != "ok":
+            metrics.increment("db_command_failures", collection=collection, command=event.command_name)
+        if seconds > self.slow_seconds:
+            logger.warning("Slow %s on %s took %.1f ms (%s, request %s): filter %s", event.command_name, collection,
+                           seconds * 1000, outcome, request or "-", shape)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event, "ok")
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event, "failed")
+
+
+class PoolTimer(monitoring.ConnectionPoolListener):
+    """Records how long commands wait to check a connection out of the pool, and logs long waits.
+
+    Attributes:
+        slow_seconds (float): Waits longer than this are logged.
+    """
+
+    def __init__(self, slow_seconds: float = SLOW_OPERATION_SECONDS):
+        self.slow_seconds = slow_seconds
+
+    def _waited(self, event, outcome: str):
+        metrics.observe("db_pool_wait_seconds", event.duration)
+        if event.duration > self.slow_seconds:
+            logger.warning("Waited %.1f ms for a connection to %s (%s, request %s)",
+                           event.duration * 1000, event.address, outcome, request_id.get() or "-")
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent):
+        self._waited(event, "ok")
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent):
+        metrics.increment("db_pool_checkout_failures", reason=str(event.reason))
+        self._waited(event, str(event.reason))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
@@ -0,0 +1,22 @@
+import os
+
+from src.events import broker
+from src.metrics import metrics
+from src.read_cache import ReadThroughCache
+
+# Number of objects kept per process
+OBJECT_CACHE_SIZE = int(os.environ.get("OBJECT_CACHE_SIZE", "10000"))
+# Writes served by other workers are only seen once an entry expires, so keep this short
+OBJECT_CACHE_MAX_AGE = float(os.environ.get("OBJECT_CACHE_MAX_AGE", "1"))
+
+object_cache = ReadThroughCache("objects", OBJECT_CACHE_SIZE, OBJECT_CACHE_MAX_AGE)
+
+
+def on_event(event_type: str, _schema_id: str, object_id, _data):
+    """Drop an object from the cache whenever this worker changes it (update, delete, reserve, release)."""
+    if event_type != "created":
+        object_cache.invalidate(str(object_id))
+
+
+broker.add_listener(on_event)
+metrics.register_collector("object_cache", object_cache.stats)
@@ -0,0 +1,107 @@
+import asyncio
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class ReadThroughCache:
+    """Bounded LRU cache that loads missing entries itself, one load per key at a time.
+
+    Concurrent misses for the same key share a single load ("single flight"), so a burst
+    of requests for a hot entry costs one database call. The load runs in its own task, so
+    a caller that gives up does not cancel it for the others. A key invalidated while its
+    load is in flight is not filled with the (possibly stale) result. Loads returning None
+    are not cached.
+
+    Attributes:
+        name (str): Name the cache's statistics are reported under.
+        max_size (int): Number of entries kept before the least recently used is evicted.
+        max_age (float): Seconds an entry is served before it is reloaded.
+    """
+
+    def __init__(self, name: str, max_size: int, max_age: float):
+        self.name = name
+        self.max_size = max_size
+        self.max_age = max_age
+        self._entries: OrderedDict = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value without loading it or counting a hit or miss."""
+        entry: Optional[Tuple[Any, float]] = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[1] >= self.max_age:
+            return None
+        return entry[0]
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        """Return the cached value for ``key``, calling ``loader`` on a miss.
+
+        Args:
+            key (Hashable): The cache key.
+            loader (Callable[[], Awaitable[Any]]): Loads the value; only called if no load of ``key`` is running.
+
+        Returns:
+            Optional[Any]: The value, or None if the loader found nothing.
+        """
+        value = self.peek(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+        load = self._loading.get(key)
+        if load is None:
+            self.misses += 1
+            load = self._loading[key] = asyncio.ensure_future(loader())
+            load.add_done_callback(partial(self._loaded, key))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(load)
+
+    def _loaded(self, key: Hashable, load: asyncio.Future):
+        if self._loading.get(key) is not load:
+            # Invalidated while loading
+            return
+        del self._loading[key]
+        if load.cancelled() or load.exception() is not None:
+            return
+        value = load.result()
+        if value is None:
+            self._entries.pop(key, None)
+        else:
+            self.put(key, value)
+
+    def put(self, key: Hashable, value: Any):
+        """Cache ``value`` under ``key``, evicting the least recently used entry if the cache is full."""
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Drop ``key`` and discard the result of any load of it already in flight."""
+        self._entries.pop(key, None)
+        self._loading.pop(key, None)
+
+    def clear(self):
+        """Drop every entry and discard the results of loads in flight."""
+        self._entries.clear()
+        self._loading.clear()
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / requests, 4) if requests else None,
+        }
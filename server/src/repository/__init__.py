@@ -0,0 +1,9 @@
+from src.repository.base import Database, Repository, ensure_indexes
+from src.repository.memory import InMemoryDatabase, InMemoryRepository
+from src.repository.mongo import MongoDatabase, MongoRepository
+
+__all__ = [
+    "Database", "Repository", "ensure_indexes",
+    "InMemoryDatabase", "InMemoryRepository",
+    "MongoDatabase", "MongoRepository",
+]
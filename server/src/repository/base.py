@@ -0,0 +1,212 @@
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+
+from pymongo.errors import OperationFailure
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+# A sort or index specification: a field name or a list of (field, direction) pairs
+Keys = Union[str, Sequence[Tuple[str, int]]]
+
+
+def normalize_keys(keys: Keys) -> List[Tuple[str, int]]:
+    """Turn a field name or a list of (field, direction) pairs into a list of pairs."""
+    if isinstance(keys, str):
+        return [(keys, 1)]
+    return [(key, direction) for key, direction in keys]
+
+
+def index_name(keys: Keys) -> str:
+    """The name MongoDB gives an index on ``keys`` when none is given, e.g. ``"schema_id_1_fields.imsi_1"``."""
+    return "_".join(f"{field}_{direction}" for field, direction in normalize_keys(keys))
+
+
+class Repository(ABC):
+    """Storage for one collection of documents (schemas, objects, invalidation messages...).
+
+    Queries, updates and projections use MongoDB syntax and results use pymongo's result
+    types, so every backend behaves the same way to the code above it. Single-document
+    operations, including the find-and-modify ones, are atomic.
+    """
+
+    @abstractmethod
+    async def find_one(self, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        """Return the first document matching ``query``, or None."""
+
+    @abstractmethod
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, sort: Optional[Keys] = None,
+             skip: int = 0, limit: int = 0) -> AsyncIterator[dict]:
+        """Iterate over the documents matching ``query``.
+
+        Args:
+            query (Optional[dict]): The filter; every document if omitted.
+            projection (Optional[dict]): The fields to return or leave out.
+            sort (Optional[Keys]): The order to return documents in.
+            skip (int): Number of documents to skip.
+            limit (int): Maximum number of documents to return; 0 for no limit.
+
+        Returns:
+            AsyncIterator[dict]: The matching documents.
+        """
+
+    async def find_page(self, query: dict, limit: int, after: Any = None,
+                        projection: Optional[dict] = None) -> List[dict]:
+        """Return up to ``limit`` documents in _id order, starting after the document with id ``after``.
+
+        Keyset pagination costs the same for every page, unlike skipping over earlier pages.
+
+        Args:
+            query (dict): The filter.
+            limit (int): The page size.
+            after: The _id of the last document of the previous page, or None for the first page.
+            projection (Optional[dict]): The fields to return or leave out.
+
+        Returns:
+            List[dict]: The page of documents.
+        """
+        if after is not None:
+            query = {"$and": [query, {"_id": {"$gt": after}}]}
+        return [document async for document in self.find(query, projection, sort=[("_id", 1)], limit=limit)]
+
+    @abstractmethod
+    async def insert_one(self, document: dict) -> InsertOneResult:
+        """Insert a document, assigning it an ObjectId if it has no _id."""
+
+    @abstractmethod
+    async def insert_many(self, documents: List[dict], ordered: bool = True) -> InsertManyResult:
+        """Insert several documents.
+
+        Args:
+            documents (List[dict]): The documents.
+            ordered (bool): Stop at the first failure; otherwise insert every document that can be.
+
+        Raises:
+            pymongo.errors.BulkWriteError: If any document could not be inserted.
+        """
+
+    @abstractmethod
+    async def update_one(self, query: dict, update: dict) -> UpdateResult:
+        """Apply ``update`` to the first document matching ``query``."""
+
+    @abstractmethod
+    async def update_many(self, query: dict, update: dict) -> UpdateResult:
+        """Apply ``update`` to every document matching ``query``."""
+
+    @abstractmethod
+    async def find_one_and_update(self, query: dict, update: dict, projection: Optional[dict] = None,
+                                  sort: Optional[Keys] = None, return_document: bool = False) -> Optional[dict]:
+        """Atomically update the first document matching ``query`` and return it.
+
+        Args:
+            query (dict): The filter.
+            update (dict): The update operators to apply.
+            projection (Optional[dict]): The fields to return or leave out.
+            sort (Optional[Keys]): Which document to update when several match.
+            return_document (bool): ``ReturnDocument.AFTER`` to return the updated document instead of the original.
+
+        Returns:
+            Optional[dict]: The document, or None if nothing matched.
+        """
+
+    @abstractmethod
+    async def find_one_and_delete(self, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        """Atomically delete the first document matching ``query`` and return it."""
+
+    @abstractmethod
+    async def delete_one(self, query: dict) -> DeleteResult:
+        """Delete the first document matching ``query``."""
+
+    @abstractmethod
+    async def delete_many(self, query: dict) -> DeleteResult:
+        """Delete every document matching ``query``."""
+
+    @abstractmethod
+    async def count_documents(self, query: dict) -> int:
+        """Count the documents matching ``query``."""
+
+    @abstractmethod
+    async def create_index(self, keys: Keys, unique: bool = False, name: Optional[str] = None,
+                           partial_filter: Optional[dict] = None, expire_after: Optional[int] = None) -> str:
+        """Create an index if it does not already exist.
+
+        Args:
+            keys (Keys): The indexed fields.
+            unique (bool): Reject documents whose indexed values are already used.
+            name (Optional[str]): The index name; derived from the keys if omitted.
+            partial_filter (Optional[dict]): Only index documents matching this filter.
+            expire_after (Optional[int]): Delete documents this many seconds after the (datetime) indexed field.
+
+        Returns:
+            str: The index name.
+        """
+
+    @abstractmethod
+    async def drop_index(self, name: str):
+        """Drop the index ``name``.
+
+        Raises:
+            pymongo.errors.OperationFailure: If there is no such index.
+        """
+
+
+class Database(ABC):
+    """A set of repositories, one per collection name.
+
+    ``schemas`` and ``objects`` are the application's own collections; other components
+    (e.g. the invalidation channel) use their own collections by name.
+    """
+
+    @abstractmethod
+    def __getitem__(self, name: str) -> Repository:
+        """Return the repository for the collection ``name``."""
+
+    @abstractmethod
+    async def create_collection(self, name: str, **options) -> Repository:
+        """Create a collection with backend-specific options (e.g. ``capped=True``).
+
+        Raises:
+            Exception: If the collection already exists.
+        """
+
+    @property
+    def schemas(self) -> Repository:
+        return self["schemas"]
+
+    @property
+    def objects(self) -> Repository:
+        return self["objects"]
+
+
+# Indexes every deployment needs, created at startup: {collection: [(keys, options)]}
+INDEXES: Dict[str, List[Tuple[Keys, dict]]] = {
+    "schemas": [([("schema_name", 1)], {})],
+    # Objects are almost always queried by schema and walked in _id order (bulk operations, pagination, allocation)
+    "objects": [([("schema_id", 1), ("_id", 1)], {})],
+}
+
+
+async def ensure_indexes(db: Database):
+    """Create the indexes in INDEXES that don't exist yet.
+
+    Args:
+        db (Database): The application database.
+    """
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            await db[collection].create_index(keys, **options)
+
+
+async def drop_index_if_exists(repository: Repository, name: str):
+    """Drop the index ``name`` unless it is already gone.
+
+    Another worker may drop the same index at the same time, e.g. while deleting a schema too.
+
+    Args:
+        repository (Repository): The collection holding the index.
+        name (str): The index name.
+    """
+    try:
+        await repository.drop_index(name)
+    except OperationFailure as e:
+        # IndexNotFound; anything else is a real failure
+        if e.code != 27:
+            raise
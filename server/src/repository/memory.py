@@ -0,0 +1,432 @@
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from src.repository.base import Database, Keys, Repository, index_name, normalize_keys
+from src.repository.query import MISSING, get_path, is_operators, matches
+
+# Documents returned by find() between yields to the event loop, like a cursor fetching batches
+FIND_BATCH_SIZE = 100
+# Seconds between sweeps for documents past a TTL index's expiry, as MongoDB's TTL monitor runs periodically
+TTL_SWEEP_INTERVAL = 1.0
+
+
+def _copy(value):
+    """Copy a document deeply enough that callers can't change what is stored."""
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def _set(document: dict, path: str, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+        if not isinstance(document, dict):
+            raise OperationFailure(f"Cannot create field '{last}' in non-object '{part}'")
+    document[last] = value
+
+
+def _unset(document: dict, path: str):
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(last, None)
+
+
+def project(document: dict, projection: Optional[dict]) -> dict:
+    """Return a copy of ``document`` with a MongoDB inclusion or exclusion projection applied."""
+    if not projection:
+        return _copy(document)
+    included = [key for key, value in projection.items() if value and key != "_id"]
+    if included:
+        result = {}
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        for path in included:
+            value = get_path(document, path)
+            if value is not MISSING:
+                _set(result, path, _copy(value))
+        return result
+
+    result = _copy(document)
+    for path, value in projection.items():
+        if not value:
+            _unset(result, path)
+    return result
+
+
+def apply_update(document: dict, update: dict) -> dict:
+    """Return a copy of ``document`` with MongoDB update operators applied."""
+    if not update or not all(key.startswith("$") for key in update):
+        raise OperationFailure("Update document requires atomic operators")
+    result = _copy(document)
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            if path == "_id" or path.startswith("_id."):
+                raise OperationFailure("Performing an update on the path '_id' would modify the immutable field '_id'")
+            if operator == "$set":
+                _set(result, path, _copy(value))
+            elif operator == "$unset":
+                _unset(result, path)
+            elif operator == "$inc":
+                current = get_path(result, path)
+                _set(result, path, (0 if current is MISSING else current) + value)
+            elif operator == "$push":
+                current = get_path(result, path)
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                _set(result, path, (list(current) if current is not MISSING else []) + _copy(items))
+            else:
+                raise OperationFailure(f"Unsupported update operator {operator}")
+    return result
+
+
+# BSON comparison order of types, so sorting mixed or missing values behaves like MongoDB
+def _sort_key(value) -> tuple:
+    if value is MISSING or value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (6, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, ObjectId):
+        return (5, value)
+    if isinstance(value, datetime):
+        return (7, value)
+    return (3 if isinstance(value, dict) else 4, repr(value))
+
+
+def sort_documents(documents: List[dict], sort: Keys, limit: int = 0) -> List[dict]:
+    """Sort documents by a MongoDB sort specification, keeping only the first ``limit`` if given."""
+    keys = normalize_keys(sort)
+    if limit and len(keys) == 1:
+        (path, direction), = keys
+        select = heapq.nsmallest if direction > 0 else heapq.nlargest
+        return select(limit, documents, key=lambda document: _sort_key(get_path(document, path)))
+    documents = list(documents)
+    for path, direction in reversed(keys):
+        documents.sort(key=lambda document: _sort_key(get_path(document, path)), reverse=direction < 0)
+    return documents[:limit] if limit else documents
+
+
+def _hashable(value):
+    if value is MISSING:
+        return None
+    if isinstance(value, dict):
+        return repr(value)
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+class _Index:
+    """Hash index on one or more fields, with a lookup by its first field for compound indexes.
+
+    An index on an array field indexes each element, like a MongoDB multikey index.
+    """
+
+    def __init__(self, name: str, keys: List[Tuple[str, int]], unique: bool, partial_filter: Optional[dict]):
+        self.name = name
+        self.fields = [field for field, _ in keys]
+        self.key_pattern = dict(keys)
+        self.unique = unique
+        self.partial_filter = partial_filter
+        self.entries: Dict[tuple, Dict[Any, None]] = {}
+        self.by_first: Dict[Any, Dict[Any, None]] = {}
+
+    def keys_of(self, document: dict) -> List[tuple]:
+        if self.partial_filter is not None and not matches(document, self.partial_filter):
+            return []
+        values = []
+        for field in self.fields:
+            value = get_path(document, field)
+            # An empty array is still indexed, so lookups on the other fields of a compound index find the document
+            if isinstance(value, list):
+                values.append(list(dict.fromkeys(map(_hashable, value))) or [None])
+            else:
+                values.append([_hashable(value)])
+        return list(itertools.product(*values))
+
+    def check(self, document: dict):
+        """Raise DuplicateKeyError if a different document already uses ``document``'s unique key."""
+        if not self.unique:
+            return
+        for key in self.keys_of(document):
+            if any(_id != document["_id"] for _id in self.entries.get(key, ())):
+                key_value = dict(zip(self.fields, key))
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error index: {self.name} dup key: {key_value}", 11000,
+                    {"code": 11000, "keyPattern": self.key_pattern, "keyValue": key_value}
+                )
+
+    def add(self, document: dict):
+        for key in self.keys_of(document):
+            self.entries.setdefault(key, {})[document["_id"]] = None
+            if len(self.fields) > 1:
+                self.by_first.setdefault(key[0], {})[document["_id"]] = None
+
+    def remove(self, document: dict):
+        for key in self.keys_of(document):
+            self._discard(self.entries, key, document["_id"])
+            if len(self.fields) > 1:
+                self._discard(self.by_first, key[0], document["_id"])
+
+    @staticmethod
+    def _discard(entries: dict, key, _id):
+        bucket = entries.get(key)
+        if bucket is not None:
+            bucket.pop(_id, None)
+            if not bucket:
+                del entries[key]
+
+    def lookup(self, equalities: Dict[str, list]) -> Optional[List[Any]]:
+        """Return the ids of the documents that may match the equality conditions, or None if the index can't help."""
+        if self.partial_filter is not None or self.fields[0] not in equalities:
+            return None
+        if len(self.fields) == 1:
+            return [_id for value in equalities[self.fields[0]] for _id in self.entries.get((value,), ())]
+        if all(field in equalities and len(equalities[field]) == 1 for field in self.fields):
+            return list(self.entries.get(tuple(equalities[field][0] for field in self.fields), ()))
+        return [_id for value in equalities[self.fields[0]] for _id in self.by_first.get(value, ())]
+
+
+def _equalities(query: dict) -> Dict[str, list]:
+    """Collect the values each field must equal for ``query`` to match, from top-level and $and conditions."""
+    found: Dict[str, list] = {}
+    for key, condition in query.items():
+        if key == "$and":
+            for item in condition:
+                for field, values in _equalities(item).items():
+                    found.setdefault(field, values)
+        elif key.startswith("$"):
+            continue
+        elif is_operators(condition):
+            if "$eq" in condition and not isinstance(condition["$eq"], (dict, list)):
+                found[key] = [_hashable(condition["$eq"])]
+            elif "$in" in condition and not any(isinstance(item, (dict, list)) for item in condition["$in"]):
+                found[key] = [_hashable(item) for item in condition["$in"]]
+            elif condition.get("$all") and not isinstance(condition["$all"][0], (dict, list)):
+                # Every element must be present, so any one of them narrows the search
+                found[key] = [_hashable(condition["$all"][0])]
+        elif not isinstance(condition, (dict, list)):
+            found[key] = [_hashable(condition)]
+    return found
+
+
+class InMemoryRepository(Repository):
+    """Repository holding its documents in process memory.
+
+    Every operation yields to the event loop once, as a database round trip would, and then
+    runs to completion without yielding again, so single-document operations are atomic and
+    concurrent requests interleave as they would against MongoDB. Hash indexes on equality
+    conditions narrow the documents a query has to look at, and unique indexes (including
+    partial ones) are enforced, and TTL indexes expire documents.
+    """
+
+    def __init__(self):
+        self._documents: Dict[Any, dict] = {}
+        self._indexes: Dict[str, _Index] = {}
+        self._ttl: Optional[Tuple[str, int]] = None
+        self._swept_at = 0.0
+
+    def _expire(self):
+        if self._ttl is None or time.monotonic() - self._swept_at < TTL_SWEEP_INTERVAL:
+            return
+        self._swept_at = time.monotonic()
+        path, seconds = self._ttl
+        cutoff = datetime.now() - timedelta(seconds=seconds)
+        for document in [document for document in self._documents.values()
+                         if isinstance(get_path(document, path), datetime) and get_path(document, path) < cutoff]:
+            self._delete(document)
+
+    def _candidates(self, query: dict) -> Iterable[dict]:
+        equalities = _equalities(query)
+        if "_id" in equalities:
+            ids = equalities["_id"]
+        else:
+            lookups = [index.lookup(equalities) for index in self._indexes.values()]
+            lookups = [ids for ids in lookups if ids is not None]
+            if not lookups:
+                return list(self._documents.values())
+            ids = min(lookups, key=len)
+        return [self._documents[_id] for _id in dict.fromkeys(ids) if _id in self._documents]
+
+    def _matching(self, query: Optional[dict], sort: Optional[Keys] = None, limit: int = 0) -> List[dict]:
+        self._expire()
+        query = query or {}
+        documents = [document for document in self._candidates(query) if matches(document, query)]
+        if sort:
+            return sort_documents(documents, sort, limit)
+        return documents[:limit] if limit else documents
+
+    def _store(self, document: dict, previous: Optional[dict] = None):
+        for index in self._indexes.values():
+            index.check(document)
+        if previous is not None:
+            for index in self._indexes.values():
+                index.remove(previous)
+        self._documents[document["_id"]] = document
+        for index in self._indexes.values():
+            index.add(document)
+
+    def _delete(self, document: dict):
+        del self._documents[document["_id"]]
+        for index in self._indexes.values():
+            index.remove(document)
+
+    def _insert(self, document: dict) -> Any:
+        if "_id" not in document:
+            # Like pymongo, the generated id is added to the caller's document
+            document["_id"] = ObjectId()
+        if document["_id"] in self._documents:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error index: _id_ dup key: {{_id: {document['_id']!r}}}", 11000,
+                {"code": 11000, "keyPattern": {"_id": 1}, "keyValue": {"_id": document["_id"]}}
+            )
+        self._store(_copy(document))
+        return document["_id"]
+
+    def _update(self, document: dict, update: dict) -> Tuple[dict, bool]:
+        updated = apply_update(document, update)
+        if updated == document:
+            return document, False
+        self._store(updated, previous=document)
+        return updated, True
+
+    async def find_one(self, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        await asyncio.sleep(0)
+        found = self._matching(query, limit=1)
+        return project(found[0], projection) if found else None
+
+    async def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, sort: Optional[Keys] = None,
+                   skip: int = 0, limit: int = 0) -> AsyncIterator[dict]:
+        await asyncio.sleep(0)
+        documents = self._matching(query, sort, skip + limit if limit else 0)[skip:]
+        for position, document in enumerate(documents):
+            if position and position % FIND_BATCH_SIZE == 0:
+                await asyncio.sleep(0)
+            yield project(document, projection)
+
+    async def insert_one(self, document: dict) -> InsertOneResult:
+        await asyncio.sleep(0)
+        return InsertOneResult(self._insert(document), True)
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True) -> InsertManyResult:
+        await asyncio.sleep(0)
+        inserted, errors = [], []
+        for position, document in enumerate(documents):
+            try:
+                inserted.append(self._insert(document))
+            except DuplicateKeyError as e:
+                errors.append({**e.details, "index": position, "errmsg": str(e), "op": document})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({
+                "writeErrors": errors, "writeConcernErrors": [], "nInserted": len(inserted),
+                "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [],
+            })
+        return InsertManyResult(inserted, True)
+
+    async def update_one(self, query: dict, update: dict) -> UpdateResult:
+        await asyncio.sleep(0)
+        found = self._matching(query, limit=1)
+        modified = found and self._update(found[0], update)[1]
+        return UpdateResult({"n": len(found), "nModified": int(bool(modified))}, True)
+
+    async def update_many(self, query: dict, update: dict) -> UpdateResult:
+        await asyncio.sleep(0)
+        found = self._matching(query)
+        modified = sum(self._update(document, update)[1] for document in found)
+        return UpdateResult({"n": len(found), "nModified": modified}, True)
+
+    async def find_one_and_update(self, query: dict, update: dict, projection: Optional[dict] = None,
+                                  sort: Optional[Keys] = None, return_document: bool = False) -> Optional[dict]:
+        await asyncio.sleep(0)
+        found = self._matching(query, sort, limit=1)
+        if not found:
+            return None
+        updated, _ = self._update(found[0], update)
+        return project(updated if return_document else found[0], projection)
+
+    async def find_one_and_delete(self, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        await asyncio.sleep(0)
+        found = self._matching(query, limit=1)
+        if not found:
+            return None
+        self._delete(found[0])
+        return project(found[0], projection)
+
+    async def delete_one(self, query: dict) -> DeleteResult:
+        await asyncio.sleep(0)
+        found = self._matching(query, limit=1)
+        for document in found:
+            self._delete(document)
+        return DeleteResult({"n": len(found)}, True)
+
+    async def delete_many(self, query: dict) -> DeleteResult:
+        await asyncio.sleep(0)
+        found = self._matching(query)
+        for document in found:
+            self._delete(document)
+        return DeleteResult({"n": len(found)}, True)
+
+    async def count_documents(self, query: dict) -> int:
+        await asyncio.sleep(0)
+        return len(self._matching(query))
+
+    async def create_index(self, keys: Keys, unique: bool = False, name: Optional[str] = None,
+                           partial_filter: Optional[dict] = None, expire_after: Optional[int] = None) -> str:
+        await asyncio.sleep(0)
+        keys = normalize_keys(keys)
+        name = name or index_name(keys)
+        if name in self._indexes:
+            return name
+        if expire_after is not None:
+            self._ttl = (keys[0][0], expire_after)
+
+        index = _Index(name, keys, unique, partial_filter)
+        for document in self._documents.values():
+            index.check(document)
+            index.add(document)
+        self._indexes[name] = index
+        return name
+
+    async def drop_index(self, name: str):
+        await asyncio.sleep(0)
+        if self._indexes.pop(name, None) is None:
+            raise OperationFailure(f"index not found with name [{name}]", 27)
+
+
+class InMemoryDatabase(Database):
+    """Database of in-memory repositories, for tests, benchmarks and running the API without MongoDB.
+
+    Collection options such as ``capped`` are accepted and ignored.
+    """
+
+    def __init__(self):
+        self._repositories: Dict[str, InMemoryRepository] = {}
+
+    def __getitem__(self, name: str) -> InMemoryRepository:
+        repository = self._repositories.get(name)
+        if repository is None:
+            repository = self._repositories[name] = InMemoryRepository()
+        return repository
+
+    async def create_collection(self, name: str, **options) -> InMemoryRepository:
+        if name in self._repositories:
+            raise CollectionInvalid(f"collection {name} already exists")
+        return self[name]
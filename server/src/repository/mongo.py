@@ -0,0 +1,82 @@
+from typing import AsyncIterator, Dict, List, Optional
+
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from src.repository.base import Database, Keys, Repository, normalize_keys
+
+
+class MongoRepository(Repository):
+    """Repository backed by a Motor collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        return await self.collection.find_one(query, projection)
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, sort: Optional[Keys] = None,
+             skip: int = 0, limit: int = 0) -> AsyncIterator[dict]:
+        return self.collection.find(query or {}, projection, sort=normalize_keys(sort) if sort else None,
+                                    skip=skip, limit=limit)
+
+    async def insert_one(self, document: dict) -> InsertOneResult:
+        return await self.collection.insert_one(document)
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True) -> InsertManyResult:
+        return await self.collection.insert_many(documents, ordered=ordered)
+
+    async def update_one(self, query: dict, update: dict) -> UpdateResult:
+        return await self.collection.update_one(query, update)
+
+    async def update_many(self, query: dict, update: dict) -> UpdateResult:
+        return await self.collection.update_many(query, update)
+
+    async def find_one_and_update(self, query: dict, update: dict, projection: Optional[dict] = None,
+                                  sort: Optional[Keys] = None, return_document: bool = False) -> Optional[dict]:
+        return await self.collection.find_one_and_update(
+            query, update, projection, sort=normalize_keys(sort) if sort else None, return_document=return_document
+        )
+
+    async def find_one_and_delete(self, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        return await self.collection.find_one_and_delete(query, projection)
+
+    async def delete_one(self, query: dict) -> DeleteResult:
+        return await self.collection.delete_one(query)
+
+    async def delete_many(self, query: dict) -> DeleteResult:
+        return await self.collection.delete_many(query)
+
+    async def count_documents(self, query: dict) -> int:
+        return await self.collection.count_documents(query)
+
+    async def create_index(self, keys: Keys, unique: bool = False, name: Optional[str] = None,
+                           partial_filter: Optional[dict] = None, expire_after: Optional[int] = None) -> str:
+        options = {"unique": unique}
+        if name is not None:
+            options["name"] = name
+        if partial_filter is not None:
+            options["partialFilterExpression"] = partial_filter
+        if expire_after is not None:
+            options["expireAfterSeconds"] = expire_after
+        return await self.collection.create_index(normalize_keys(keys), **options)
+
+    async def drop_index(self, name: str):
+        await self.collection.drop_index(name)
+
+
+class MongoDatabase(Database):
+    """Database backed by a Motor database."""
+
+    def __init__(self, database):
+        self.database = database
+        self._repositories: Dict[str, MongoRepository] = {}
+
+    def __getitem__(self, name: str) -> MongoRepository:
+        repository = self._repositories.get(name)
+        if repository is None:
+            repository = self._repositories[name] = MongoRepository(self.database[name])
+        return repository
+
+    async def create_collection(self, name: str, **options) -> MongoRepository:
+        await self.database.create_collection(name, **options)
+        return self[name]
@@ -0,0 +1,101 @@
+import re
+from typing import Optional
+
+from pymongo.errors import OperationFailure
+
+# Value of a path a document doesn't have, as distinct from an explicit None
+MISSING = object()
+
+
+def get_path(document: dict, path: str):
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return MISSING
+        value = value[part]
+    return value
+
+
+def _equals(value, operand) -> bool:
+    if value is MISSING:
+        return operand is None
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+
+def _compare(value, operand, compare) -> bool:
+    if value is MISSING or value is None:
+        return False
+    values = value if isinstance(value, list) else [value]
+    for item in values:
+        try:
+            if compare(item, operand):
+                return True
+        except TypeError:
+            # Values of different types never match a comparison, as in MongoDB
+            pass
+    return False
+
+
+def _regex(value, pattern, options: str = "") -> bool:
+    flags = re.IGNORECASE if "i" in options else 0
+    values = value if isinstance(value, list) else [value]
+    return any(isinstance(item, str) and re.search(pattern, item, flags) for item in values)
+
+
+def _matches_operators(value, conditions: dict) -> bool:
+    for operator, operand in conditions.items():
+        if operator == "$eq":
+            matched = _equals(value, operand)
+        elif operator == "$ne":
+            matched = not _equals(value, operand)
+        elif operator == "$in":
+            matched = any(_equals(value, item) for item in operand)
+        elif operator == "$nin":
+            matched = not any(_equals(value, item) for item in operand)
+        elif operator == "$lt":
+            matched = _compare(value, operand, lambda a, b: a < b)
+        elif operator == "$lte":
+            matched = _compare(value, operand, lambda a, b: a <= b)
+        elif operator == "$gt":
+            matched = _compare(value, operand, lambda a, b: a > b)
+        elif operator == "$gte":
+            matched = _compare(value, operand, lambda a, b: a >= b)
+        elif operator == "$exists":
+            matched = (value is not MISSING) == bool(operand)
+        elif operator == "$all":
+            matched = all(_equals(value, item) for item in operand)
+        elif operator == "$regex":
+            matched = _regex(value, operand, conditions.get("$options", ""))
+        elif operator == "$options":
+            matched = True
+        elif operator == "$not":
+            matched = not _matches_operators(value, operand)
+        else:
+            raise OperationFailure(f"Unsupported query operator {operator}")
+        if not matched:
+            return False
+    return True
+
+
+def is_operators(condition) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(key.startswith("$") for key in condition)
+
+
+def matches(document: dict, query: Optional[dict]) -> bool:
+    """Whether ``document`` matches the MongoDB filter ``query``."""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            matched = all(matches(document, item) for item in condition)
+        elif key == "$or":
+            matched = any(matches(document, item) for item in condition)
+        elif key == "$nor":
+            matched = not any(matches(document, item) for item in condition)
+        elif is_operators(condition):
+            matched = _matches_operators(get_path(document, key), condition)
+        else:
+            matched = _equals(get_path(document, key), condition)
+        if not matched:
+            return False
+    return True
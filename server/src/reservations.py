@@ -0,0 +1,342 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+
+from src.events import broker
+from src.filters import FilterError, build_object_query
+from src.metrics import metrics
+from src.repository.query import matches
+from src.schema_cache import schema_cache
+
+logger = logging.getLogger(__name__)
+
+# Longest an allocation may wait for a matching object to be freed
+ALLOCATION_MAX_WAIT = float(os.environ.get("ALLOCATION_MAX_WAIT", "60"))
+# How often the first waiting allocation per filter retries, to notice expired leases and other workers' releases
+ALLOCATION_WAIT_POLL_INTERVAL = float(os.environ.get("ALLOCATION_WAIT_POLL_INTERVAL", "1"))
+
+
+class ReservationError(Exception):
+    """Raised when a reservation operation cannot be completed.
+
+    Attributes:
+        status_code (int): The HTTP status code describing the failure.
+        detail (str): A message describing the failure.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def as_object_id(object_id: str) -> ObjectId:
+    """Parse an object id given by a client.
+
+    Raises:
+        ReservationError: 400 if it isn't a valid ObjectId.
+    """
+    try:
+        return ObjectId(object_id)
+    except (InvalidId, TypeError):
+        raise ReservationError(400, "Invalid object id")
+
+
+def free_filter(now: datetime) -> dict:
+    """Filter matching objects nobody holds, including those whose lease has run out."""
+    return {"$or": [{"reserved_by": None}, {"reserved_until": {"$lte": now}}]}
+
+
+def _hold(holder: str, now: datetime, lease_seconds: Optional[int]) -> dict:
+    return {"$set": {
+        "reserved_by": holder,
+        "reserved_at": now,
+        "reserved_until": now + timedelta(seconds=lease_seconds) if lease_seconds else None,
+        "updated_at": now,
+    }}
+
+
+async def reserve(db, object_id: str, holder: str, lease_seconds: Optional[int] = None) -> dict:
+    """Atomically reserve an object if it is free.
+
+    Args:
+        db: The database dependency.
+        object_id (str): The object to reserve.
+        holder (str): Who is taking the reservation.
+        lease_seconds (Optional[int]): Release the reservation automatically after this many seconds.
+
+    Returns:
+        dict: The reserved object.
+
+    Raises:
+        ReservationError: 404 if the object does not exist, 409 if someone else holds it.
+    """
+    collection = db.objects
+    _id = as_object_id(object_id)
+    now = datetime.now()
+    obj = await collection.find_one_and_update(
+        {"_id": _id, **free_filter(now)}, _hold(holder, now, lease_seconds), return_document=ReturnDocument.AFTER
+    )
+    if obj is None:
+        # Only the failure path pays for a second read to tell the two cases apart
+        if await collection.find_one({"_id": _id}, {"_id": 1}) is None:
+            raise ReservationError(404, "Object not found")
+        raise ReservationError(409, "Object already reserved")
+
+    broker.publish("reserved", obj.get("schema_id"), _id, obj)
+    return obj
+
+
+async def release(db, object_id: str, holder: str) -> dict:
+    """Atomically release an object held by ``holder``.
+
+    Args:
+        db: The database dependency.
+        object_id (str): The object to release.
+        holder (str): The holder the reservation was taken by.
+
+    Returns:
+        dict: The released object.
+
+    Raises:
+        ReservationError: 404 if the object does not exist, 409 if ``holder`` does not hold it.
+    """
+    collection = db.objects
+    _id = as_object_id(object_id)
+    obj = await collection.find_one_and_update(
+        {"_id": _id, "reserved_by": holder},
+        {"$set": {"reserved_by": None, "reserved_at": None, "reserved_until": None, "updated_at": datetime.now()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if obj is None:
+        if await collection.find_one({"_id": _id}, {"_id": 1}) is None:
+            raise ReservationError(404, "Object not found")
+        raise ReservationError(409, "Object not reserved by holder")
+
+    # The document no longer says who held it, so the event carries the releasing holder
+    broker.publish("released", obj.get("schema_id"), _id, {**obj, "released_by": holder})
+    return obj
+
+
+async def _take(db, query: dict, holder: str, lease_seconds: Optional[int]) -> Optional[dict]:
+    """Reserve the first free object matching ``query``, or return None if there is none."""
+    now = datetime.now()
+    obj = await db.objects.find_one_and_update(
+        {**query, **free_filter(now)}, _hold(holder, now, lease_seconds), sort=[("_id", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+    if obj is not None:
+        broker.publish("reserved", obj.get("schema_id"), obj["_id"], obj)
+    return obj
+
+
+async def allocate(db, schema_id: Any, holder: str, fields: Dict[str, Any],
+                   lease_seconds: Optional[int] = None, wait: Optional[float] = None) -> dict:
+    """Atomically reserve any free object of a schema whose fields match ``fields``.
+
+    Args:
+        db: The database dependency.
+        schema_id: The schema of the object to allocate.
+        holder (str): Who is taking the reservation.
+        fields (Dict[str, Any]): Filter on field values the allocated object must match.
+        lease_seconds (Optional[int]): Release the reservation automatically after this many seconds.
+        wait (Optional[float]): If no matching object is free, wait up to this many seconds (at most
+            ALLOCATION_MAX_WAIT) for one on the waitlist.
+
+    Returns:
+        dict: The allocated object.
+
+    Raises:
+        ReservationError: 400 if the schema or a field does not exist, 409 if no matching object is (or became) free.
+    """
+    schema = await schema_cache.get(schema_id, db.schemas)
+    if schema is None:
+        raise ReservationError(400, "Schema not found")
+    try:
+        query = build_object_query(schema, fields)
+    except FilterError as e:
+        raise ReservationError(400, str(e))
+
+    if wait:
+        return await waitlist.allocate(db, query, holder, lease_seconds, min(wait, ALLOCATION_MAX_WAIT))
+    obj = await _take(db, query, holder, lease_seconds)
+    if obj is None:
+        raise ReservationError(409, "No matching object available")
+    return obj
+
+
+class _Waiter:
+    __slots__ = ("sequence", "schema_id", "key", "query", "woken")
+
+    def __init__(self, sequence: int, query: dict):
+        self.sequence = sequence
+        self.schema_id = query["schema_id"]
+        self.key = json.dumps(query, sort_keys=True, default=str)
+        self.query = query
+        self.woken = asyncio.Event()
+
+
+class AllocationWaitlist:
+    """FIFO queues of allocations waiting for a matching object to be freed, one per schema and filter.
+
+    A release (or a new or updated free object) published on the event broker wakes only the
+    longest-waiting allocation whose filter matches the object, which takes it; allocations
+    arriving while others wait for the same filter queue behind them instead of overtaking.
+    Leases running out and releases served by other workers publish nothing here, so the head
+    of each queue also retries every ``poll_interval`` seconds and, when that finds an object,
+    wakes the next one in case more were freed at once.
+
+    An allocation cancelled while its reservation is being taken gives the object back, and
+    one cancelled after being woken passes the wakeup on, so no object or wakeup is lost.
+
+    Attributes:
+        poll_interval (float): Seconds between retries by the head of each queue.
+        handoffs (int): Waiting allocations that got an object.
+        timeouts (int): Waiting allocations that gave up.
+    """
+
+    def __init__(self, poll_interval: float = ALLOCATION_WAIT_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.handoffs = 0
+        self.timeouts = 0
+        self._queues: Dict[str, Dict[str, deque]] = {}
+        self._sequence = itertools.count()
+
+    def _queue(self, waiter: _Waiter) -> deque:
+        return self._queues.setdefault(waiter.schema_id, {}).setdefault(waiter.key, deque())
+
+    def _requeue(self, waiter: _Waiter):
+        """Put a waiter back in its queue ahead of everyone who arrived after it."""
+        queue = self._queue(waiter)
+        position = next((i for i, other in enumerate(queue) if other.sequence > waiter.sequence), len(queue))
+        queue.insert(position, waiter)
+
+    def _remove(self, waiter: _Waiter):
+        queues = self._queues.get(waiter.schema_id, {})
+        queue = queues.get(waiter.key)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del queues[waiter.key]
+            if not queues:
+                del self._queues[waiter.schema_id]
+
+    def _wake(self, waiter: _Waiter):
+        self._remove(waiter)
+        waiter.woken.set()
+
+    def _wake_next(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.schema_id, {}).get(waiter.key)
+        if queue:
+            self._wake(queue[0])
+
+    def notify(self, schema_id: str, obj: dict):
+        """Wake the longest-waiting allocation whose filter matches a free object."""
+        heads = [queue[0] for queue in self._queues.get(schema_id, {}).values() if matches(obj, queue[0].query)]
+        if heads:
+            self._wake(min(heads, key=lambda waiter: waiter.sequence))
+
+    def on_event(self, event_type: str, schema_id: str, _object_id, data: Optional[dict]):
+        """Broker listener waking a waiting allocation whenever an object is freed or a free one appears."""
+        if event_type in ("released", "created", "updated") and data is not None and data.get("reserved_by") is None:
+            self.notify(schema_id, data)
+
+    def waiting(self) -> int:
+        return sum(len(queue) for queues in self._queues.values() for queue in queues.values())
+
+    async def _attempt(self, db, query: dict, holder: str, lease_seconds: Optional[int]) -> Optional[dict]:
+        attempt = asyncio.ensure_future(_take(db, query, holder, lease_seconds))
+        try:
+            return await asyncio.shield(attempt)
+        except asyncio.CancelledError:
+            # The caller is gone but the reservation may still go through; give it back if it does
+            attempt.add_done_callback(lambda done: _give_back(db, holder, done))
+            raise
+
+    async def allocate(self, db, query: dict, holder: str, lease_seconds: Optional[int], wait: float) -> dict:
+        """Reserve a free object matching ``query``, waiting in line up to ``wait`` seconds for one.
+
+        Args:
+            db: The database dependency.
+            query (dict): The object query, as built by ``build_object_query``.
+            holder (str): Who is taking the reservation.
+            lease_seconds (Optional[int]): Release the reservation automatically after this many seconds.
+            wait (float): Maximum seconds to wait.
+
+        Returns:
+            dict: The allocated object.
+
+        Raises:
+            ReservationError: 409 if no matching object was freed in time.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        waiter = _Waiter(next(self._sequence), query)
+        if not self._queues.get(waiter.schema_id, {}).get(waiter.key):
+            obj = await self._attempt(db, query, holder, lease_seconds)
+            if obj is not None:
+                return obj
+        self._queue(waiter).append(waiter)
+
+        obj = None
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise ReservationError(409, "No matching object became available")
+                polled = False
+                try:
+                    await asyncio.wait_for(waiter.woken.wait(), min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    # Unless a release woke us just as the wait ran out, only the head of the queue retries
+                    if not waiter.woken.is_set():
+                        queue = self._queues.get(waiter.schema_id, {}).get(waiter.key)
+                        if not queue or queue[0] is not waiter:
+                            continue
+                        self._remove(waiter)
+                        polled = True
+
+                obj = await self._attempt(db, query, holder, lease_seconds)
+                if obj is not None:
+                    self.handoffs += 1
+                    if polled:
+                        self._wake_next(waiter)
+                    return obj
+                # Someone else got there first; wait again without losing our place
+                waiter.woken.clear()
+                self._requeue(waiter)
+        finally:
+            self._remove(waiter)
+            if obj is None and waiter.woken.is_set():
+                self._wake_next(waiter)
+
+
+def _give_back(db, holder: str, attempt: asyncio.Future):
+    if attempt.cancelled() or attempt.exception() is not None or attempt.result() is None:
+        return
+
+    async def release_quietly():
+        try:
+            await release(db, str(attempt.result()["_id"]), holder)
+        except Exception:
+            logger.exception("Failed to give back object %s reserved for a cancelled allocation", attempt.result()["_id"])
+
+    asyncio.ensure_future(release_quietly())
+
+
+waitlist = AllocationWaitlist()
+broker.add_listener(waitlist.on_event)
+metrics.register_collector("allocation_waitlist", lambda: {
+    "waiting": waitlist.waiting(), "handoffs": waitlist.handoffs, "timeouts": waitlist.timeouts,
+})
@@ -0,0 +1,62 @@
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Body, Depends, Header, HTTPException
+
+from src.basemodels.admin_base_models import AdmissionLimits, AdmissionLimitsUpdate
+from src.db import get_db
+from src.invalidation import channel
+from src.middleware.admission import admission
+
+router = APIRouter()
+
+# Admin routes require this value in the X-Admin-Key header; they are disabled while it is unset
+ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY")
+
+
+async def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """
+    Reject admin requests without the configured admin key.
+
+    Admin routes bypass admission control and change it on every worker, so they are refused
+    outright unless ADMIN_API_KEY is configured.
+
+    Raises:
+    - HTTPException: If ADMIN_API_KEY is unset, or the X-Admin-Key header doesn't match it, a 403 error is raised.
+    """
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin API disabled; set ADMIN_API_KEY to enable it")
+    if not secrets.compare_digest(x_admin_key or "", ADMIN_API_KEY):
+        raise HTTPException(status_code=403, detail="Admin key required")
+
+
+@router.get("/limits", response_model=AdmissionLimits, dependencies=[Depends(require_admin)])
+async def read_limits():
+    """
+    Retrieve the admission control limits in force in this worker.
+
+    Returns:
+    - AdmissionLimits: The current limits.
+    """
+    return admission.limits
+
+
+@router.put("/limits", response_model=AdmissionLimits, dependencies=[Depends(require_admin)])
+async def update_limits(update: AdmissionLimitsUpdate = Body(...), db=Depends(get_db)):
+    """
+    Change admission control limits without restarting; omitted values are left unchanged.
+
+    The change applies to this worker immediately and reaches every other worker through the
+    invalidation channel. It is also stored, so workers started or restarted later apply it.
+
+    Parameters:
+    - update (AdmissionLimitsUpdate): The limits to change.
+    - db: The database dependency.
+
+    Returns:
+    - AdmissionLimits: The limits now in force.
+    """
+    await admission.save(db, update)
+    await channel.publish(db, "admission_limits", update.model_dump_json(exclude_none=True))
+    return admission.limits
@@ -1,30 +1,63 @@
+import json
+import os
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Annotated, Any, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Body, Request
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
-from src.basemodels.object_base_models import CreateObjectResponse, CreateObjectRequest
+from src.basemodels.object_base_models import CreateObjectResponse, CreateObjectRequest, BulkOperationResponse
+from src.basemodels.reservation_base_models import AllocateRequest, ReleaseRequest, ReserveRequest
+from src.audit import InvalidCursor, audit
+from src.constraints import UNIQUE_MARKER, duplicate_message, unique_fields, unique_marker
 from src.db import get_db
-from src.utils import build_pydantic_model
+from src.events import broker, ResumeTokenExpired
+from src.filters import FilterError, build_object_query
+from src import reservations, search
+from src.object_cache import object_cache
+from src.schema_cache import CachedSchema, schema_cache
+from src.snapshot import snapshots
+from src.validation import ValidationFailed, validate_fields
 
 router = APIRouter()
 
+# Top-level keys always returned by a projected read, alongside the requested schema fields
+OBJECT_METADATA = ("schema_id", "created_at", "updated_at", "reserved_by", "reserved_at", "reserved_until")
+# Seconds between keep-alive comments on an idle event stream
+EVENT_STREAM_HEARTBEAT = 15
+# Objects touched per update_many/delete_many call of a bulk operation
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", "1000"))
+# Bulk operations whose filter matches more objects than this are refused
+BULK_MAX_AFFECTED = int(os.environ.get("BULK_MAX_AFFECTED", "10000"))
+
+
+def __payload_size(request: Request) -> int:
+    """The request body size in bytes, used to decide whether to validate it off the event loop."""
+    try:
+        return int(request.headers.get("content-length", 0))
+    except ValueError:
+        return 0
+
 
 @router.post("/", response_model=CreateObjectResponse, response_model_exclude_none=True)
 async def create_object(
         data: CreateObjectRequest,
+        request: Request,
         db=Depends(get_db)
 ):
-    schemas_collection = db["schemas"]
-    objects_collection = db["objects"]
-    schema = await schemas_collection.find_one({"_id": data.schema_id})
+    schemas_collection = db.schemas
+    objects_collection = db.objects
+    schema = await schema_cache.get(data.schema_id, schemas_collection)
 
     if schema is None:
         raise HTTPException(status_code=400, detail="Schema not found")
 
-    schema_model = build_pydantic_model(schema.get("schema_name"), schema.get("fields"))
     try:
-        schema_model(**data.fields)
-    except Exception as e:
+        await validate_fields(schema, data.fields, size=__payload_size(request))
+    except ValidationFailed as e:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid object data: {e}"
@@ -34,8 +67,17 @@ async def create_object(
     body = data.model_dump(exclude_unset=True, exclude_none=True)
     body["created_at"] = now
     body["updated_at"] = now
+    marker = unique_marker(schema.schema)
+    if marker:
+        body[UNIQUE_MARKER] = marker
 
-    result = await objects_collection.insert_one(body)
+    try:
+        # Unique fields are enforced by their indexes, so the insert itself reports conflicts
+        result = await objects_collection.insert_one(body)
+    except DuplicateKeyError as e:
+        raise HTTPException(status_code=409, detail=duplicate_message(e.details))
+    await search.index_objects(db, schema.schema, [body])
+    broker.publish("created", data.schema_id, result.inserted_id, body)
 
     res = {
         "_id": result.inserted_id,
@@ -47,37 +89,590 @@ async def create_object(
     return res
 
 
+def __split_names(names: Optional[List[str]]) -> List[str]:
+    """Accept both repeated (?include=a&include=b) and comma separated (?include=a,b) field names."""
+    return [name for value in names or [] for name in value.split(",") if name]
+
+
+def __field_projection(include: List[str], exclude: List[str]) -> Optional[dict]:
+    """
+    Translate include/exclude field names into a Mongo projection on the object's fields.
+
+    Parameters:
+    - include (List[str]): Schema fields to return; object metadata is always returned.
+    - exclude (List[str]): Schema fields to leave out.
+
+    Returns:
+    - Optional[dict]: The projection, or None to return the whole document.
+
+    Raises:
+    - HTTPException: If both include and exclude are given, a 400 error is raised.
+    """
+    if include and exclude:
+        raise HTTPException(status_code=400, detail="Use either include or exclude, not both")
+    if include:
+        return {**{key: 1 for key in OBJECT_METADATA}, **{f"fields.{name}": 1 for name in include}}
+    if exclude:
+        return {f"fields.{name}": 0 for name in exclude}
+    return None
+
+
+def __project(obj: dict, include: List[str], exclude: List[str]) -> dict:
+    """Apply an include/exclude field projection to a whole object, as __field_projection would in Mongo."""
+    fields = obj.get("fields", {})
+    if include:
+        obj = {key: obj[key] for key in ("_id", *OBJECT_METADATA) if key in obj}
+        obj["fields"] = {name: fields[name] for name in include if name in fields}
+    elif exclude:
+        obj = {**obj, "fields": {name: value for name, value in fields.items() if name not in exclude}}
+    return obj
+
+
+def __check_field_names(schema: Optional[CachedSchema], names: List[str]):
+    """
+    Ensure every requested field name is declared by the object's schema.
+
+    Raises:
+    - HTTPException: If a name is not a field of the schema, a 400 error is raised.
+    """
+    declared = schema.schema.get("fields", {}) if schema is not None else {}
+    unknown = sorted(set(names) - set(declared))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+
 @router.get("/")
-async def read_objects(db=Depends(get_db)):
-    objects_collection = db["objects"]
+async def read_objects(
+        schema_id: Optional[str] = None,
+        include: Optional[List[str]] = Query(None),
+        exclude: Optional[List[str]] = Query(None),
+        limit: Optional[int] = Query(None, gt=0),
+        after: Optional[str] = None,
+        db=Depends(get_db)
+):
+    """
+    Retrieve objects, optionally only those of one schema and only some of their fields.
+
+    Parameters:
+    - schema_id (str): Only return objects of this schema; required when using include or exclude.
+    - include (List[str]): Only return these schema fields.
+    - exclude (List[str]): Return every schema field except these.
+    - limit (int): Return at most this many objects, in _id order.
+    - after (str): Return the objects after this id, i.e. the last _id of the previous page.
+    - db: The database dependency.
+
+    Returns:
+    - list: The (possibly partial) objects.
+
+    Raises:
+    - HTTPException: If a field name is not declared by the schema or after is not a valid id, a 400 error is raised.
+    """
+    include, exclude = __split_names(include), __split_names(exclude)
+    projection = __field_projection(include, exclude)
+    query = {}
+    if schema_id is not None:
+        query["schema_id"] = schema_id
+    if projection is not None:
+        if schema_id is None:
+            raise HTTPException(status_code=400, detail="schema_id is required when using include or exclude")
+        __check_field_names(await schema_cache.get(schema_id, db.schemas), include or exclude)
+
+    if limit is not None or after is not None:
+        if after is not None and not ObjectId.is_valid(after):
+            raise HTTPException(status_code=400, detail="Invalid after id")
+        page = await db.objects.find_page(
+            query, limit or BULK_CHUNK_SIZE, after=ObjectId(after) if after else None, projection=projection
+        )
+        return [{**obj, "_id": str(obj["_id"])} for obj in page]
+
+    objects_collection = db.objects
     objects = []
-    async for obj in objects_collection.find():
+    async for obj in objects_collection.find(query, projection):
         objects.append({**obj, "_id": str(obj["_id"])})  # Correctly format object
     return objects
 
 
+async def __bulk_query(schema_id: str, filter_json: str, db) -> tuple:
+    """
+    Resolve the schema and build the object query for a bulk operation.
+
+    Parameters:
+    - schema_id (str): The schema whose objects are targeted.
+    - filter_json (str): A JSON object filtering on the schema's fields.
+    - db: The database dependency.
+
+    Returns:
+    - tuple: The cached schema and the Mongo query.
+
+    Raises:
+    - HTTPException: If the schema does not exist or the filter is invalid, a 400 error is raised.
+    """
+    schema = await schema_cache.get(schema_id, db.schemas)
+    if schema is None:
+        raise HTTPException(status_code=400, detail="Schema not found")
+    try:
+        filters = json.loads(filter_json)
+        if not isinstance(filters, dict):
+            raise FilterError("Filter must be a JSON object")
+        return schema, build_object_query(schema, filters)
+    except (ValueError, FilterError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {e}")
+
+
+async def __check_affected(query: dict, collection) -> int:
+    """
+    Count the objects a bulk operation would touch, refusing it if there are too many.
+
+    Raises:
+    - HTTPException: If more than BULK_MAX_AFFECTED objects match, a 400 error is raised.
+    """
+    matched = await collection.count_documents(query)
+    if matched > BULK_MAX_AFFECTED:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Filter matches {matched} objects, more than the limit of {BULK_MAX_AFFECTED}"
+        )
+    return matched
+
+
+async def __chunks(query: dict, collection):
+    """Yield the ids of the objects matching ``query`` in _id order, BULK_CHUNK_SIZE at a time."""
+    last_id = None
+    while True:
+        page = await collection.find_page(query, BULK_CHUNK_SIZE, after=last_id, projection={"_id": 1})
+        ids = [obj["_id"] for obj in page]
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+@router.patch("/", response_model=BulkOperationResponse, response_model_exclude_none=True)
+async def update_objects(
+        schema_id: str,
+        update: Annotated[Dict[str, Any], Body(title="The field values to set")],
+        request: Request,
+        filter: str = Query("{}", description="JSON object filtering on the schema's fields"),
+        dry_run: bool = False,
+        db=Depends(get_db)
+):
+    """
+    Set field values on every object of a schema matching a filter.
+
+    Parameters:
+    - schema_id (str): The schema whose objects are updated.
+    - update (dict): Field values to set, validated against the schema.
+    - request (Request): The request, whose size decides whether validation is offloaded.
+    - filter (str): A JSON object filtering on the schema's fields, e.g. {"environment": "Dev_1"}.
+    - dry_run (bool): Only count the matching objects.
+    - db: The database dependency.
+
+    Returns:
+    - BulkOperationResponse: The matched and modified counts.
+
+    Raises:
+    - HTTPException: 400 if the filter or update is invalid or matches more than BULK_MAX_AFFECTED objects,
+      409 if it would give objects the same value of a unique field.
+    """
+    schema, query = await __bulk_query(schema_id, filter, db)
+    if not update:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    __check_field_names(schema, list(update))
+    try:
+        await validate_fields(schema, update, size=__payload_size(request), partial=True)
+    except ValidationFailed as e:
+        raise HTTPException(status_code=400, detail=f"Invalid object data: {e}")
+
+    objects_collection = db.objects
+    matched = await __check_affected(query, objects_collection)
+    if dry_run:
+        return BulkOperationResponse(matched_count=matched, dry_run=True)
+    shared = [name for name in unique_fields(schema.schema) if name in update]
+    if shared and matched > 1:
+        raise HTTPException(status_code=409, detail=f"Duplicate value for unique field {shared[0]}")
+
+    modified = 0
+    reindex = bool(set(update) & set(search.searchable_fields(schema.schema)))
+    async for ids in __chunks(query, objects_collection):
+        changes = {**{f"fields.{name}": value for name, value in update.items()}, "updated_at": datetime.now()}
+        try:
+            result = await objects_collection.update_many({**query, "_id": {"$in": ids}}, {"$set": changes})
+        except DuplicateKeyError as e:
+            raise HTTPException(status_code=409, detail=duplicate_message(e.details))
+        modified += result.modified_count
+        if reindex:
+            updated = [obj async for obj in objects_collection.find({"_id": {"$in": ids}}, {"fields": 1})]
+            await search.index_objects(db, schema.schema, updated)
+        for _id in ids:
+            broker.publish("updated", schema_id, _id)
+    return BulkOperationResponse(matched_count=matched, modified_count=modified)
+
+
+@router.delete("/", response_model=BulkOperationResponse, response_model_exclude_none=True)
+async def delete_objects(
+        schema_id: str,
+        filter: str = Query("{}", description="JSON object filtering on the schema's fields"),
+        dry_run: bool = False,
+        db=Depends(get_db)
+):
+    """
+    Delete every object of a schema matching a filter.
+
+    Parameters:
+    - schema_id (str): The schema whose objects are deleted.
+    - filter (str): A JSON object filtering on the schema's fields, e.g. {"environment": "Dev_1"}.
+    - dry_run (bool): Only count the matching objects.
+    - db: The database dependency.
+
+    Returns:
+    - BulkOperationResponse: The matched and deleted counts.
+
+    Raises:
+    - HTTPException: 400 if the filter is invalid or matches more than BULK_MAX_AFFECTED objects.
+    """
+    schema, query = await __bulk_query(schema_id, filter, db)
+    objects_collection = db.objects
+    matched = await __check_affected(query, objects_collection)
+    if dry_run:
+        return BulkOperationResponse(matched_count=matched, dry_run=True)
+
+    deleted = 0
+    async for ids in __chunks(query, objects_collection):
+        result = await objects_collection.delete_many({**query, "_id": {"$in": ids}})
+        deleted += result.deleted_count
+        await search.unindex_objects(db, schema.schema, ids)
+        for _id in ids:
+            broker.publish("deleted", schema_id, _id)
+    return BulkOperationResponse(matched_count=matched, deleted_count=deleted)
+
+
+@router.get("/count")
+async def count_objects(
+        schema_id: str,
+        filter: str = Query("{}", description="JSON object filtering on the schema's fields"),
+        available: Optional[bool] = None,
+        db=Depends(get_db)
+):
+    """
+    Count the objects of a schema matching a filter, e.g. free Dev_1 SIMs with use_count below 100.
+
+    Answered from the schema's in-memory snapshot when it is enabled and fresh, otherwise from Mongo.
+
+    Parameters:
+    - schema_id (str): The schema whose objects are counted.
+    - filter (str): A JSON object filtering on the schema's fields, e.g. {"use_count": {"$lt": 100}}.
+    - available (bool): Only count free (true) or reserved (false) objects.
+    - db: The database dependency.
+
+    Returns:
+    - dict: The count and whether it came from the snapshot or the database.
+
+    Raises:
+    - HTTPException: If the schema does not exist or the filter is invalid, a 400 error is raised.
+    """
+    schema, query = await __bulk_query(schema_id, filter, db)
+    objects_collection = db.objects
+
+    snapshot = snapshots.get(schema.schema, objects_collection)
+    if snapshot is not None:
+        count = snapshot.count(json.loads(filter), available)
+        if count is not None:
+            return {"count": count, "source": "snapshot"}
+
+    if available is not None:
+        free = reservations.free_filter(datetime.now())
+        query.update(free if available else {"$nor": [free]})
+    return {"count": await objects_collection.count_documents(query), "source": "database"}
+
+
+@router.get("/search")
+async def search_objects(
+        schema_id: str,
+        field: str,
+        prefix: Optional[str] = None,
+        contains: Optional[str] = None,
+        limit: int = Query(100, gt=0, le=1000),
+        cursor: Optional[str] = None,
+        db=Depends(get_db)
+):
+    """
+    Find the objects of a schema whose string field starts with or contains a term, e.g. a partial MSISDN.
+
+    The field must be declared searchable. Prefix searches use the field's index and return
+    objects in field order. Substring searches ignore case and return objects in id order.
+
+    Parameters:
+    - schema_id (str): The schema whose objects are searched.
+    - field (str): The string field searched.
+    - prefix (str): The value the field starts with.
+    - contains (str): A substring of the field, at least SEARCH_NGRAM_SIZE characters long.
+    - limit (int): Return at most this many objects.
+    - cursor (str): The ``next`` value of the previous page.
+    - db: The database dependency.
+
+    Returns:
+    - dict: The matching ``objects`` and the ``next`` cursor, null on the last page.
+
+    Raises:
+    - HTTPException: 400 if the schema does not exist, the field isn't searchable or the term is too short.
+    """
+    schema = await schema_cache.get(schema_id, db.schemas)
+    if schema is None:
+        raise HTTPException(status_code=400, detail="Schema not found")
+    try:
+        found, next_cursor = await search.search(db, schema.schema, field, prefix, contains, limit, cursor)
+    except search.SearchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"objects": [{**obj, "_id": str(obj["_id"])} for obj in found], "next": next_cursor}
+
+
+@router.post("/allocate", response_model=dict)
+async def allocate_object(
+        request: AllocateRequest,
+        wait: Optional[float] = Query(None, gt=0, le=reservations.ALLOCATION_MAX_WAIT),
+        db=Depends(get_db)
+):
+    """
+    Reserve any free object of a schema whose fields match the requested values.
+
+    With ``wait``, a request finding no free object waits in line for one to be released
+    instead of failing, so clients don't need to poll while the pool is exhausted.
+
+    Parameters:
+    - request (AllocateRequest): The schema, holder and field values to match.
+    - wait (float): Seconds to wait for a matching object to be freed.
+    - db: The database dependency.
+
+    Returns:
+    - dict: The allocated object.
+
+    Raises:
+    - HTTPException: 400 if the schema or a field is unknown, 409 if no matching object is (or became) free.
+    """
+    try:
+        obj = await reservations.allocate(db, request.schema_id, request.holder, request.fields, request.lease_seconds,
+                                          wait)
+    except reservations.ReservationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {**obj, "_id": str(obj["_id"])}
+
+
+@router.get("/events")
+async def object_events(
+        schema_id: Optional[List[str]] = Query(None),
+        last_event_id: Optional[str] = Query(None),
+        last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Stream object changes as Server-Sent Events.
+
+    Each worker streams the changes it served itself, so with several workers clients need
+    sticky sessions to see every change. Event ids are only valid on the worker that sent
+    them; resuming on another worker, or after a restart, gets 410.
+
+    Parameters:
+    - schema_id (List[str]): Only stream changes to objects of these schemas.
+    - last_event_id (str): Resume after this event id; browsers send it as the Last-Event-ID header on reconnect.
+
+    Returns:
+    - StreamingResponse: A text/event-stream of created, updated and deleted events.
+
+    Raises:
+    - HTTPException: If the resume token is no longer held in history, a 410 error is raised.
+    """
+    after = last_event_id if last_event_id is not None else last_event_id_header
+    try:
+        subscription = broker.subscribe(schema_id, after=after)
+    except ResumeTokenExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+
+    async def stream():
+        try:
+            while not subscription.finished:
+                event = await subscription.next(timeout=EVENT_STREAM_HEARTBEAT)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                payload = json.dumps({**event, "time": event["time"].isoformat()})
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def __object_id(object_id: str) -> ObjectId:
+    """
+    Parse the object id of a request path.
+
+    Parameters:
+    - object_id (str): The id from the path.
+
+    Returns:
+    - ObjectId: The parsed id.
+
+    Raises:
+    - HTTPException: 400 if the id isn't a valid ObjectId, like the reservation routes.
+    """
+    try:
+        return reservations.as_object_id(object_id)
+    except reservations.ReservationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
 @router.get("/{object_id}", response_model=dict)
-async def read_object(object_id: str, db=Depends(get_db)):
-    objects_collection = db["objects"]
-    obj = await objects_collection.find_one({"_id": ObjectId(object_id)})
+async def read_object(
+        object_id: str,
+        include: Optional[List[str]] = Query(None),
+        exclude: Optional[List[str]] = Query(None),
+        db=Depends(get_db)
+):
+    """
+    Retrieve an object, optionally only some of its fields.
+
+    Whole objects are served from a short-lived per-worker cache; concurrent reads of an
+    uncached object share one database call. Partial reads use a cached object if there is
+    one, and otherwise have the database project it, without caching the partial result.
+
+    Parameters:
+    - object_id (str): The ID of the object.
+    - include (List[str]): Only return these schema fields.
+    - exclude (List[str]): Return every schema field except these.
+    - db: The database dependency.
+
+    Returns:
+    - dict: The (possibly partial) object.
+
+    Raises:
+    - HTTPException: 404 if the object does not exist, 400 if the id is invalid or a field name is not
+      declared by its schema.
+    """
+    _id = __object_id(object_id)
+    include, exclude = __split_names(include), __split_names(exclude)
+    projection = __field_projection(include, exclude)
+    if projection is None:
+        obj = await object_cache.get(object_id, lambda: db.objects.find_one({"_id": _id}))
+    else:
+        cached = object_cache.peek(object_id)
+        obj = __project(cached, include, exclude) if cached is not None else \
+            await db.objects.find_one({"_id": _id}, projection)
     if obj is None:
         raise HTTPException(status_code=404, detail="Object not found")
+    if projection is not None:
+        # The schema is only known once the object is read; it comes from the cache, not another query
+        __check_field_names(await schema_cache.get(obj.get("schema_id"), db.schemas), include or exclude)
     return {**obj, "_id": str(obj["_id"])}
 
 
+@router.get("/{object_id}/history")
+async def object_history(
+        object_id: str,
+        start: Optional[datetime] = Query(None),
+        end: Optional[datetime] = Query(None),
+        limit: int = Query(100, gt=0, le=1000),
+        cursor: Optional[str] = Query(None),
+        db=Depends(get_db)
+):
+    """
+    List the changes and reservations of an object in a time range, newest first.
+
+    Entries outlive the object itself, until the audit log's retention period expires them.
+
+    Parameters:
+    - object_id (str): The ID of the object.
+    - start (datetime): The earliest time, inclusive; the start of the retention period if omitted.
+    - end (datetime): The latest time, exclusive; now if omitted.
+    - limit (int): Maximum number of entries to return.
+    - cursor (str): The ``next`` value of the previous page.
+    - db: The database dependency.
+
+    Returns:
+    - dict: ``entries`` and the ``next`` cursor, null on the last page.
+
+    Raises:
+    - HTTPException: 400 if the object id or the cursor is invalid.
+    """
+    __object_id(object_id)
+    try:
+        entries, next_cursor = await audit.history(db, object_id, start, end, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"entries": [{**entry, "_id": str(entry["_id"])} for entry in entries], "next": next_cursor}
+
+
 @router.put("/{object_id}", response_model=dict)
 async def update_object(object_id: str, object_data: dict, db=Depends(get_db)):
-    objects_collection = db["objects"]
-    result = await objects_collection.update_one({"_id": ObjectId(object_id)}, {"$set": object_data})
-    if result.matched_count == 0:
+    _id = __object_id(object_id)
+    objects_collection = db.objects
+    try:
+        result = await objects_collection.find_one_and_update(
+            {"_id": _id}, {"$set": object_data}, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError as e:
+        raise HTTPException(status_code=409, detail=duplicate_message(e.details))
+    if result is None:
         raise HTTPException(status_code=404, detail="Object not found")
+    schema = await schema_cache.get(result.get("schema_id"), db.schemas)
+    if schema is not None:
+        await search.index_objects(db, schema.schema, [result])
+    broker.publish("updated", result.get("schema_id"), object_id, result)
     return {**object_data, "_id": object_id}
 
 
 @router.delete("/{object_id}")
 async def delete_object(object_id: str, db=Depends(get_db)):
-    objects_collection = db["objects"]
-    result = await objects_collection.delete_one({"_id": ObjectId(object_id)})
-    if result.deleted_count == 0:
+    _id = __object_id(object_id)
+    objects_collection = db.objects
+    result = await objects_collection.find_one_and_delete({"_id": _id})
+    if result is None:
         raise HTTPException(status_code=404, detail="Object not found")
+    schema = await schema_cache.get(result.get("schema_id"), db.schemas)
+    await search.unindex_objects(db, schema.schema if schema is not None else None, [result["_id"]])
+    broker.publish("deleted", result.get("schema_id"), object_id)
     return {"detail": "Object deleted"}
+
+
+@router.post("/{object_id}/reserve", response_model=dict)
+async def reserve_object(object_id: str, request: ReserveRequest, db=Depends(get_db)):
+    """
+    Reserve a specific object.
+
+    Parameters:
+    - object_id (str): The ID of the object to reserve.
+    - request (ReserveRequest): The holder and optional lease.
+    - db: The database dependency.
+
+    Returns:
+    - dict: The reserved object.
+
+    Raises:
+    - HTTPException: 404 if the object does not exist, 409 if it is already reserved.
+    """
+    try:
+        obj = await reservations.reserve(db, object_id, request.holder, request.lease_seconds)
+    except reservations.ReservationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {**obj, "_id": str(obj["_id"])}
+
+
+@router.post("/{object_id}/release", response_model=dict)
+async def release_object(object_id: str, request: ReleaseRequest, db=Depends(get_db)):
+    """
+    Release an object reserved by the given holder.
+
+    Parameters:
+    - object_id (str): The ID of the object to release.
+    - request (ReleaseRequest): The holder the reservation was taken by.
+    - db: The database dependency.
+
+    Returns:
+    - dict: The released object.
+
+    Raises:
+    - HTTPException: 404 if the object does not exist, 409 if the holder does not hold it.
+    """
+    try:
+        obj = await reservations.release(db, object_id, request.holder)
+    except reservations.ReservationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {**obj, "_id": str(obj["_id"])}
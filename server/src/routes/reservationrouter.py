@@ -0,0 +1,135 @@
+import asyncio
+import json
+import logging
+import math
+import os
+
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from src import reservations
+from src.basemodels.reservation_base_models import ReservationCommand
+from src.db import get_db
+from src.middleware.admission import AdmissionRejected, admission, client_key
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Commands from one connection that may be executing at the same time; further commands wait to be read
+WS_MAX_IN_FLIGHT = int(os.environ.get("WS_MAX_IN_FLIGHT", "32"))
+
+
+async def __execute(command: ReservationCommand, db) -> dict:
+    """
+    Run a single reservation command using the same atomic operations as the REST routes.
+
+    Parameters:
+    - command (ReservationCommand): The command to run.
+    - db: The database dependency.
+
+    Returns:
+    - dict: The reply frame for the command.
+    """
+    try:
+        if command.op == "allocate":
+            if command.schema_id is None:
+                raise reservations.ReservationError(400, "schema_id is required")
+            obj = await reservations.allocate(db, command.schema_id, command.holder, command.fields,
+                                              command.lease_seconds, command.wait)
+        elif command.object_id is None:
+            raise reservations.ReservationError(400, "object_id is required")
+        elif command.op == "reserve":
+            obj = await reservations.reserve(db, command.object_id, command.holder, command.lease_seconds)
+        else:
+            obj = await reservations.release(db, command.object_id, command.holder)
+    except reservations.ReservationError as e:
+        return {"id": command.id, "ok": False, "status": e.status_code, "detail": e.detail}
+
+    return {"id": command.id, "ok": True, "status": 200, "object_id": str(obj["_id"]),
+            "reserved_by": obj.get("reserved_by")}
+
+
+@router.websocket("/reservations")
+async def reservation_channel(websocket: WebSocket, db=Depends(get_db)):
+    """
+    Multiplex reserve, release and allocate commands over a single connection.
+
+    Each command carries a client-chosen ``id`` which is echoed on its reply. Commands are
+    pipelined: up to WS_MAX_IN_FLIGHT run concurrently and replies are sent as each one
+    completes, so they may arrive out of order. Every command is admitted like a single-object
+    write request, so it is rate limited per API key and takes a write slot while it runs;
+    allocations waiting for an object only take a token, like their REST counterpart.
+
+    Frames that aren't JSON get a 400 reply and a command failing unexpectedly a 500 one;
+    neither closes the connection.
+
+    Parameters:
+    - websocket (WebSocket): The client connection.
+    - db: The database dependency.
+    """
+    await websocket.accept()
+    in_flight = asyncio.Semaphore(WS_MAX_IN_FLIGHT)
+    send_lock = asyncio.Lock()
+    tasks = set()
+    waiting = set()
+
+    async def reply(frame: dict):
+        async with send_lock:
+            await websocket.send_json(frame, mode="text")
+
+    key = client_key(websocket.scope)
+
+    async def run(command: ReservationCommand):
+        held = False
+        try:
+            try:
+                held = await admission.admit(key, "write", hold_slot=not command.wait)
+                frame = await __execute(command, db)
+            except AdmissionRejected as e:
+                frame = {"id": command.id, "ok": False, "status": e.status_code, "detail": e.detail,
+                         "retry_after": max(1, math.ceil(e.retry_after))}
+            except Exception:
+                logger.exception("Reservation command %s failed", command.id)
+                frame = {"id": command.id, "ok": False, "status": 500, "detail": "Internal server error"}
+            finally:
+                if held:
+                    admission.release("write")
+            await reply(frame)
+        finally:
+            in_flight.release()
+
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            try:
+                message = json.loads(frame.get("text") or frame.get("bytes") or "")
+            except ValueError:
+                await reply({"id": None, "ok": False, "status": 400, "detail": "Frames must be JSON objects"})
+                continue
+            try:
+                command = ReservationCommand.model_validate(message)
+            except ValidationError as e:
+                request_id = message.get("id") if isinstance(message, dict) else None
+                detail = e.errors(include_url=False, include_context=False)
+                await reply({"id": request_id, "ok": False, "status": 422, "detail": detail})
+                continue
+
+            await in_flight.acquire()
+            task = asyncio.create_task(run(command))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            if command.wait:
+                waiting.add(task)
+                task.add_done_callback(waiting.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Nobody is left to hand an object to; cancelling gives back any taken meanwhile
+        for task in waiting:
+            task.cancel()
+        # Let commands already sent to the database finish so their results aren't lost mid-write
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,20 +1,28 @@
 from datetime import datetime
-from typing import List, Annotated
+from typing import List, Annotated, Optional
 
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, Path, Body, Depends
+from fastapi import APIRouter, HTTPException, Path, Body, Depends, Request
 
-from src.basemodels.schema_base_models import SchemaDeletedResponse, PyObjectId, example_create_request
+from src.basemodels.schema_base_models import SchemaDeletedResponse, PyObjectId, EXAMPLE_CREATE_REQUEST
 from src.basemodels.schema_base_models import CreatedSchemaResponse, CreateSchemaRequest, InsertedSchema, \
     SchemaUpdateRequest
+from src.basemodels.import_base_models import ImportFormat, ImportJob
+from src import constraints
+from src.constraints import ConstraintError, UniqueIndexError
 from src.db import get_db
+from src.importer import IMPORT_COLLECTION, ImportPipeline, ImportRejected
+from src.invalidation import channel
+from src import search
+from src.schema_cache import schema_cache
+from src.snapshot import snapshots
 
 router = APIRouter()
 
 
 async def __get_schema(_id: str, collection) -> InsertedSchema:
     """
-    Retrieve a schema from the database by its ID.
+    Retrieve a schema by its ID, through this worker's schema cache.
 
     Parameters:
     - _id (str): The ID of the schema to retrieve.
@@ -26,18 +34,31 @@ async def __get_schema(_id: str, collection) -> InsertedSchema:
     Raises:
     - HTTPException: If the schema is not found, a 404 error is raised.
     """
-    schema = await collection.find_one({"_id": ObjectId(_id)})
-    if schema is None:
+    cached = await schema_cache.get(_id, collection)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Schema not found")
 
-    res_model = InsertedSchema(**schema)
+    res_model = InsertedSchema(**cached.schema)
     return res_model
 
 
+def __index_error(error: UniqueIndexError) -> HTTPException:
+    """
+    Describe a unique index that can't be created as an HTTP error.
+
+    Parameters:
+    - error (UniqueIndexError): The failure.
+
+    Returns:
+    - HTTPException: 409 if an existing index conflicts with it, 503 otherwise.
+    """
+    return HTTPException(status_code=409 if error.conflict else 503, detail=str(error))
+
+
 @router.post("/", response_model=CreatedSchemaResponse, response_model_exclude_none=True)
 async def create_schema(schema: CreateSchemaRequest = Body(
     ...,
-    examples=[example_create_request.model_dump(exclude_none=True)]
+    examples=[EXAMPLE_CREATE_REQUEST]
     ),
     db=Depends(get_db)
 ):
@@ -52,9 +73,10 @@ async def create_schema(schema: CreateSchemaRequest = Body(
     - CreatedSchemaResponse: The response containing the created schema.
 
     Raises:
-    - HTTPException: If a schema with the same name already exists, a 400 error is raised.
+    - HTTPException: If a schema with the same name already exists, a 400 error is raised. If the
+      index of a unique field can't be created, a 409 error (conflicting index) or 503 error is raised.
     """
-    collection = db['schemas']
+    collection = db.schemas
     existing_schema = await collection.find_one({"schema_name": schema.schema_name})
     if existing_schema:
         raise HTTPException(status_code=400, detail="Schema already exists")
@@ -64,7 +86,13 @@ async def create_schema(schema: CreateSchemaRequest = Body(
     now = datetime.now()
     schema_data['created_at'] = now  # Add created_at field
     schema_data["updated_at"] = now
+    # Built first, so a schema is never saved without the indexes enforcing its unique fields
+    try:
+        await constraints.ensure_unique_indexes(db, constraints.unique_fields(schema_data))
+    except UniqueIndexError as e:
+        raise __index_error(e)
     result = await collection.insert_one(schema_data)
+    await search.ensure_indexes(db, schema_data)
 
     res = {
         "_id": result.inserted_id,
@@ -88,7 +116,7 @@ async def read_schemas(db=Depends(get_db)):
     - List[InsertedSchema]: A list of all schemas.
 
     """
-    collection = db['schemas']
+    collection = db.schemas
 
     schemas = []
     async for schema in collection.find():
@@ -111,7 +139,7 @@ async def read_schema(schema_id: str, db=Depends(get_db)):
     Raises:
     - HTTPException: If the schema is not found, a 404 error is raised.
     """
-    return await __get_schema(schema_id, db["schemas"])
+    return await __get_schema(schema_id, db.schemas)
 
 
 @router.put("/{schema_id}", response_model=InsertedSchema, response_model_exclude_none=True)
@@ -123,6 +151,9 @@ async def update_schema(
     """
     Update an existing schema in the database.
 
+    Making a field searchable, or no longer searchable, re-indexes the schema's objects in the background.
+    Making a field unique marks the schema's objects first, so the update is refused if they already share values.
+
     Parameters:
     - schema_id (str): The ID of the schema to update.
     - schema (SchemaUpdateRequest): The updated schema data.
@@ -132,17 +163,39 @@ async def update_schema(
     - InsertedSchema: The updated schema.
 
     Raises:
-    - HTTPException: If the schema is not found, a 404 error is raised.
+    - HTTPException: If the schema is not found, a 404 error is raised. If a field made unique
+      already has duplicate values, a 409 error is raised; if its index can't be created, a 409
+      error (conflicting index) or 503 error.
     """
-    collection = db["schemas"]
+    collection = db.schemas
+    previous = await schema_cache.get(schema_id, collection)
     update_dict = schema.model_dump(exclude_none=True)
     update_dict["updated_at"] = datetime.now()
+    updated = {**previous.schema, **update_dict} if previous is not None else None
+    remark = updated is not None and \
+        constraints.unique_marker(previous.schema) != constraints.unique_marker(updated)
+    if remark:
+        try:
+            await constraints.mark_objects(db, schema_id, previous.schema, updated)
+        except ConstraintError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except UniqueIndexError as e:
+            raise __index_error(e)
     result = await collection.update_one({"_id": ObjectId(schema_id)}, {"$set": update_dict})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Schema not found")
 
-    latest = await __get_schema(schema_id, collection)
-    return latest
+    # Compiled models for this schema are cached by every worker
+    await channel.publish(db, "schema", schema_id)
+    if remark:
+        constraints.schedule_remark(db, schema_id, updated)
+
+    latest = await schema_cache.get(schema_id, collection)
+    if previous is not None and latest is not None and \
+            search.searchable_fields(previous.schema) != search.searchable_fields(latest.schema):
+        # Objects written before a field became searchable aren't in the n-gram index yet
+        search.schedule_rebuild(db, latest.schema)
+    return await __get_schema(schema_id, collection)
 
 
 @router.delete("/{schema_id}", response_model=SchemaDeletedResponse, response_model_exclude_none=True)
@@ -150,6 +203,8 @@ async def delete_schema(schema_id: str, db=Depends(get_db)):
     """
     Delete a schema from the database by its ID.
 
+    Its search index documents are removed, and the field indexes no remaining schema needs are dropped.
+
     Parameters:
     - schema_id (str): The ID of the schema to delete.
     - db: The database dependency.
@@ -161,9 +216,132 @@ async def delete_schema(schema_id: str, db=Depends(get_db)):
     - HTTPException: If the schema is not found, a 404 error is raised.
     """
     _id = PyObjectId(schema_id)
-    collection = db["schemas"]
+    collection = db.schemas
 
-    result = await collection.delete_one({"_id": _id})
-    if result.deleted_count == 0:
+    deleted = await collection.find_one_and_delete({"_id": _id})
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Schema not found")
+
+    await channel.publish(db, "schema", schema_id)
+    remaining = [schema async for schema in collection.find({}, {"fields": 1})]
+    await search.drop_schema(db, deleted, remaining)
+    await constraints.drop_unused_indexes(db, deleted, remaining)
     return SchemaDeletedResponse(_id=_id, detail="Schema deleted successfully")
+
+
+@router.get("/{schema_id}/snapshot")
+async def read_schema_snapshot(schema_id: str):
+    """
+    Report the size and memory use of a schema's in-memory object snapshot in this worker.
+
+    Parameters:
+    - schema_id (str): The ID of the schema.
+
+    Returns:
+    - dict: The number of objects held, the bytes used per object and the snapshot's age.
+
+    Raises:
+    - HTTPException: If no snapshot of the schema is loaded, a 404 error is raised.
+    """
+    stats = snapshots.stats(schema_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Snapshot not loaded")
+    return stats
+
+
+# Content types accepted by the import endpoint when no format is given
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+@router.post("/{schema_id}/import", response_model=ImportJob, status_code=202)
+async def import_objects(
+        schema_id: str,
+        request: Request,
+        format: Optional[ImportFormat] = None,
+        db=Depends(get_db)
+):
+    """
+    Create objects from a CSV or NDJSON upload, streamed and validated in parallel.
+
+    A CSV upload starts with a header row naming the schema fields; values are converted to
+    the fields' types. An NDJSON upload has one JSON object of field values per line. Rows
+    failing validation are reported and skipped; the others are stored, and published on the
+    event feed like any created object.
+
+    Rows are imported while the upload is received, and the response is sent once it has
+    been, while the last rows are still being written. Progress, including the bytes read
+    during the upload, and the outcome are reported at GET /schemas/{schema_id}/import/{job_id};
+    the id of an import still being uploaded is listed by GET /schemas/{schema_id}/import.
+
+    Parameters:
+    - schema_id (str): The schema the objects belong to.
+    - request (Request): The upload, read as a stream.
+    - format (ImportFormat): csv or ndjson; taken from the Content-Type header if omitted.
+    - db: The database dependency.
+
+    Returns:
+    - ImportJob: The running job, with its id.
+
+    Raises:
+    - HTTPException: 404 if the schema does not exist, 415 if the format is unknown,
+      400 if the CSV header names fields the schema doesn't have.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    format = format or IMPORT_CONTENT_TYPES.get(content_type)
+    if format is None:
+        raise HTTPException(status_code=415, detail="Upload text/csv or application/x-ndjson, or pass format")
+
+    cached = await schema_cache.get(schema_id, db.schemas)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Schema not found")
+
+    pipeline = ImportPipeline(db, cached.schema, format)
+    try:
+        return await pipeline.start(request.stream())
+    except ImportRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{schema_id}/import", response_model=List[ImportJob])
+async def read_imports(schema_id: str, db=Depends(get_db)):
+    """
+    List the most recent imports into a schema, newest first, e.g. to find the id of one still running.
+
+    Parameters:
+    - schema_id (str): The schema the objects are imported into.
+    - db: The database dependency.
+
+    Returns:
+    - List[ImportJob]: Up to 20 imports.
+    """
+    jobs = db[IMPORT_COLLECTION].find({"schema_id": schema_id}, sort=[("started_at", -1)], limit=20)
+    return [ImportJob(**job) async for job in jobs]
+
+
+@router.get("/{schema_id}/import/{job_id}", response_model=ImportJob)
+async def read_import(schema_id: str, job_id: str, db=Depends(get_db)):
+    """
+    Report the progress of an import.
+
+    Parameters:
+    - schema_id (str): The schema the objects are imported into.
+    - job_id (str): The import job id.
+    - db: The database dependency.
+
+    Returns:
+    - ImportJob: The import's progress so far.
+
+    Raises:
+    - HTTPException: If the import is not found, a 404 error is raised.
+    """
+    job = None
+    if ObjectId.is_valid(job_id):
+        job = await db[IMPORT_COLLECTION].find_one({"_id": ObjectId(job_id), "schema_id": schema_id})
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return ImportJob(**job)
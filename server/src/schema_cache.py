@@ -0,0 +1,119 @@
+import os
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Optional, Type
+
+from bson import ObjectId
+from pydantic import BaseModel
+
+from src.invalidation import channel
+from src.metrics import metrics
+from src.read_cache import ReadThroughCache
+from src.utils import build_partial_pydantic_model, build_pydantic_model
+
+# Safety net on top of the invalidation channel: entries are reloaded at least this often
+SCHEMA_CACHE_MAX_AGE = float(os.environ.get("SCHEMA_CACHE_MAX_AGE", "30"))
+# Number of compiled schemas kept per process
+SCHEMA_CACHE_SIZE = int(os.environ.get("SCHEMA_CACHE_SIZE", "1000"))
+
+
+@dataclass
+class CachedSchema:
+    """A schema document together with the Pydantic model compiled from its fields.
+
+    Attributes:
+        schema (dict): The schema document as stored in the database.
+        model (Type[BaseModel]): The model used to validate objects of this schema.
+        loaded_at (float): Monotonic time the entry was loaded.
+    """
+    schema: dict
+    model: Type[BaseModel]
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @cached_property
+    def partial_model(self) -> Type[BaseModel]:
+        """Model with every field optional, compiled on first use to validate partial updates."""
+        return build_partial_pydantic_model(self.schema.get("schema_name"), self.schema.get("fields"))
+
+
+class SchemaCache:
+    """Per-process cache of schemas and their compiled models.
+
+    Entries are dropped when a schema change is published on the invalidation channel and
+    expire after ``max_age`` seconds regardless, bounding staleness if a message is missed.
+    Concurrent misses for the same schema share one load.
+    """
+
+    def __init__(self, max_age: float = SCHEMA_CACHE_MAX_AGE, max_size: int = SCHEMA_CACHE_SIZE):
+        self.entries = ReadThroughCache("schemas", max_size, max_age)
+
+    async def get(self, schema_id, collection) -> Optional[CachedSchema]:
+        """Return the cached schema, loading and compiling it on a miss.
+
+        Args:
+            schema_id: The id of the schema.
+            collection: The schemas collection to load from on a miss.
+
+        Returns:
+            Optional[CachedSchema]: The cached schema, or None if it does not exist.
+        """
+        key = str(schema_id)
+        if not ObjectId.is_valid(key):
+            return None
+
+        async def load() -> Optional[CachedSchema]:
+            schema = await collection.find_one({"_id": ObjectId(key)})
+            return self.compile(schema) if schema is not None else None
+
+        return await self.entries.get(key, load)
+
+    def peek(self, schema_id) -> Optional[CachedSchema]:
+        """Return the cached schema if it is loaded, without loading it."""
+        return self.entries.peek(str(schema_id))
+
+    @staticmethod
+    def compile(schema: dict) -> CachedSchema:
+        """Compile the model of a schema document without caching it."""
+        model = build_pydantic_model(schema.get("schema_name"), schema.get("fields"))
+        return CachedSchema(schema=schema, model=model)
+
+    def put(self, schema: dict) -> CachedSchema:
+        """Compile and cache a schema document.
+
+        Args:
+            schema (dict): The schema document.
+
+        Returns:
+            CachedSchema: The new cache entry.
+        """
+        return self.store(self.compile(schema))
+
+    def store(self, entry: CachedSchema) -> CachedSchema:
+        """Cache a schema compiled with ``compile``, e.g. on another thread.
+
+        Args:
+            entry (CachedSchema): The compiled schema.
+
+        Returns:
+            CachedSchema: The entry.
+        """
+        self.entries.put(str(entry.schema["_id"]), entry)
+        return entry
+
+    def invalidate(self, schema_id):
+        """Drop a schema from the cache.
+
+        Args:
+            schema_id: The id of the schema to drop.
+        """
+        self.entries.invalidate(str(schema_id))
+
+    def clear(self):
+        """Drop every cached schema."""
+        self.entries.clear()
+
+
+schema_cache = SchemaCache()
+channel.subscribe("schema", schema_cache.invalidate)
+metrics.register_collector("schema_cache", schema_cache.entries.stats)
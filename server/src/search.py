@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import os
+import re
+from typing import Any, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError
+
+from src.repository.base import drop_index_if_exists, index_name
+
+logger = logging.getLogger(__name__)
+
+# Side collection holding the n-grams of the searchable fields of each object, one document per object
+SEARCH_COLLECTION = "object_search"
+# Length of the n-grams indexed; substring searches must be at least this long
+SEARCH_NGRAM_SIZE = int(os.environ.get("SEARCH_NGRAM_SIZE", "3"))
+# Objects re-indexed per batch when a schema's searchable fields change
+SEARCH_REBUILD_CHUNK_SIZE = 1000
+
+
+class SearchError(ValueError):
+    """Raised when a search names a field that can't be searched or its term or cursor is invalid."""
+
+
+def searchable_fields(schema: dict) -> List[str]:
+    """The fields of a schema declared ``searchable``."""
+    return [name for name, field in (schema.get("fields") or {}).items() if field.get("searchable")]
+
+
+def ngrams(value: str, size: int = SEARCH_NGRAM_SIZE) -> Set[str]:
+    """The lower-cased substrings of ``value`` that are ``size`` characters long."""
+    value = value.lower()
+    return {value[i:i + size] for i in range(len(value) - size + 1)}
+
+
+def _tokens(name: str, grams: Iterable[str]) -> List[str]:
+    # Prefixed with the field name so one multikey index serves every field
+    return [f"{name}:{gram}" for gram in sorted(grams)]
+
+
+def search_document(schema: dict, obj: dict) -> dict:
+    """The side index document of an object: the n-grams of each of its searchable fields."""
+    fields = obj.get("fields") or {}
+    grams = []
+    for name in searchable_fields(schema):
+        if isinstance(fields.get(name), str):
+            grams.extend(_tokens(name, ngrams(fields[name])))
+    return {"_id": obj["_id"], "schema_id": str(schema["_id"]), "grams": grams}
+
+
+async def ensure_indexes(db, schema: dict):
+    """Create the indexes searching a schema's objects needs: the n-gram side index and one per searchable field.
+
+    Args:
+        db: The database dependency.
+        schema (dict): The schema document.
+    """
+    await db[SEARCH_COLLECTION].create_index([("schema_id", 1), ("grams", 1)])
+    for name in searchable_fields(schema):
+        # Serves anchored prefix regexes as index range scans
+        await db.objects.create_index(_field_index(name))
+
+
+def _field_index(name: str) -> list:
+    return [("schema_id", 1), (f"fields.{name}", 1), ("_id", 1)]
+
+
+async def drop_schema(db, schema: dict, remaining: List[dict]):
+    """Remove a deleted schema's side index documents, and the field indexes no remaining schema searches.
+
+    Args:
+        db: The database dependency.
+        schema (dict): The deleted schema document.
+        remaining (List[dict]): The schema documents left.
+    """
+    await db[SEARCH_COLLECTION].delete_many({"schema_id": str(schema["_id"])})
+    used = {name for other in remaining for name in searchable_fields(other)}
+    for name in set(searchable_fields(schema)) - used:
+        await drop_index_if_exists(db.objects, index_name(_field_index(name)))
+
+
+async def index_objects(db, schema: dict, objects: List[dict]):
+    """Replace the side index documents of objects after they were created or their fields changed.
+
+    Does nothing, without a database call, if the schema has no searchable fields.
+
+    Args:
+        db: The database dependency.
+        schema (dict): The schema the objects belong to.
+        objects (List[dict]): The objects' full documents.
+    """
+    if not objects or not searchable_fields(schema):
+        return
+    collection = db[SEARCH_COLLECTION]
+    await collection.delete_many({"_id": {"$in": [obj["_id"] for obj in objects]}})
+    try:
+        await collection.insert_many([search_document(schema, obj) for obj in objects], ordered=False)
+    except BulkWriteError:
+        # A concurrent write of the same object indexed it first; results are checked against the object anyway
+        pass
+
+
+async def unindex_objects(db, schema: Optional[dict], ids: List[Any]):
+    """Remove the side index documents of deleted objects, if their schema has searchable fields.
+
+    Args:
+        db: The database dependency.
+        schema (Optional[dict]): The schema the objects belonged to.
+        ids (List[Any]): The ids of the deleted objects.
+    """
+    if ids and schema is not None and searchable_fields(schema):
+        await db[SEARCH_COLLECTION].delete_many({"_id": {"$in": ids}})
+
+
+async def rebuild(db, schema: dict):
+    """Re-index every object of a schema, e.g. after a field was made searchable.
+
+    Objects are indexed a chunk at a time, so substring searches miss the objects not reached yet.
+
+    Args:
+        db: The database dependency.
+        schema (dict): The schema document.
+    """
+    schema_id = str(schema["_id"])
+    await db[SEARCH_COLLECTION].delete_many({"schema_id": schema_id})
+    if not searchable_fields(schema):
+        return
+    await ensure_indexes(db, schema)
+    last_id = None
+    while True:
+        page = await db.objects.find_page({"schema_id": schema_id}, SEARCH_REBUILD_CHUNK_SIZE, after=last_id,
+                                          projection={"fields": 1})
+        if not page:
+            return
+        await index_objects(db, schema, page)
+        last_id = page[-1]["_id"]
+
+
+_rebuilds: Set[asyncio.Task] = set()
+
+
+def schedule_rebuild(db, schema: dict):
+    """Re-index a schema's objects in the background."""
+    async def run():
+        try:
+            await rebuild(db, schema)
+        except Exception:
+            logger.exception("Failed to rebuild the search index of schema %s", schema.get("_id"))
+
+    task = asyncio.create_task(run())
+    _rebuilds.add(task)
+    task.add_done_callback(_rebuilds.discard)
+
+
+def _split_cursor(cursor: str) -> Tuple[ObjectId, str]:
+    try:
+        _id, _, value = cursor.partition("|")
+        return ObjectId(_id), value
+    except (InvalidId, TypeError):
+        raise SearchError("Invalid search cursor")
+
+
+async def _search_prefix(db, schema_id: str, name: str, prefix: str, limit: int,
+                         cursor: Optional[str]) -> List[dict]:
+    path = f"fields.{name}"
+    query = {"schema_id": schema_id, path: {"$regex": f"^{re.escape(prefix)}"}}
+    if cursor is not None:
+        _id, value = _split_cursor(cursor)
+        query = {"$and": [query, {"$or": [{path: {"$gt": value}}, {path: value, "_id": {"$gt": _id}}]}]}
+    return [obj async for obj in db.objects.find(query, sort=[(path, 1), ("_id", 1)], limit=limit)]
+
+
+async def _search_substring(db, schema_id: str, name: str, term: str, limit: int,
+                            cursor: Optional[str]) -> List[dict]:
+    if len(term) < SEARCH_NGRAM_SIZE:
+        raise SearchError(f"Search for at least {SEARCH_NGRAM_SIZE} characters")
+    after = _split_cursor(cursor)[0] if cursor is not None else None
+    query = {"schema_id": schema_id, "grams": {"$all": _tokens(name, ngrams(term))}}
+    term = term.lower()
+    found: List[dict] = []
+    while len(found) < limit:
+        candidates = await db[SEARCH_COLLECTION].find_page(query, limit, after=after, projection={"_id": 1})
+        if not candidates:
+            break
+        ids = [candidate["_id"] for candidate in candidates]
+        objects = {obj["_id"]: obj async for obj in db.objects.find({"_id": {"$in": ids}})}
+        for _id in ids:
+            value = objects.get(_id, {}).get("fields", {}).get(name)
+            # Every n-gram being present doesn't mean they are contiguous, and the index may lag a write
+            if isinstance(value, str) and term in value.lower():
+                found.append(objects[_id])
+        after = ids[-1]
+    return found[:limit]
+
+
+async def search(db, schema: dict, name: str, prefix: Optional[str] = None, contains: Optional[str] = None,
+                 limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """Find the objects of a schema whose string field starts with or contains a term.
+
+    Both need the field to be searchable, so neither scans the schema's objects. Prefix
+    searches are anchored regexes, which MongoDB answers with a range scan of the field's
+    index, and return objects in field order. Substring searches look up the term's n-grams
+    in the side index, case-insensitively, and return objects in id order.
+
+    Args:
+        db: The database dependency.
+        schema (dict): The schema document.
+        name (str): The field searched.
+        prefix (Optional[str]): The value the field starts with.
+        contains (Optional[str]): A substring of the field.
+        limit (int): Maximum number of objects to return.
+        cursor (Optional[str]): The cursor of the previous page.
+
+    Returns:
+        Tuple[List[dict], Optional[str]]: The objects and the cursor of the next page, or None if this is the last.
+
+    Raises:
+        SearchError: If the field isn't a searchable string field, exactly one of prefix and contains
+            isn't given, the substring is too short or the cursor is invalid.
+    """
+    field = (schema.get("fields") or {}).get(name)
+    if field is None or field.get("type", "str") != "str":
+        raise SearchError(f"{name} is not a string field of the schema")
+    if (prefix is None) == (contains is None):
+        raise SearchError("Give either prefix or contains")
+    if not field.get("searchable"):
+        raise SearchError(f"{name} is not searchable")
+
+    schema_id = str(schema["_id"])
+    if prefix is not None:
+        found = await _search_prefix(db, schema_id, name, prefix, limit + 1, cursor)
+    else:
+        found = await _search_substring(db, schema_id, name, contains, limit + 1, cursor)
+
+    if len(found) > limit:
+        found = found[:limit]
+        last = found[-1]
+        return found, f"{last['_id']}|{last['fields'][name]}"
+    return found, None
@@ -0,0 +1,328 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+import numpy as np
+
+from src.events import broker
+from src.invalidation import channel
+from src.schema_cache import schema_cache
+
+logger = logging.getLogger(__name__)
+
+# Snapshots older than this are rebuilt and answered from Mongo meanwhile; a safety net should a
+# message from another worker be missed, since their writes reach a snapshot only through a rebuild
+SNAPSHOT_MAX_AGE = float(os.environ.get("SNAPSHOT_MAX_AGE", "60"))
+SNAPSHOT_INITIAL_CAPACITY = 1024
+
+NUMERIC_OPERATORS = {
+    "$eq": np.equal, "$ne": np.not_equal,
+    "$lt": np.less, "$lte": np.less_equal, "$gt": np.greater, "$gte": np.greater_equal,
+}
+CODED_OPERATORS = {"$eq", "$ne", "$in", "$nin"}
+
+
+def _all_of(values: Any, types: tuple) -> bool:
+    return isinstance(values, list) and all(isinstance(value, types) for value in values)
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    return value.timestamp() if isinstance(value, datetime) else np.nan
+
+
+class SchemaSnapshot:
+    """Columnar in-memory copy of the filterable state of one schema's objects.
+
+    Numeric fields are held as float64 columns, enum and boolean fields as int16 dictionary
+    codes (-1 when missing) and reservation state as a flag plus lease expiry, so filters and
+    counts are answered with vectorized masks instead of a database query. String fields
+    without an enum are not held; filters on them are answered by Mongo.
+
+    Attributes:
+        schema_id (str): The schema the snapshot holds objects of.
+        built_at (float): Monotonic time the snapshot was last loaded from the database.
+        stale (bool): Whether a write the snapshot could not apply has been seen.
+    """
+
+    def __init__(self, schema_id: str, fields: Dict[str, dict]):
+        self.schema_id = schema_id
+        self.built_at = time.monotonic()
+        self.stale = False
+        self._numeric = [name for name, field in fields.items()
+                         if field.get("type") in ("int", "float") and not field.get("enum")]
+        self._dictionaries: Dict[str, Dict[Any, int]] = {
+            name: {value: code for code, value in enumerate(field["enum"])}
+            for name, field in fields.items() if field.get("enum")
+        }
+        self._dictionaries.update({
+            name: {False: 0, True: 1} for name, field in fields.items() if field.get("type") == "boolean"
+        })
+
+        self._size = 0
+        self._rows: Dict[str, int] = {}
+        self._ids: list = []
+        self._allocate(SNAPSHOT_INITIAL_CAPACITY)
+
+    def _allocate(self, capacity: int):
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._reserved = np.zeros(capacity, dtype=bool)
+        self._reserved_until = np.full(capacity, np.nan)
+        self._columns = {name: np.full(capacity, np.nan) for name in self._numeric}
+        self._codes = {name: np.full(capacity, -1, dtype=np.int16) for name in self._dictionaries}
+
+    def _arrays(self) -> list:
+        return [self._alive, self._reserved, self._reserved_until, *self._columns.values(), *self._codes.values()]
+
+    def _resize(self, capacity: int, keep: np.ndarray):
+        """Move the rows selected by ``keep`` into freshly allocated columns of ``capacity`` rows."""
+        alive, reserved, reserved_until = self._alive, self._reserved, self._reserved_until
+        columns, codes = self._columns, self._codes
+        self._allocate(capacity)
+
+        count = int(keep.sum())
+        self._alive[:count] = alive[keep]
+        self._reserved[:count] = reserved[keep]
+        self._reserved_until[:count] = reserved_until[keep]
+        for name, column in columns.items():
+            self._columns[name][:count] = column[keep]
+        for name, column in codes.items():
+            self._codes[name][:count] = column[keep]
+
+        self._ids = [object_id for object_id, kept in zip(self._ids, keep) if kept]
+        self._rows = {object_id: row for row, object_id in enumerate(self._ids)}
+        self._size = count
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def apply(self, obj: dict):
+        """Insert or overwrite the row of an object from its full document."""
+        object_id = str(obj["_id"])
+        row = self._rows.get(object_id)
+        if row is None:
+            if self._size == len(self._alive):
+                keep = np.zeros(len(self._alive), dtype=bool)
+                keep[:self._size] = self._alive[:self._size]
+                # Grow, compacting away deleted rows at the same time
+                self._resize(max(SNAPSHOT_INITIAL_CAPACITY, 2 * int(keep.sum()) + 1), keep)
+            row = self._size
+            self._size += 1
+            self._ids.append(object_id)
+            self._rows[object_id] = row
+
+        fields = obj.get("fields", {})
+        self._alive[row] = True
+        self._reserved[row] = obj.get("reserved_by") is not None
+        self._reserved_until[row] = _timestamp(obj.get("reserved_until"))
+        for name, column in self._columns.items():
+            value = fields.get(name)
+            column[row] = value if isinstance(value, (int, float)) else np.nan
+        for name, codes in self._codes.items():
+            codes[row] = self._dictionaries[name].get(fields.get(name), -1)
+
+    def remove(self, object_id: Any):
+        """Drop the row of a deleted object."""
+        row = self._rows.pop(str(object_id), None)
+        if row is not None:
+            self._alive[row] = False
+
+    def _condition_mask(self, name: str, condition: Any) -> Optional[np.ndarray]:
+        conditions = condition if isinstance(condition, dict) else {"$eq": condition}
+        mask = np.ones(self._size, dtype=bool)
+
+        if name in self._columns:
+            column = self._columns[name][:self._size]
+            for operator, value in conditions.items():
+                if operator in ("$in", "$nin") and _all_of(value, (int, float)):
+                    matched = np.isin(column, np.asarray(value, dtype=float))
+                    mask &= matched if operator == "$in" else ~matched
+                elif operator in NUMERIC_OPERATORS and isinstance(value, (int, float)):
+                    mask &= NUMERIC_OPERATORS[operator](column, value)
+                else:
+                    return None
+            return mask
+
+        if name in self._codes:
+            codes = self._codes[name][:self._size]
+            dictionary = self._dictionaries[name]
+            for operator, value in conditions.items():
+                values = value if operator in ("$in", "$nin") else [value]
+                if operator not in CODED_OPERATORS or not _all_of(values, (str, int, float, bool)):
+                    return None
+                # Values outside the dictionary can never match a stored code
+                matched = np.isin(codes, [dictionary.get(v, -2) for v in values])
+                mask &= matched if operator in ("$eq", "$in") else ~matched
+            return mask
+
+        return None
+
+    def count(self, filters: Dict[str, Any], available: Optional[bool] = None) -> Optional[int]:
+        """Count the objects matching a filter.
+
+        Args:
+            filters (Dict[str, Any]): A filter on schema fields, as accepted by ``build_object_query``.
+            available (Optional[bool]): Only count free (True) or reserved (False) objects.
+
+        Returns:
+            Optional[int]: The count, or None if the filter uses fields or operators the snapshot can't answer.
+        """
+        mask = self._alive[:self._size].copy()
+        for name, condition in filters.items():
+            condition_mask = self._condition_mask(name, condition)
+            if condition_mask is None:
+                return None
+            mask &= condition_mask
+
+        if available is not None:
+            lease_over = self._reserved_until[:self._size] <= datetime.now().timestamp()
+            free = ~self._reserved[:self._size] | lease_over
+            mask &= free if available else ~free
+        return int(mask.sum())
+
+    def stats(self) -> dict:
+        """Report the size of the snapshot and the memory it uses per object."""
+        column_bytes = sum(array.nbytes for array in self._arrays())
+        index_bytes = sys.getsizeof(self._rows) + sys.getsizeof(self._ids) + sum(sys.getsizeof(i) for i in self._ids)
+        objects = len(self)
+        return {
+            "schema_id": self.schema_id,
+            "objects": objects,
+            "capacity": len(self._alive),
+            "column_bytes": column_bytes,
+            "index_bytes": index_bytes,
+            "bytes_per_object": round((column_bytes + index_bytes) / objects, 1) if objects else None,
+            "age_seconds": round(time.monotonic() - self.built_at, 3),
+            "stale": self.stale,
+        }
+
+
+class SnapshotManager:
+    """Keeps the snapshots of the schemas that opted in with ``snapshot: true`` current.
+
+    Snapshots are loaded from the database on first use, kept up to date from the object
+    write paths through the event broker, and rebuilt in the background when they become
+    stale. Callers get None whenever a snapshot can't be trusted and should query Mongo,
+    including while a build that failed waits to be retried on the next use.
+
+    Writes served by other worker processes don't reach the broker here. Each worker
+    announces the snapshot schemas it wrote objects of on the invalidation channel instead, and the
+    others mark their snapshots of them stale, so a snapshot lags another worker's write by
+    at most ``INVALIDATION_POLL_INTERVAL`` (twice that for notifications sent on a poll).
+    """
+
+    def __init__(self, max_age: float = SNAPSHOT_MAX_AGE):
+        self.max_age = max_age
+        self._snapshots: Dict[str, SchemaSnapshot] = {}
+        self._builds: Dict[str, asyncio.Task] = {}
+        self._pending: Dict[str, list] = {}
+        # Schemas seen with snapshots enabled, for writes whose schema isn't in the schema cache
+        self._enabled: Set[str] = set()
+
+    def get(self, schema: dict, collection) -> Optional[SchemaSnapshot]:
+        """Return the schema's snapshot if it is fresh, otherwise start a rebuild and return None.
+
+        Args:
+            schema (dict): The schema document.
+            collection: The objects collection to rebuild from.
+
+        Returns:
+            Optional[SchemaSnapshot]: The snapshot, or None if the caller should query Mongo.
+        """
+        if not schema.get("snapshot"):
+            return None
+        schema_id = str(schema["_id"])
+        snapshot = self._snapshots.get(schema_id)
+        if snapshot is not None and not snapshot.stale and time.monotonic() - snapshot.built_at < self.max_age:
+            return snapshot
+        if schema_id not in self._builds:
+            task = self._builds[schema_id] = asyncio.create_task(self.build(schema, collection))
+            task.add_done_callback(lambda done: self._built(schema_id, done))
+        return None
+
+    def _built(self, schema_id: str, task: asyncio.Task):
+        """Forget a finished background build, so a failed one is retried on the next use."""
+        if self._builds.get(schema_id) is task:
+            del self._builds[schema_id]
+        if not task.cancelled() and task.exception() is not None:
+            # Logged by build; retrieving it here keeps asyncio from reporting it again
+            logger.warning("Counts of schema %s are answered from the database until its snapshot loads", schema_id)
+
+    async def build(self, schema: dict, collection) -> SchemaSnapshot:
+        """Load a snapshot of every object of a schema, replaying writes seen while loading.
+
+        Args:
+            schema (dict): The schema document.
+            collection: The objects collection.
+
+        Returns:
+            SchemaSnapshot: The new snapshot.
+        """
+        schema_id = str(schema["_id"])
+        self._enabled.add(schema_id)
+        self._pending[schema_id] = []
+        try:
+            snapshot = SchemaSnapshot(schema_id, schema.get("fields", {}))
+            projection = {"fields": 1, "reserved_by": 1, "reserved_until": 1}
+            async for obj in collection.find({"schema_id": schema_id}, projection):
+                snapshot.apply(obj)
+
+            for event_type, object_id, data in self._pending[schema_id]:
+                self._apply(snapshot, event_type, object_id, data)
+            self._snapshots[schema_id] = snapshot
+            return snapshot
+        except Exception:
+            logger.exception("Failed to build the snapshot of schema %s", schema_id)
+            raise
+        finally:
+            self._pending.pop(schema_id, None)
+
+    @staticmethod
+    def _apply(snapshot: SchemaSnapshot, event_type: str, object_id: Any, data: Optional[dict]):
+        if event_type == "deleted":
+            snapshot.remove(object_id)
+        elif data is not None:
+            snapshot.apply(data)
+        else:
+            # Bulk writes and other workers' writes don't carry the documents; rebuild rather than guess
+            snapshot.stale = True
+
+    def on_event(self, event_type: str, schema_id: str, object_id: Any, data: Optional[dict]):
+        """Broker listener applying object writes to the affected snapshot and announcing them to other workers."""
+        cached = schema_cache.peek(schema_id)
+        enabled = cached.schema.get("snapshot") if cached is not None else str(schema_id) in self._enabled
+        if enabled:
+            channel.notify("objects", str(schema_id))
+        if schema_id in self._pending:
+            self._pending[schema_id].append((event_type, object_id, data))
+        snapshot = self._snapshots.get(schema_id)
+        if snapshot is not None:
+            self._apply(snapshot, event_type, object_id, data)
+
+    def mark_stale(self, schema_id: str):
+        """Rebuild a snapshot on its next use, e.g. because another worker wrote objects of its schema."""
+        schema_id = str(schema_id)
+        if schema_id in self._pending:
+            # The write may have been missed by the load in progress
+            self._pending[schema_id].append(("changed", None, None))
+        snapshot = self._snapshots.get(schema_id)
+        if snapshot is not None:
+            snapshot.stale = True
+
+    def invalidate(self, schema_id: str):
+        """Drop a snapshot, e.g. because the schema's fields changed."""
+        self._snapshots.pop(str(schema_id), None)
+
+    def stats(self, schema_id: str) -> Optional[dict]:
+        """Report the size and memory use of a schema's snapshot, if one is loaded."""
+        snapshot = self._snapshots.get(str(schema_id))
+        return snapshot.stats() if snapshot is not None else None
+
+
+snapshots = SnapshotManager()
+broker.add_listener(snapshots.on_event)
+channel.subscribe("schema", snapshots.invalidate)
+channel.subscribe("objects", snapshots.mark_stale)
@@ -80,7 +80,8 @@ def build_constrained_field(fields: Dict[str, Any]):
         "str": str,
         "int": int,
         "float": float,
-        "bool": bool
+        "bool": bool,
+        "boolean": bool
     }.get(type_name, str)
 
     return base_type, ... if required else None
@@ -94,6 +95,13 @@ def build_pydantic_model(name: str, fields: Dict[str, Any]):
 
     return create_model(name, **model_fields)
 
+
+def build_partial_pydantic_model(name: str, fields: Dict[str, Any]):
+    """Build a model accepting any subset of the schema's fields, used to validate partial updates."""
+    return build_pydantic_model(name, {
+        field_name: {**field_def, "required": False} for field_name, field_def in fields.items()
+    })
+
 # model = build_pydantic_model(schema["schema_name"], schema["fields"])
 # model_instance = model(name="John", price=10.0, category="book")
 # print("########################  SCHEMA #################################")
@@ -0,0 +1,126 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from src.metrics import metrics
+from src.schema_cache import CachedSchema
+from src.utils import build_partial_pydantic_model, build_pydantic_model
+
+# Payloads larger than this (bytes) are validated off the event loop unless their schema says otherwise
+VALIDATION_OFFLOAD_BYTES = int(os.environ.get("VALIDATION_OFFLOAD_BYTES", "65536"))
+# Where large payloads are validated: "thread" or "process"
+VALIDATION_OFFLOAD_MODE = os.environ.get("VALIDATION_OFFLOAD_MODE", "thread")
+VALIDATION_THREADS = int(os.environ.get("VALIDATION_THREADS", "4"))
+# Processes validating imports and offloaded objects
+VALIDATION_PROCESSES = int(os.environ.get("VALIDATION_PROCESSES", str(min(4, os.cpu_count() or 1))))
+
+
+class ValidationFailed(ValueError):
+    """Raised when object fields don't satisfy their schema."""
+
+
+# Models compiled in this process, keyed by schema id, version and whether they are partial
+_models: Dict[Tuple[str, str, bool], Any] = {}
+
+
+def worker_schema(schema: dict) -> dict:
+    """The parts of a schema document a pool worker needs to compile its model."""
+    return {key: schema.get(key) for key in ("_id", "schema_name", "fields", "updated_at")}
+
+
+def compiled_model(schema: dict, partial: bool = False):
+    """Return the model of a schema, compiling it once per process and schema version.
+
+    Used in pool workers, which can't be sent the server's compiled models.
+    """
+    key = (str(schema["_id"]), str(schema.get("updated_at")), partial)
+    model = _models.get(key)
+    if model is None:
+        build = build_partial_pydantic_model if partial else build_pydantic_model
+        model = _models[key] = build(schema.get("schema_name"), schema.get("fields"))
+    return model
+
+
+def _check(model, fields: dict) -> Optional[str]:
+    try:
+        model(**fields)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def check_fields(schema: dict, fields: dict, partial: bool = False) -> Optional[str]:
+    """Validate fields against a schema in a pool worker, returning the error message if invalid."""
+    return _check(compiled_model(schema, partial), fields)
+
+
+_thread_pool: Optional[Executor] = None
+_process_pool: Optional[Executor] = None
+
+
+def thread_pool() -> Executor:
+    """The thread pool for offloaded validation, started on first use."""
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(VALIDATION_THREADS, thread_name_prefix="validation")
+    return _thread_pool
+
+
+def process_pool() -> Executor:
+    """The process pool for imports and offloaded validation, started on first use."""
+    global _process_pool
+    if _process_pool is None:
+        # Workers are spawned rather than forked so they don't inherit the server's threads and sockets
+        _process_pool = ProcessPoolExecutor(VALIDATION_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _process_pool
+
+
+def shutdown_pools():
+    """Stop the validation threads and processes, if started."""
+    global _thread_pool, _process_pool
+    for pool in (_thread_pool, _process_pool):
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    _thread_pool = _process_pool = None
+
+
+def validation_mode(schema: dict, size: int) -> str:
+    """Choose where to validate a payload: the schema's setting, else offload it only if it is large."""
+    configured = schema.get("validation")
+    if configured is not None:
+        return configured
+    return VALIDATION_OFFLOAD_MODE if size > VALIDATION_OFFLOAD_BYTES else "inline"
+
+
+async def validate_fields(cached: CachedSchema, fields: dict, size: int = 0, partial: bool = False):
+    """Validate object fields against their schema, off the event loop if the schema or payload size calls for it.
+
+    Threads use the compiled models of the schema cache; processes compile each schema once.
+    Time spent is recorded in the ``validation_seconds`` histogram per mode.
+
+    Args:
+        cached (CachedSchema): The schema.
+        fields (dict): The field values.
+        size (int): The payload size in bytes, e.g. the request's Content-Length.
+        partial (bool): Validate a partial update, in which every field is optional.
+
+    Raises:
+        ValidationFailed: If the fields are invalid.
+    """
+    mode = validation_mode(cached.schema, size)
+    model = cached.partial_model if partial else cached.model
+    started = time.perf_counter()
+    if mode == "inline":
+        error = _check(model, fields)
+    else:
+        loop = asyncio.get_running_loop()
+        if mode == "thread":
+            error = await loop.run_in_executor(thread_pool(), _check, model, fields)
+        else:
+            error = await loop.run_in_executor(process_pool(), check_fields, worker_schema(cached.schema), fields, partial)
+    metrics.observe("validation_seconds", time.perf_counter() - started, mode=mode)
+    if error is not None:
+        raise ValidationFailed(error)
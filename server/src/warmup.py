@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from src.repository import ensure_indexes
+from src.schema_cache import schema_cache
+from src.snapshot import snapshots
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before retrying a warm-up that failed, e.g. because the database isn't up yet
+WARMUP_RETRY_SECONDS = float(os.environ.get("WARMUP_RETRY_SECONDS", "2"))
+
+
+class Readiness:
+    """Tracks whether this worker has finished warming its caches and can take traffic.
+
+    Attributes:
+        ready (bool): Whether warm-up has completed.
+        schemas (int): The number of schemas compiled during warm-up.
+        started_at (float): Monotonic time warm-up started.
+        duration (Optional[float]): Seconds warm-up took, once it has completed.
+        attempts (int): The number of warm-up attempts made.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.schemas = 0
+        self.started_at = time.monotonic()
+        self.duration: Optional[float] = None
+        self.attempts = 0
+
+    def report(self) -> dict:
+        return {
+            "status": "ready" if self.ready else "warming_up",
+            "schemas": self.schemas,
+            "warmup_seconds": round(self.duration, 3) if self.duration is not None else None,
+            "attempts": self.attempts,
+        }
+
+
+readiness = Readiness()
+
+
+async def warm_up(db) -> int:
+    """Create missing indexes, then load every schema, compile their models concurrently and load any enabled snapshots.
+
+    Models are compiled on the default thread pool so a large number of schemas doesn't
+    block the event loop while the worker is already answering liveness checks. They are
+    cached back on the event loop, since the cache isn't safe to change from other threads.
+
+    Args:
+        db: The application database.
+
+    Returns:
+        int: The number of schemas warmed.
+    """
+    await ensure_indexes(db)
+    schemas = [schema async for schema in db.schemas.find()]
+    compiled = await asyncio.gather(*(asyncio.to_thread(schema_cache.compile, schema) for schema in schemas))
+    for entry in compiled:
+        schema_cache.store(entry)
+    await asyncio.gather(*(
+        snapshots.build(schema, db.objects) for schema in schemas if schema.get("snapshot")
+    ))
+    return len(schemas)
+
+
+async def run_warm_up(db):
+    """Warm up, retrying until it succeeds, then mark the worker ready.
+
+    Args:
+        db: The application database.
+    """
+    readiness.started_at = time.monotonic()
+    while True:
+        readiness.attempts += 1
+        try:
+            readiness.schemas = await warm_up(db)
+            break
+        except Exception:
+            logger.exception("Warm-up failed, retrying in %s seconds", WARMUP_RETRY_SECONDS)
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+
+    readiness.duration = time.monotonic() - readiness.started_at
+    readiness.ready = True
+    logger.info("Warm-up finished: %s schemas in %.3f seconds", readiness.schemas, readiness.duration)
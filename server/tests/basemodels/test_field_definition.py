@@ -45,3 +45,21 @@ def test_validate_constraints_valid_field_definition():
     """Test that a valid FieldDefinition does not raise any exceptions during validation."""
     field_def = FieldDefinition(type="str", required=True)
     field_def.model_dump(exclude_none=True)
+
+
+def test_example_create_request_is_valid():
+    """Test that the example shown in the API docs is a valid CreateSchemaRequest."""
+    from src.basemodels.schema_base_models import CreateSchemaRequest, EXAMPLE_CREATE_REQUEST
+    CreateSchemaRequest(**EXAMPLE_CREATE_REQUEST)
+
+
+def test_validate_constraints_searchable_int():
+    """Test that a ValueError is raised when a non-string FieldDefinition is made searchable."""
+    with pytest.raises(ValueError, match="searchable is only supported for strings"):
+        FieldDefinition(type="int", searchable=True)
+
+
+def test_validate_constraints_unique_list():
+    """Test that a ValueError is raised when a list FieldDefinition is made unique."""
+    with pytest.raises(ValueError, match="unique is not supported for lists"):
+        FieldDefinition(type="list", unique=True)
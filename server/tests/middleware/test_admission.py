@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from src.basemodels.admin_base_models import AdmissionLimits, AdmissionLimitsUpdate
+from src.db import get_db
+from src.middleware.admission import AdmissionController, AdmissionMiddleware, Gate, admission, route_class
+from src.routes.adminrouter import router as admin_router
+from src.repository import InMemoryDatabase
+
+
+def __app(controller: AdmissionController) -> FastAPI:
+    """Helper function to create an app with one read and one write route behind the admission middleware."""
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+
+    @app.get("/objects/{object_id}")
+    async def read(object_id: str):
+        return {"id": object_id}
+
+    return app
+
+
+def test_route_class():
+    """Test that requests are classified into reads, single-object writes and bulk operations."""
+    assert route_class("GET", "/objects/abc") == "read"
+    assert route_class("POST", "/objects/") == "write"
+    assert route_class("DELETE", "/objects/abc") == "write"
+    assert route_class("DELETE", "/objects/") == "bulk"
+    assert route_class("PATCH", "/objects") == "bulk"
+    assert route_class("POST", "/schemas/abc/import") == "bulk"
+    assert route_class("GET", "/schemas/abc/import") == "read"
+
+
+def test_rate_limit_per_api_key():
+    """Test that a key over its burst gets 429 with Retry-After while other keys are unaffected."""
+    controller = AdmissionController(AdmissionLimits(rate_per_second=0.1, burst=2))
+    client = TestClient(__app(controller))
+
+    for _ in range(2):
+        assert client.get("/objects/1", headers={"X-API-Key": "importer"}).status_code == 200
+    response = client.get("/objects/1", headers={"X-API-Key": "importer"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert client.get("/objects/1", headers={"X-API-Key": "dashboard"}).status_code == 200
+
+
+def test_overloaded_route_class_is_shed():
+    """Test that a request finding no slot within the queueing budget gets 503 with Retry-After."""
+    controller = AdmissionController(AdmissionLimits(max_in_flight={"read": 0, "write": 1, "bulk": 1},
+                                                     queue_timeout=0.01))
+    response = TestClient(__app(controller)).get("/objects/1")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_websocket_connections_are_rate_limited():
+    """Test that a WebSocket opened by a key over its rate is closed with 1013 before being accepted."""
+    controller = AdmissionController(AdmissionLimits(rate_per_second=0.1, burst=1))
+    app = __app(controller)
+
+    @app.websocket("/ws")
+    async def channel(websocket: WebSocket):
+        await websocket.accept()
+        await websocket.close()
+
+    client = TestClient(app)
+    with client.websocket_connect("/ws"):
+        pass
+    with pytest.raises(WebSocketDisconnect) as error:
+        with client.websocket_connect("/ws"):
+            pass
+    assert error.value.code == 1013
+
+
+def test_gate_admits_waiters_in_order_and_sheds_when_queue_full():
+    """Test that released slots go to waiters in FIFO order and a full queue rejects immediately."""
+    async def scenario():
+        gate = Gate()
+        assert await gate.acquire(1, 2, 1)
+        first = asyncio.create_task(gate.acquire(1, 2, 1))
+        second = asyncio.create_task(gate.acquire(1, 2, 1))
+        await asyncio.sleep(0)
+        assert not await gate.acquire(1, 2, 1)
+
+        gate.release(1)
+        assert await first
+        assert not second.done()
+        gate.release(1)
+        assert await second
+        assert gate.in_flight == 1 and gate.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_gate_timeout_leaves_no_slot_behind():
+    """Test that a waiter timing out is removed from the queue without taking a slot."""
+    async def scenario():
+        gate = Gate()
+        assert await gate.acquire(1, 1, 1)
+        assert not await gate.acquire(1, 1, 0.01)
+        assert gate.queued == 0
+        gate.release(1)
+        assert gate.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def admin_client(monkeypatch):
+    """Fixture to create a client for the admin routes with an admin key, restoring the global limits afterwards."""
+    monkeypatch.setattr("src.routes.adminrouter.ADMIN_API_KEY", "secret")
+    app = FastAPI()
+    app.include_router(admin_router, prefix="/admin")
+    db = InMemoryDatabase()
+
+    async def override_get_db():
+        yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    original = admission.limits
+    yield TestClient(app, headers={"X-Admin-Key": "secret"}), db
+    admission.limits = original
+
+
+def test_update_limits_at_runtime(admin_client):
+    """Test that limits changed through the admin API apply without a restart, keeping unchanged values."""
+    admin_client, _ = admin_client
+    response = admin_client.put("/admin/limits", json={"burst": 5, "max_in_flight": {"bulk": 1}})
+    assert response.status_code == 200
+    assert response.json()["burst"] == 5
+    assert response.json()["max_in_flight"]["bulk"] == 1
+    assert response.json()["max_in_flight"]["read"] == AdmissionLimits().max_in_flight["read"]
+    assert admission.limits.burst == 5
+
+
+def test_update_limits_rejects_unknown_route_class(admin_client):
+    """Test that limits for an unknown route class are rejected."""
+    admin_client, _ = admin_client
+    response = admin_client.put("/admin/limits", json={"max_queue": {"uploads": 1}})
+    assert response.status_code == 422
+
+
+def test_admin_routes_need_a_key(admin_client, monkeypatch):
+    """Test that admin routes refuse a wrong key, and every request while no key is configured."""
+    admin_client, _ = admin_client
+    assert admin_client.get("/admin/limits", headers={"X-Admin-Key": "guess"}).status_code == 403
+    monkeypatch.setattr("src.routes.adminrouter.ADMIN_API_KEY", None)
+    response = admin_client.put("/admin/limits", json={"max_in_flight": {"read": 0}})
+    assert response.status_code == 403
+    assert admission.limits.max_in_flight["read"] != 0
+
+
+def test_saved_limits_are_loaded_by_new_workers(admin_client):
+    """Test that a worker started after limits changes applies them, in order."""
+    admin_client, db = admin_client
+    admin_client.put("/admin/limits", json={"burst": 5, "max_queue": {"bulk": 1}})
+    admin_client.put("/admin/limits", json={"burst": 7})
+
+    controller = AdmissionController()
+    limits = asyncio.run(controller.load(db))
+    assert (limits.burst, limits.max_queue["bulk"]) == (7, 1)
+    assert limits.max_queue["read"] == AdmissionLimits().max_queue["read"]
+
+
+def test_limits_update_from_another_worker_is_applied():
+    """Test that a limits change received on the invalidation channel updates this worker's limits."""
+    controller = AdmissionController()
+    controller.update(AdmissionLimitsUpdate.model_validate_json('{"queue_timeout": 2.5}'))
+    assert controller.limits.queue_timeout == 2.5
@@ -0,0 +1,121 @@
+import asyncio
+import gzip
+import zlib
+
+import brotli
+import pytest
+import zstandard
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.metrics import metrics
+from src.middleware.compression import CompressionMiddleware, _CompressionResponder, available_encodings, negotiate
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100)
+LARGE = "environment=Dev_1;" * 500
+
+
+@app.get("/large")
+async def large():
+    return PlainTextResponse(LARGE)
+
+
+@app.get("/small")
+async def small():
+    return PlainTextResponse("tiny")
+
+
+@app.get("/stream")
+async def stream():
+    async def chunks():
+        for _ in range(50):
+            yield LARGE[:200]
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+@app.get("/events")
+async def events():
+    return StreamingResponse(iter(["data: x\n\n"] * 100), media_type="text/event-stream")
+
+
+client = TestClient(app)
+
+# Incremental decoders of each encoding, returning the text decoded from the bytes given so far
+DECODERS = {
+    "gzip": lambda: zlib.decompressobj(31).decompress,
+    "br": lambda: brotli.Decompressor().process,
+    "zstd": lambda: zstandard.ZstdDecompressor().decompressobj().decompress,
+}
+
+
+def test_negotiate_prefers_server_order_and_respects_q_values():
+    """Test that the most preferred accepted encoding is chosen and q=0 encodings are refused."""
+    supported = ["zstd", "br", "gzip"]
+    assert negotiate("gzip, br", supported) == "br"
+    assert negotiate("br;q=0, gzip;q=0.5", supported) == "gzip"
+    assert negotiate("*", supported) == "zstd"
+    assert negotiate("identity", supported) is None
+    assert negotiate("", supported) is None
+
+
+def test_large_response_is_compressed():
+    """Test that a response above the minimum size is gzip compressed and the savings are recorded."""
+    metrics.reset()
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == LARGE
+    assert metrics.counter("compression_bytes_in", encoding="gzip") == len(LARGE)
+    assert metrics.counter("compression_bytes_out", encoding="gzip") < len(LARGE)
+
+
+@pytest.mark.parametrize("encoding", ["zstd", "br", "gzip"])
+def test_every_encoding_round_trips(encoding):
+    """Test that each supported encoding is chosen when it is the only one accepted and decodes to the body."""
+    with client.stream("GET", "/large", headers={"Accept-Encoding": encoding}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == encoding
+    assert DECODERS[encoding]()(raw).decode() == LARGE
+
+
+@pytest.mark.parametrize("encoding", ["zstd", "br", "gzip"])
+def test_streamed_chunks_are_flushed(encoding):
+    """Test that every streamed chunk is sent flushed, so the client can decode it before the response ends."""
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def scenario():
+        responder = _CompressionResponder(send, encoding, available_encodings()[encoding], minimum_size=100)
+        await responder.send({"type": "http.response.start", "status": 200, "headers": []})
+        decode = DECODERS[encoding]()
+        for chunk in ("a" * 150, "b" * 10, "c" * 10):
+            await responder.send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+            assert decode(sent[-1]["body"]).decode() == chunk
+        await responder.send({"type": "http.response.body", "body": b""})
+        decode(sent[-1]["body"])
+
+    asyncio.run(scenario())
+
+
+def test_small_response_is_not_compressed():
+    """Test that a response below the minimum size is sent as-is."""
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.text == "tiny"
+
+
+def test_streaming_response_is_compressed_incrementally():
+    """Test that a streamed body is compressed chunk by chunk into one valid gzip stream."""
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(raw).decode() == LARGE[:200] * 50
+
+
+def test_event_stream_is_not_compressed():
+    """Test that server-sent events are never compressed, so each event reaches the client immediately."""
+    response = client.get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
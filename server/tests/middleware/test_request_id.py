@@ -0,0 +1,33 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.middleware.request_id import RequestIdMiddleware
+from src.monitoring import request_id
+
+app = FastAPI()
+app.add_middleware(RequestIdMiddleware)
+
+
+@app.get("/id")
+async def current_id():
+    return {"request_id": request_id.get()}
+
+
+client = TestClient(app)
+
+
+def test_request_id_is_generated():
+    """Test that a request without an id gets a fresh one, seen by the handler and returned in the response."""
+    first, second = client.get("/id"), client.get("/id")
+    assert first.json()["request_id"] == first.headers["x-request-id"]
+    assert first.headers["x-request-id"] != second.headers["x-request-id"]
+    assert request_id.get() is None
+
+
+def test_request_id_from_client():
+    """Test that a valid client-supplied id is kept and an invalid one replaced."""
+    response = client.get("/id", headers={"X-Request-ID": "rig-1.42"})
+    assert response.json()["request_id"] == response.headers["x-request-id"] == "rig-1.42"
+
+    response = client.get("/id", headers={"X-Request-ID": "bad id\n"})
+    assert response.headers["x-request-id"] != "bad id\n"
@@ -0,0 +1,216 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from src.repository import InMemoryDatabase, MongoDatabase
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017")
+
+
+def __mongo_available() -> bool:
+    """Helper function to check whether a real MongoDB server is reachable."""
+    from pymongo import MongoClient
+    try:
+        MongoClient(MONGO_URI, serverSelectionTimeoutMS=300).admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+
+@pytest.fixture(params=[
+    "memory",
+    pytest.param("mongo", marks=pytest.mark.skipif(not __mongo_available(), reason="requires a running MongoDB server")),
+])
+def make_db(request):
+    """Fixture returning a factory for an empty database of each backend, so every backend passes the same tests."""
+    if request.param == "memory":
+        yield InMemoryDatabase
+        return
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo import MongoClient
+    name = f"repository-test-{ObjectId()}"
+    yield lambda: MongoDatabase(AsyncIOMotorClient(MONGO_URI)[name])
+    MongoClient(MONGO_URI).drop_database(name)
+
+
+def __sims(count: int) -> list:
+    """Helper function to create SIM object documents cycling through three environments."""
+    environments = ["Dev_1", "Dev_2", "Production"]
+    return [
+        {"schema_id": "s", "fields": {"environment": environments[i % 3], "use_count": i}, "reserved_by": None}
+        for i in range(count)
+    ]
+
+
+def test_query_operators_and_projection(make_db):
+    """Test the filter operators and projections the API relies on."""
+    async def scenario():
+        objects = make_db().objects
+        await objects.insert_many(__sims(9))
+
+        async def count(query):
+            return await objects.count_documents(query)
+
+        assert await count({"fields.environment": "Dev_1"}) == 3
+        assert await count({"fields.use_count": {"$gte": 3, "$lt": 6}}) == 3
+        assert await count({"fields.environment": {"$in": ["Dev_1", "Dev_2"]}, "fields.use_count": {"$ne": 0}}) == 5
+        assert await count({"$or": [{"fields.use_count": 0}, {"fields.use_count": {"$gt": 7}}]}) == 2
+        assert await count({"$nor": [{"fields.environment": "Production"}]}) == 6
+        assert await count({"reserved_by": None}) == 9
+        assert await count({"missing": None}) == 9
+
+        included = await objects.find_one({"fields.use_count": 4}, {"fields.use_count": 1})
+        assert set(included) == {"_id", "fields"} and included["fields"] == {"use_count": 4}
+        excluded = await objects.find_one({"fields.use_count": 4}, {"fields.environment": 0})
+        assert excluded["fields"] == {"use_count": 4} and excluded["schema_id"] == "s"
+
+    asyncio.run(scenario())
+
+
+def test_find_sort_skip_limit_and_pages(make_db):
+    """Test sorted, sliced finds and keyset pagination over every document exactly once."""
+    async def scenario():
+        objects = make_db().objects
+        await objects.insert_many(__sims(25))
+
+        descending = [obj["fields"]["use_count"] async for obj in objects.find(
+            {"schema_id": "s"}, sort=[("fields.use_count", -1)], skip=2, limit=3)]
+        assert descending == [22, 21, 20]
+
+        seen, after = [], None
+        while True:
+            page = await objects.find_page({"schema_id": "s"}, 10, after=after)
+            if not page:
+                break
+            seen.extend(obj["fields"]["use_count"] for obj in page)
+            after = page[-1]["_id"]
+        assert seen == list(range(25))
+
+    asyncio.run(scenario())
+
+
+def test_find_one_and_update_is_atomic(make_db):
+    """Test that concurrent conditional updates of one document let exactly one writer win."""
+    async def scenario():
+        objects = make_db().objects
+        _id = (await objects.insert_one({"reserved_by": None})).inserted_id
+
+        async def reserve(holder):
+            return await objects.find_one_and_update(
+                {"_id": _id, "reserved_by": None}, {"$set": {"reserved_by": holder}},
+                return_document=ReturnDocument.AFTER
+            )
+
+        results = await asyncio.gather(*(reserve(f"user-{i}") for i in range(50)))
+        winners = [result for result in results if result is not None]
+        assert len(winners) == 1
+        assert (await objects.find_one({"_id": _id}))["reserved_by"] == winners[0]["reserved_by"]
+
+        before = await objects.find_one_and_update({"_id": _id}, {"$inc": {"uses": 1}})
+        assert "uses" not in before
+        assert (await objects.find_one_and_delete({"_id": _id}))["uses"] == 1
+        assert await objects.count_documents({}) == 0
+
+    asyncio.run(scenario())
+
+
+def test_update_and_delete_results(make_db):
+    """Test the matched, modified and deleted counts reported by updates and deletes."""
+    async def scenario():
+        objects = make_db().objects
+        await objects.insert_many(__sims(6))
+
+        result = await objects.update_many({"fields.environment": "Dev_1"}, {"$set": {"fields.environment": "Dev_2"}})
+        assert (result.matched_count, result.modified_count) == (2, 2)
+        result = await objects.update_one({"fields.use_count": 1}, {"$set": {"fields.environment": "Dev_2"}})
+        assert (result.matched_count, result.modified_count) == (1, 0)
+
+        assert (await objects.delete_one({"fields.environment": "Dev_2"})).deleted_count == 1
+        assert (await objects.delete_many({"fields.environment": "Dev_2"})).deleted_count == 3
+
+    asyncio.run(scenario())
+
+
+def test_indexes_follow_updates(make_db):
+    """Test that queries answered through an index see inserts, updates and deletes."""
+    async def scenario():
+        objects = make_db().objects
+        await objects.create_index([("schema_id", 1), ("_id", 1)])
+        await objects.create_index("fields.environment")
+        await objects.insert_many(__sims(9))
+
+        await objects.update_many({"fields.environment": "Dev_1"}, {"$set": {"fields.environment": "Dev_2"}})
+        assert await objects.count_documents({"fields.environment": "Dev_1"}) == 0
+        assert await objects.count_documents({"fields.environment": "Dev_2", "schema_id": "s"}) == 6
+        await objects.delete_many({"fields.environment": "Production"})
+        assert await objects.count_documents({"schema_id": "s"}) == 6
+
+    asyncio.run(scenario())
+
+
+def test_compound_multikey_index(make_db):
+    """Test that a compound index with an array field finds documents by any element, and by its other fields."""
+    async def scenario():
+        terms = make_db()["terms"]
+        await terms.create_index([("schema_id", 1), ("grams", 1)])
+        await terms.insert_many([
+            {"schema_id": "s", "grams": ["a", "b"]},
+            {"schema_id": "s", "grams": ["b", "c"]},
+            {"schema_id": "s", "grams": []},
+            {"schema_id": "t", "grams": ["a", "b"]},
+        ])
+
+        assert await terms.count_documents({"schema_id": "s", "grams": "b"}) == 2
+        assert await terms.count_documents({"schema_id": "s", "grams": {"$all": ["b", "c"]}}) == 1
+        assert await terms.count_documents({"schema_id": "s"}) == 3
+
+    asyncio.run(scenario())
+
+
+def test_unique_indexes(make_db):
+    """Test that unique and partial unique indexes reject duplicates, including per document in a bulk insert."""
+    async def scenario():
+        objects = make_db().objects
+        await objects.create_index([("schema_id", 1), ("fields.msisdn", 1)], unique=True,
+                                   partial_filter={"fields.msisdn": {"$exists": True}})
+        await objects.insert_one({"schema_id": "s", "fields": {"msisdn": "1"}})
+        await objects.insert_one({"schema_id": "s", "fields": {}})
+        await objects.insert_one({"schema_id": "s", "fields": {}})
+        await objects.insert_one({"schema_id": "t", "fields": {"msisdn": "1"}})
+
+        with pytest.raises(DuplicateKeyError) as error:
+            await objects.insert_one({"schema_id": "s", "fields": {"msisdn": "1"}})
+        assert error.value.details["keyValue"] == {"schema_id": "s", "fields.msisdn": "1"}
+
+        second = await objects.insert_one({"schema_id": "s", "fields": {"msisdn": "2"}})
+        with pytest.raises(DuplicateKeyError):
+            await objects.update_one({"_id": second.inserted_id}, {"$set": {"fields.msisdn": "1"}})
+
+        documents = [{"schema_id": "s", "fields": {"msisdn": msisdn}} for msisdn in ("3", "1", "4")]
+        with pytest.raises(BulkWriteError) as error:
+            await objects.insert_many(documents, ordered=False)
+        assert [e["index"] for e in error.value.details["writeErrors"]] == [1]
+        assert error.value.details["nInserted"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_ttl_index_expires_documents(monkeypatch):
+    """Test that the in-memory backend removes documents past a TTL index's expiry, as MongoDB's TTL monitor does."""
+    async def scenario():
+        monkeypatch.setattr("src.repository.memory.TTL_SWEEP_INTERVAL", 0)
+        entries = InMemoryDatabase()["entries"]
+        await entries.create_index("at", expire_after=60)
+        await entries.insert_one({"at": datetime.now() - timedelta(seconds=120)})
+        await entries.insert_one({"at": datetime.now()})
+        await entries.insert_one({"at": "not a date"})
+
+        assert await entries.count_documents({}) == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,466 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.basemodels.schema_base_models import CreateSchemaRequest, FieldDefinition, PyObjectId
+from src.db import get_db
+from src.events import broker
+from src.routes.objectrouter import router
+from src.routes.schemarouter import router as schema_router
+from src.repository import InMemoryDatabase
+
+# Create FastAPI app and include routers
+app = FastAPI()
+app.include_router(prefix="/schemas", router=schema_router)
+app.include_router(prefix="/objects", router=router)
+
+
+@pytest.fixture(scope="session")
+def memory_db():
+    """Fixture to create an asynchronous mock database for testing."""
+    return InMemoryDatabase()
+
+
+@pytest.fixture(scope="session")
+def test_client(memory_db):
+    """Fixture to create a test client for the FastAPI app with overridden database dependency."""
+    async def override_get_db():
+        yield memory_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def sim_schema_id(test_client) -> str:
+    """Fixture to create the SIM schema the object tests are run against."""
+    fields = {
+        "msisdn": FieldDefinition(type="str", required=True, regex=r"44\d{9}"),
+        "environment": FieldDefinition(type="str", required=True, enum=["Dev_1", "Dev_2", "Production"]),
+        "use_count": FieldDefinition(type="int", required=True, min=0, max=10000),
+    }
+    req = CreateSchemaRequest(schema_name="SIM-objects", fields=fields)
+    response = test_client.post("/schemas/", json=req.model_dump(exclude_none=True))
+    return response.json()["_id"]
+
+
+def __sim(schema_id: str, msisdn: str = "44123456789", environment: str = "Dev_1", use_count: int = 0) -> dict:
+    """Helper function to create a SIM object request."""
+    return {
+        "schema_id": schema_id,
+        "fields": {"msisdn": msisdn, "environment": environment, "use_count": use_count}
+    }
+
+
+def test_create_object(test_client, sim_schema_id):
+    """Test the creation of a new object."""
+    response = test_client.post("/objects/", json=__sim(sim_schema_id))
+    assert response.status_code == 200
+    assert response.json()["message"] == "Object created successfully"
+
+
+def test_create_object_invalid_fields(test_client, sim_schema_id):
+    """Test that an object violating its schema is rejected."""
+    response = test_client.post("/objects/", json=__sim(sim_schema_id, environment="Staging"))
+    assert response.status_code == 400
+
+
+def test_create_object_schema_not_found(test_client):
+    """Test that creating an object for a schema that does not exist is rejected."""
+    response = test_client.post("/objects/", json=__sim(str(PyObjectId())))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Schema not found"
+
+
+def test_object_changes_are_published(test_client, sim_schema_id):
+    """Test that create, update and delete each publish an event for the object's schema."""
+    async def subscribe():
+        return broker.subscribe([sim_schema_id])
+
+    loop = asyncio.new_event_loop()
+    subscription = loop.run_until_complete(subscribe())
+    try:
+        object_id = test_client.post("/objects/", json=__sim(sim_schema_id)).json()["_id"]
+        test_client.put(f"/objects/{object_id}", json={"fields.use_count": 1})
+        test_client.delete(f"/objects/{object_id}")
+
+        events = [loop.run_until_complete(subscription.next(timeout=1)) for _ in range(3)]
+        assert [event["type"] for event in events] == ["created", "updated", "deleted"]
+        assert {event["object_id"] for event in events} == {object_id}
+        assert events[1]["data"]["fields"]["use_count"] == 1
+    finally:
+        broker.unsubscribe(subscription)
+        loop.close()
+
+
+def test_update_object_not_found(test_client):
+    """Test the behaviour when trying to update an object that does not exist."""
+    response = test_client.put(f"/objects/{PyObjectId()}", json={"fields.use_count": 1})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Object not found"
+
+
+def test_delete_object_not_found(test_client):
+    """Test the behaviour when trying to delete an object that does not exist."""
+    response = test_client.delete(f"/objects/{PyObjectId()}")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Object not found"
+
+
+def test_events_resume_token_expired(test_client):
+    """Test that a resume token from outside the event history is rejected with 410."""
+    response = test_client.get("/objects/events", params={"last_event_id": 10 ** 9})
+    assert response.status_code == 410
+
+
+def test_reserve_and_release_object(test_client, sim_schema_id):
+    """Test reserving an object, rejecting a second reservation and releasing it."""
+    object_id = test_client.post("/objects/", json=__sim(sim_schema_id)).json()["_id"]
+
+    response = test_client.post(f"/objects/{object_id}/reserve", json={"holder": "rig-1"})
+    assert response.status_code == 200
+    assert response.json()["reserved_by"] == "rig-1"
+
+    response = test_client.post(f"/objects/{object_id}/reserve", json={"holder": "rig-2"})
+    assert response.status_code == 409
+
+    response = test_client.post(f"/objects/{object_id}/release", json={"holder": "rig-2"})
+    assert response.status_code == 409
+
+    response = test_client.post(f"/objects/{object_id}/release", json={"holder": "rig-1"})
+    assert response.status_code == 200
+    assert response.json()["reserved_by"] is None
+
+
+def test_object_history(test_client, sim_schema_id):
+    """Test that an object's creation and reservations are listed newest first, a page at a time."""
+    object_id = test_client.post("/objects/", json=__sim(sim_schema_id)).json()["_id"]
+    for holder in ("rig-1", "rig-2"):
+        test_client.post(f"/objects/{object_id}/reserve", json={"holder": holder})
+        test_client.post(f"/objects/{object_id}/release", json={"holder": holder})
+
+    response = test_client.get(f"/objects/{object_id}/history", params={"limit": 3})
+    assert response.status_code == 200
+    page = response.json()
+    assert [(entry["type"], entry["holder"]) for entry in page["entries"]] == [
+        ("released", "rig-2"), ("reserved", "rig-2"), ("released", "rig-1")
+    ]
+
+    page = test_client.get(f"/objects/{object_id}/history", params={"limit": 3, "cursor": page["next"]}).json()
+    assert [(entry["type"], entry["holder"]) for entry in page["entries"]] == [("reserved", "rig-1"), ("created", None)]
+    assert page["entries"][-1]["fields"]["msisdn"] == "44123456789"
+    assert page["next"] is None
+
+    response = test_client.get(f"/objects/{object_id}/history", params={"cursor": "nonsense"})
+    assert response.status_code == 400
+
+    # Times with a UTC offset are compared with the naive local times entries are recorded in
+    start = (datetime.now(timezone.utc) - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    response = test_client.get(f"/objects/{object_id}/history", params={"start": start})
+    assert response.status_code == 200
+    assert len(response.json()["entries"]) == 5
+
+
+def test_reserve_object_not_found(test_client):
+    """Test the behaviour when trying to reserve an object that does not exist."""
+    response = test_client.post(f"/objects/{PyObjectId()}/reserve", json={"holder": "rig-1"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Object not found"
+
+
+def test_allocate_object(test_client, sim_schema_id):
+    """Test that allocation reserves a free object matching the requested fields until none are left."""
+    test_client.post("/objects/", json=__sim(sim_schema_id, environment="Dev_2"))
+    request = {"schema_id": sim_schema_id, "holder": "rig-1", "fields": {"environment": "Dev_2"}}
+
+    response = test_client.post("/objects/allocate", json=request)
+    assert response.status_code == 200
+    assert response.json()["fields"]["environment"] == "Dev_2"
+    assert response.json()["reserved_by"] == "rig-1"
+
+    response = test_client.post("/objects/allocate", json=request)
+    assert response.status_code == 409
+
+    response = test_client.post("/objects/allocate", json=request, params={"wait": 0.05})
+    assert response.status_code == 409
+    assert response.json()["detail"] == "No matching object became available"
+
+
+def test_allocate_object_unknown_field(test_client, sim_schema_id):
+    """Test that allocating on a field the schema does not declare is rejected."""
+    request = {"schema_id": sim_schema_id, "holder": "rig-1", "fields": {"colour": "red"}}
+    response = test_client.post("/objects/allocate", json=request)
+    assert response.status_code == 400
+
+
+def test_read_object_include_fields(test_client, sim_schema_id):
+    """Test that include only returns the requested schema fields alongside the object metadata."""
+    object_id = test_client.post("/objects/", json=__sim(sim_schema_id)).json()["_id"]
+    response = test_client.get(f"/objects/{object_id}", params={"include": "msisdn,use_count"})
+    assert response.status_code == 200
+    assert response.json()["fields"] == {"msisdn": "44123456789", "use_count": 0}
+    assert response.json()["schema_id"] == sim_schema_id
+
+
+def test_read_object_projection_is_done_by_the_database(test_client, sim_schema_id, memory_db, monkeypatch):
+    """Test that a partial read of an uncached object asks the database for the projection and isn't cached."""
+    object_id = test_client.post("/objects/", json=__sim(sim_schema_id)).json()["_id"]
+    find_one = memory_db.objects.find_one
+    projections = []
+
+    async def recording_find_one(query, projection=None):
+        projections.append(projection)
+        return await find_one(query, projection)
+
+    monkeypatch.setattr(memory_db.objects, "find_one", recording_find_one)
+    for _ in range(2):
+        response = test_client.get(f"/objects/{object_id}", params={"exclude": "msisdn"})
+        assert set(response.json()["fields"]) == {"environment", "use_count"}
+    assert projections == [{"fields.msisdn": 0}] * 2
+
+    # Once the whole object is cached, partial reads are served from it
+    test_client.get(f"/objects/{object_id}")
+    response = test_client.get(f"/objects/{object_id}", params={"include": "use_count"})
+    assert response.json()["fields"] == {"use_count": 0}
+    assert projections == [{"fields.msisdn": 0}] * 2 + [None]
+
+
+def test_read_object_unknown_field(test_client, sim_schema_id):
+    """Test that projecting on a field the schema does not declare is rejected."""
+    object_id = test_client.post("/objects/", json=__sim(sim_schema_id)).json()["_id"]
+    response = test_client.get(f"/objects/{object_id}", params={"exclude": "colour"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: colour"
+
+
+def test_read_objects_exclude_fields(test_client, sim_schema_id):
+    """Test that exclude leaves the named fields out of every object of the schema."""
+    test_client.post("/objects/", json=__sim(sim_schema_id))
+    response = test_client.get("/objects/", params=[("schema_id", sim_schema_id), ("exclude", "msisdn"),
+                                                    ("exclude", "environment")])
+    assert response.status_code == 200
+    assert len(response.json()) > 0
+    assert all(set(obj["fields"]) == {"use_count"} for obj in response.json())
+
+
+def test_read_objects_projection_requires_schema(test_client):
+    """Test that include and exclude cannot be used without a schema to validate them against."""
+    response = test_client.get("/objects/", params={"include": "msisdn"})
+    assert response.status_code == 400
+    response = test_client.get("/objects/", params={"include": "msisdn", "exclude": "imsi", "schema_id": "x"})
+    assert response.status_code == 400
+
+
+@pytest.fixture(scope="session")
+def bulk_schema_id(test_client) -> str:
+    """Fixture to create a schema holding objects for the bulk operation tests."""
+    fields = {
+        "environment": FieldDefinition(type="str", required=True, enum=["Dev_1", "Dev_2", "Retired"]),
+        "use_count": FieldDefinition(type="int", required=True, min=0, max=10000),
+    }
+    req = CreateSchemaRequest(schema_name="SIM-bulk", fields=fields)
+    schema_id = test_client.post("/schemas/", json=req.model_dump(exclude_none=True)).json()["_id"]
+    for use_count in range(5):
+        test_client.post("/objects/", json={
+            "schema_id": schema_id, "fields": {"environment": "Dev_1", "use_count": use_count}
+        })
+    return schema_id
+
+
+def test_bulk_update_dry_run(test_client, bulk_schema_id):
+    """Test that a dry run reports the matching objects without changing them."""
+    params = {"schema_id": bulk_schema_id, "filter": json.dumps({"use_count": {"$lt": 3}}), "dry_run": True}
+    response = test_client.patch("/objects/", params=params, json={"environment": "Dev_2"})
+    assert response.status_code == 200
+    assert response.json() == {"matched_count": 3, "dry_run": True}
+
+
+def test_bulk_update(test_client, bulk_schema_id, monkeypatch):
+    """Test that a bulk update changes every matching object, in chunks, and reports the counts."""
+    monkeypatch.setattr("src.routes.objectrouter.BULK_CHUNK_SIZE", 2)
+    params = {"schema_id": bulk_schema_id, "filter": json.dumps({"use_count": {"$gte": 2}})}
+    response = test_client.patch("/objects/", params=params, json={"environment": "Dev_2"})
+    assert response.status_code == 200
+    assert response.json() == {"matched_count": 3, "modified_count": 3, "dry_run": False}
+
+    objects = test_client.get("/objects/", params={"schema_id": bulk_schema_id}).json()
+    assert sorted(obj["fields"]["environment"] for obj in objects) == ["Dev_1", "Dev_1", "Dev_2", "Dev_2", "Dev_2"]
+
+
+def test_bulk_update_invalid_value(test_client, bulk_schema_id):
+    """Test that a bulk update is validated against the schema before anything is written."""
+    response = test_client.patch("/objects/", params={"schema_id": bulk_schema_id}, json={"environment": "Staging"})
+    assert response.status_code == 400
+    response = test_client.patch("/objects/", params={"schema_id": bulk_schema_id}, json={"colour": "red"})
+    assert response.status_code == 400
+    response = test_client.patch("/objects/", params={"schema_id": bulk_schema_id, "filter": "{\"colour\": 1}"},
+                                 json={"use_count": 1})
+    assert response.status_code == 400
+
+
+def test_bulk_delete_over_limit(test_client, bulk_schema_id, monkeypatch):
+    """Test that a bulk delete matching more objects than the safety limit is refused."""
+    monkeypatch.setattr("src.routes.objectrouter.BULK_MAX_AFFECTED", 2)
+    response = test_client.delete("/objects/", params={"schema_id": bulk_schema_id})
+    assert response.status_code == 400
+    assert len(test_client.get("/objects/", params={"schema_id": bulk_schema_id}).json()) == 5
+
+
+def test_bulk_delete(test_client, bulk_schema_id, monkeypatch):
+    """Test that a bulk delete removes only the objects matching the filter."""
+    monkeypatch.setattr("src.routes.objectrouter.BULK_CHUNK_SIZE", 1)
+    params = {"schema_id": bulk_schema_id, "filter": json.dumps({"environment": "Dev_2"})}
+    response = test_client.delete("/objects/", params=params)
+    assert response.status_code == 200
+    assert response.json() == {"matched_count": 3, "deleted_count": 3, "dry_run": False}
+    assert len(test_client.get("/objects/", params={"schema_id": bulk_schema_id}).json()) == 2
+
+
+def test_count_objects_from_database(test_client, sim_schema_id):
+    """Test that counts for schemas without a snapshot are answered by the database."""
+    test_client.post("/objects/", json=__sim(sim_schema_id, environment="Production", use_count=50))
+    params = {"schema_id": sim_schema_id, "filter": json.dumps({"environment": "Production"}), "available": True}
+    response = test_client.get("/objects/count", params=params)
+    assert response.status_code == 200
+    assert response.json() == {"count": 1, "source": "database"}
+
+
+def test_count_objects_from_snapshot(test_client, memory_db):
+    """Test that counts for a schema with a loaded snapshot are answered from it, with stats reported."""
+    from src.snapshot import snapshots
+    schema = {"schema_name": "SIM-snapshot", "snapshot": True, "fields": {
+        "environment": {"type": "str", "enum": ["Dev_1", "Dev_2"]}, "use_count": {"type": "int"}
+    }}
+    schema_id = test_client.post("/schemas/", json=schema).json()["_id"]
+    for use_count in (10, 200):
+        test_client.post("/objects/", json={"schema_id": schema_id,
+                                            "fields": {"environment": "Dev_1", "use_count": use_count}})
+
+    stored = asyncio.run(memory_db["schemas"].find_one({"_id": PyObjectId(schema_id)}))
+    asyncio.run(snapshots.build(stored, memory_db["objects"]))
+
+    params = {"schema_id": schema_id, "filter": json.dumps({"environment": "Dev_1", "use_count": {"$lt": 100}}),
+              "available": True}
+    response = test_client.get("/objects/count", params=params)
+    assert response.json() == {"count": 1, "source": "snapshot"}
+
+    response = test_client.get(f"/schemas/{schema_id}/snapshot")
+    assert response.status_code == 200
+    assert response.json()["objects"] == 2
+
+
+def test_read_object_is_invalidated_by_writes(test_client, sim_schema_id):
+    """Test that cached reads reflect updates, reservations and deletes made through the API."""
+    object_id = test_client.post("/objects/", json=__sim(sim_schema_id)).json()["_id"]
+    assert test_client.get(f"/objects/{object_id}").json()["fields"]["use_count"] == 0
+
+    test_client.put(f"/objects/{object_id}", json={"fields.use_count": 5})
+    assert test_client.get(f"/objects/{object_id}").json()["fields"]["use_count"] == 5
+
+    test_client.post(f"/objects/{object_id}/reserve", json={"holder": "alice"})
+    assert test_client.get(f"/objects/{object_id}").json()["reserved_by"] == "alice"
+
+    response = test_client.get(f"/objects/{object_id}", params={"include": "use_count"})
+    assert response.json()["fields"] == {"use_count": 5}
+    assert response.json()["reserved_by"] == "alice"
+
+    test_client.delete(f"/objects/{object_id}")
+    assert test_client.get(f"/objects/{object_id}").status_code == 404
+
+
+@pytest.mark.parametrize("method, path, body", [
+    ("GET", "/objects/not-an-id", None),
+    ("GET", "/objects/not-an-id?include=use_count", None),
+    ("GET", "/objects/not-an-id/history", None),
+    ("PUT", "/objects/not-an-id", {"fields.use_count": 1}),
+    ("DELETE", "/objects/not-an-id", None),
+    ("POST", "/objects/not-an-id/reserve", {"holder": "alice"}),
+])
+def test_malformed_object_id(test_client, method, path, body):
+    """Test that every object route answers a malformed id with 400."""
+    response = test_client.request(method, path, json=body)
+    assert response.status_code == 400 and response.json()["detail"] == "Invalid object id"
+
+
+def test_read_objects_in_pages(test_client, sim_schema_id):
+    """Test that limit and after walk through a schema's objects without gaps or repeats."""
+    schema = {"schema_name": "SIM-pages", "fields": {"n": {"type": "int"}}}
+    schema_id = test_client.post("/schemas/", json=schema).json()["_id"]
+    created = [
+        test_client.post("/objects/", json={"schema_id": schema_id, "fields": {"n": n}}).json()["_id"] for n in range(5)
+    ]
+
+    first = test_client.get("/objects/", params={"schema_id": schema_id, "limit": 2}).json()
+    second = test_client.get("/objects/", params={"schema_id": schema_id, "limit": 2, "after": first[-1]["_id"]}).json()
+    last = test_client.get("/objects/", params={"schema_id": schema_id, "limit": 2, "after": second[-1]["_id"]}).json()
+    assert [obj["_id"] for obj in first + second + last] == created
+    assert test_client.get("/objects/", params={"after": "not-an-id"}).status_code == 400
+
+
+def test_create_object_validated_off_the_event_loop(test_client):
+    """Test that objects of a schema set to validate on the process pool are accepted or rejected as usual."""
+    schema = {"schema_name": "SIM-offloaded", "validation": "process",
+              "fields": {"msisdn": {"type": "str", "required": True, "regex": r"44\d{9}"}}}
+    schema_id = test_client.post("/schemas/", json=schema).json()["_id"]
+
+    assert test_client.post("/objects/", json={"schema_id": schema_id, "fields": {"msisdn": "44123456789"}}).status_code == 200
+    response = test_client.post("/objects/", json={"schema_id": schema_id, "fields": {"msisdn": "07123"}})
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid object data")
+
+
+def test_search_objects(test_client):
+    """Test that objects are found by a substring of a searchable field, also after an update."""
+    fields = {"msisdn": FieldDefinition(type="str", required=True, searchable=True)}
+    req = CreateSchemaRequest(schema_name="SIM-search", fields=fields)
+    schema_id = test_client.post("/schemas/", json=req.model_dump(exclude_none=True)).json()["_id"]
+    ids = [test_client.post("/objects/", json={"schema_id": schema_id, "fields": {"msisdn": msisdn}}).json()["_id"]
+           for msisdn in ("44123456789", "44555123555", "44999999999")]
+
+    response = test_client.get("/objects/search", params={"schema_id": schema_id, "field": "msisdn", "contains": "123"})
+    assert response.status_code == 200
+    assert [obj["_id"] for obj in response.json()["objects"]] == ids[:2]
+
+    test_client.put(f"/objects/{ids[2]}", json={"fields": {"msisdn": "44999123999"}})
+    response = test_client.get("/objects/search", params={"schema_id": schema_id, "field": "msisdn", "contains": "123",
+                                                          "limit": 2})
+    assert [obj["_id"] for obj in response.json()["objects"]] == ids[:2]
+    response = test_client.get("/objects/search", params={"schema_id": schema_id, "field": "msisdn", "contains": "123",
+                                                          "cursor": response.json()["next"]})
+    assert [obj["_id"] for obj in response.json()["objects"]] == ids[2:]
+
+    response = test_client.get("/objects/search", params={"schema_id": schema_id, "field": "msisdn", "prefix": "445"})
+    assert [obj["_id"] for obj in response.json()["objects"]] == ids[1:2]
+
+    response = test_client.get("/objects/search", params={"schema_id": schema_id, "field": "msisdn", "contains": "12"})
+    assert response.status_code == 400
+
+
+def test_unique_field_conflicts(test_client):
+    """Test that creating, replacing or bulk-updating to a taken value of a unique field is refused with 409."""
+    fields = {
+        "imsi": FieldDefinition(type="str", required=True, unique=True),
+        "environment": FieldDefinition(type="str", required=True),
+    }
+    req = CreateSchemaRequest(schema_name="SIM-unique", fields=fields)
+    schema_id = test_client.post("/schemas/", json=req.model_dump(exclude_none=True)).json()["_id"]
+    ids = [test_client.post("/objects/", json={
+        "schema_id": schema_id, "fields": {"imsi": imsi, "environment": "Dev_1"}
+    }).json()["_id"] for imsi in ("234300000000001", "234300000000002")]
+
+    conflict = "Duplicate value for unique field imsi"
+    response = test_client.post("/objects/", json={
+        "schema_id": schema_id, "fields": {"imsi": "234300000000001", "environment": "Dev_2"}
+    })
+    assert (response.status_code, response.json()["detail"]) == (409, conflict)
+    response = test_client.put(f"/objects/{ids[1]}", json={"fields.imsi": "234300000000001"})
+    assert (response.status_code, response.json()["detail"]) == (409, conflict)
+    response = test_client.patch("/objects/", params={"schema_id": schema_id}, json={"imsi": "234300000000003"})
+    assert (response.status_code, response.json()["detail"]) == (409, conflict)
+    params = {"schema_id": schema_id, "filter": json.dumps({"imsi": "234300000000002"})}
+    response = test_client.patch("/objects/", params=params, json={"imsi": "234300000000001"})
+    assert (response.status_code, response.json()["detail"]) == (409, conflict)
@@ -0,0 +1,108 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src import reservations
+from src.basemodels.admin_base_models import AdmissionLimits
+from src.db import get_db
+from src.middleware.admission import admission
+from src.routes.objectrouter import router as object_router
+from src.routes.reservationrouter import router
+from src.routes.schemarouter import router as schema_router
+from src.repository import InMemoryDatabase
+
+# Create FastAPI app and include routers
+app = FastAPI()
+app.include_router(prefix="/schemas", router=schema_router)
+app.include_router(prefix="/objects", router=object_router)
+app.include_router(prefix="/ws", router=router)
+
+
+@pytest.fixture(scope="session")
+def test_client():
+    """Fixture to create a test client for the FastAPI app with overridden database dependency."""
+    memory_db = InMemoryDatabase()
+
+    async def override_get_db():
+        yield memory_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def object_ids(test_client) -> tuple:
+    """Fixture to create a schema with three objects, returning the schema id and the object ids."""
+    schema = {"schema_name": "UE-ws", "fields": {"os": {"type": "str", "enum": ["android", "iOS"]}}}
+    schema_id = test_client.post("/schemas/", json=schema).json()["_id"]
+    ids = [
+        test_client.post("/objects/", json={"schema_id": schema_id, "fields": {"os": "iOS"}}).json()["_id"]
+        for _ in range(3)
+    ]
+    return schema_id, ids
+
+
+def test_pipelined_commands_are_answered_by_id(test_client, object_ids):
+    """Test that several commands sent without waiting each get a reply carrying their request id."""
+    schema_id, ids = object_ids
+    with test_client.websocket_connect("/ws/reservations") as ws:
+        ws.send_json({"id": "a", "op": "reserve", "object_id": ids[0], "holder": "rig-1"})
+        ws.send_json({"id": "b", "op": "reserve", "object_id": ids[0], "holder": "rig-2"})
+        ws.send_json({"id": "c", "op": "allocate", "schema_id": schema_id, "holder": "rig-3",
+                      "fields": {"os": "iOS"}})
+        replies = {reply["id"]: reply for reply in (ws.receive_json() for _ in range(3))}
+
+    assert replies["a"]["ok"] and replies["a"]["reserved_by"] == "rig-1"
+    assert replies["c"]["ok"] and replies["c"]["object_id"] != ids[0]
+    # Commands run concurrently, so only one of the two reservations of the same object can win
+    assert replies["b"]["status"] == 409
+
+
+def test_release_over_websocket(test_client, object_ids):
+    """Test that an object reserved over the WebSocket can be released over it."""
+    _, ids = object_ids
+    with test_client.websocket_connect("/ws/reservations") as ws:
+        ws.send_json({"id": "1", "op": "reserve", "object_id": ids[2], "holder": "rig-9"})
+        assert ws.receive_json()["ok"]
+        ws.send_json({"id": "2", "op": "release", "object_id": ids[2], "holder": "rig-9"})
+        reply = ws.receive_json()
+
+    assert reply == {"id": "2", "ok": True, "status": 200, "object_id": ids[2], "reserved_by": None}
+
+
+def test_invalid_command_is_rejected(test_client):
+    """Test that a malformed command gets a 422 reply without closing the connection."""
+    with test_client.websocket_connect("/ws/reservations") as ws:
+        ws.send_json({"id": "x", "op": "steal", "holder": "rig-1"})
+        assert ws.receive_json()["status"] == 422
+        ws.send_json({"id": "y", "op": "reserve", "holder": "rig-1"})
+        assert ws.receive_json() == {"id": "y", "ok": False, "status": 400, "detail": "object_id is required"}
+
+
+def test_bad_frames_and_failures_keep_the_connection(test_client, object_ids, monkeypatch):
+    """Test that a frame that isn't JSON gets a 400 reply and a failing command a 500 one, without closing the socket."""
+    _, ids = object_ids
+
+    async def failing_release(*args):
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(reservations, "release", failing_release)
+    with test_client.websocket_connect("/ws/reservations") as ws:
+        ws.send_text("reserve everything")
+        assert ws.receive_json() == {"id": None, "ok": False, "status": 400, "detail": "Frames must be JSON objects"}
+        ws.send_json({"id": "r", "op": "release", "object_id": ids[2], "holder": "rig-1"})
+        assert ws.receive_json() == {"id": "r", "ok": False, "status": 500, "detail": "Internal server error"}
+        ws.send_json({"id": "y", "op": "reserve", "holder": "rig-1"})
+        assert ws.receive_json()["status"] == 400
+
+
+def test_commands_are_rate_limited(test_client, object_ids, monkeypatch):
+    """Test that commands over the API key's rate get a 429 reply carrying when to retry."""
+    _, ids = object_ids
+    monkeypatch.setattr(admission, "limits", AdmissionLimits(rate_per_second=0.1, burst=1))
+    with test_client.websocket_connect("/ws/reservations", headers={"X-API-Key": "ws-rate-limited"}) as ws:
+        for command_id in ("a", "b"):
+            ws.send_json({"id": command_id, "op": "reserve", "object_id": ids[2], "holder": "rig-9"})
+        replies = {reply["id"]: reply for reply in (ws.receive_json() for _ in range(2))}
+    assert replies["a"]["ok"]
+    assert replies["b"]["status"] == 429 and replies["b"]["retry_after"] >= 1
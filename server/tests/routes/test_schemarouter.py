@@ -1,36 +1,32 @@
-import mongomock
+import asyncio
+import time
+
 import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from pymongo.errors import OperationFailure
 
 from src.basemodels.schema_base_models import CreateSchemaRequest, PyObjectId, FieldDefinition
 from src.db import get_db  # Importing db here
 from src.routes.schemarouter import router
-from tests.AsyncMongoMock import AsyncMockDB
+from src.repository import InMemoryDatabase
 
 # Create FastAPI app and include router
 app = FastAPI()
 app.include_router(prefix="/schemas", router=router)
 
 
-# === Shared mongomock client across tests ===
-@pytest.fixture(scope="session")
-def mock_sync_client():
-    """Fixture to create a synchronous MongoDB client for testing."""
-    return mongomock.MongoClient()
-
-
 @pytest.fixture(scope="session")
-def async_mock_db(mock_sync_client):
-    """Fixture to create an asynchronous mock database for testing."""
-    return AsyncMockDB(mock_sync_client["reservation-system"])
+def memory_db():
+    """Fixture to create an in-memory database for testing."""
+    return InMemoryDatabase()
 
 
 @pytest.fixture(scope="session")
-def test_client(async_mock_db):
+def test_client(memory_db):
     """Fixture to create a test client for the FastAPI app with overridden database dependency."""
     async def override_get_db():
-        yield async_mock_db
+        yield memory_db
 
     app.dependency_overrides[get_db] = override_get_db
     return TestClient(app)
@@ -243,3 +239,86 @@ def test_create_schema_with_invalid_list_constraints(test_client):
     }
     response = test_client.post("/schemas/", json=invalid_schema)
     assert response.status_code == 422
+
+
+def __finished_import(client: TestClient, schema_id: str, job_id: str) -> dict:
+    """Helper function to wait for a background import to finish, returning its job."""
+    for _ in range(200):
+        job = client.get(f"/schemas/{schema_id}/import/{job_id}").json()
+        if job["status"] != "running":
+            return job
+        time.sleep(0.05)
+    raise AssertionError("Import did not finish")
+
+
+def test_import_objects(test_client):
+    """Test CSV and NDJSON imports through the API, run in the background, and reading back their progress."""
+    schema = {"schema_name": "SIM-import", "fields": {"msisdn": {"type": "str"}, "use_count": {"type": "int"}}}
+    schema_id = test_client.post("/schemas/", json=schema).json()["_id"]
+
+    # The client keeps its event loop running between requests, so the background imports go on
+    with TestClient(app) as client:
+        csv_body = "msisdn,use_count\n447000000001,1\n447000000002,two\n447000000003,3\n"
+        response = client.post(f"/schemas/{schema_id}/import", content=csv_body, headers={"Content-Type": "text/csv"})
+        assert response.status_code == 202 and response.json()["status"] == "running"
+        job = __finished_import(client, schema_id, response.json()["_id"])
+        assert (job["status"], job["rows"], job["inserted"], job["failed"]) == ("completed", 3, 2, 1)
+        assert job["errors"][0]["row"] == 2
+
+        ndjson_body = '{"msisdn": "447000000004", "use_count": 4}\n{"msisdn": 5}\n'
+        response = client.post(f"/schemas/{schema_id}/import", params={"format": "ndjson"}, content=ndjson_body)
+        ndjson_job = __finished_import(client, schema_id, response.json()["_id"])
+        assert (ndjson_job["inserted"], ndjson_job["failed"]) == (1, 1)
+
+    assert len(test_client.get(f"/schemas/{schema_id}/import").json()) == 2
+
+
+def test_import_objects_rejected(test_client):
+    """Test that imports with an unknown format, schema or column are refused."""
+    schema = {"schema_name": "SIM-import-rejected", "fields": {"msisdn": {"type": "str"}}}
+    schema_id = test_client.post("/schemas/", json=schema).json()["_id"]
+
+    assert test_client.post(f"/schemas/{schema_id}/import", content="x").status_code == 415
+    response = test_client.post(f"/schemas/{PyObjectId()}/import", params={"format": "csv"}, content="msisdn\n1\n")
+    assert response.status_code == 404
+    response = test_client.post(f"/schemas/{schema_id}/import", params={"format": "csv"}, content="imsi\n1\n")
+    assert response.status_code == 400
+    assert test_client.get(f"/schemas/{schema_id}/import/{PyObjectId()}").status_code == 404
+
+
+def test_update_schema_unique_with_duplicates(test_client, memory_db):
+    """Test that a field can't be made unique while objects share values of it, leaving the schema unchanged."""
+    schema_id = test_client.post("/schemas/", json={
+        "schema_name": "SIM-duplicates", "fields": {"msisdn": {"type": "str"}}
+    }).json()["_id"]
+    asyncio.run(memory_db.objects.insert_many([{"schema_id": schema_id, "fields": {"msisdn": "44123456789"}}
+                                               for _ in range(2)]))
+
+    response = test_client.put(f"/schemas/{schema_id}", json={"fields": {"msisdn": {"type": "str", "unique": True}}})
+    assert response.status_code == 409
+    assert "unique" not in test_client.get(f"/schemas/{schema_id}").json()["fields"]["msisdn"]
+
+
+@pytest.mark.parametrize("code, status_code", [(86, 409), (67, 503)])
+def test_create_schema_without_its_unique_index(test_client, memory_db, monkeypatch, code, status_code):
+    """Test that a schema whose unique index can't be built is refused and not saved."""
+    async def failing_create_index(*args, **kwargs):
+        raise OperationFailure("cannot create index", code)
+
+    monkeypatch.setattr(memory_db.objects, "create_index", failing_create_index)
+    response = test_client.post("/schemas/", json={"schema_name": "SIM-no-index", "fields": {"iccid": {"unique": True}}})
+    assert response.status_code == status_code and "iccid" in response.json()["detail"]
+    assert asyncio.run(memory_db.schemas.find_one({"schema_name": "SIM-no-index"})) is None
+
+
+def test_delete_schema_drops_unused_indexes(test_client, memory_db):
+    """Test that deleting a schema drops the unique and search indexes of fields no other schema declares."""
+    fields = {"eid": {"unique": True, "searchable": True}, "imei": {"unique": True}}
+    schema_id = test_client.post("/schemas/", json={"schema_name": "SIM-indexed", "fields": fields}).json()["_id"]
+    test_client.post("/schemas/", json={"schema_name": "UE-indexed", "fields": {"imei": {"unique": True}}})
+
+    assert test_client.delete(f"/schemas/{schema_id}").status_code == 200
+    for name in ("unique_eid", "schema_id_1_fields.eid_1__id_1"):
+        with pytest.raises(OperationFailure):
+            asyncio.run(memory_db.objects.drop_index(name))
+    asyncio.run(memory_db.objects.drop_index("unique_imei"))
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.audit import AuditLog, InvalidCursor, partition_name
+from src.repository import InMemoryDatabase
+
+
+def __reserve(log: AuditLog, object_id: str, holder: str, at: datetime = None):
+    """Helper function to record a reservation, optionally backdated to ``at``."""
+    log.record("reserved", "schema", object_id, {"reserved_by": holder, "reserved_until": None})
+    if at is not None:
+        log._buffer[-1]["at"] = at
+
+
+def test_entries_are_buffered_until_flushed():
+    """Test that recorded events are only written by a flush, in one batch."""
+    async def scenario():
+        db = InMemoryDatabase()
+        log = AuditLog()
+        for holder in ("alice", "bob"):
+            __reserve(log, "o1", holder)
+        log.record("deleted", "schema", "o1", None)
+        partition = db[partition_name(datetime.now())]
+        assert await partition.count_documents({}) == 0
+
+        assert await log.flush(db) == 3
+        assert await partition.count_documents({"object_id": "o1"}) == 3
+        assert log.stats()["buffered"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_history_is_newest_first_and_paginated():
+    """Test that history pages through an object's entries across partitions, newest first."""
+    async def scenario():
+        db = InMemoryDatabase()
+        log = AuditLog()
+        now = datetime.now()
+        for days in range(5):
+            __reserve(log, "o1", f"holder{days}", now - timedelta(days=days * 20))
+        __reserve(log, "o2", "other")
+
+        entries, cursor = await log.history(db, "o1", limit=3)
+        assert [entry["holder"] for entry in entries] == ["holder0", "holder1", "holder2"]
+        entries, cursor = await log.history(db, "o1", limit=3, cursor=cursor)
+        assert [entry["holder"] for entry in entries] == ["holder3", "holder4"]
+        assert cursor is None
+
+        entries, _ = await log.history(db, "o1", start=now - timedelta(days=30), end=now - timedelta(days=1))
+        assert [entry["holder"] for entry in entries] == ["holder1"]
+
+        with pytest.raises(InvalidCursor):
+            await log.history(db, "o1", cursor="nonsense")
+
+    asyncio.run(scenario())
+
+
+def test_full_buffer_drops_oldest_entries():
+    """Test that the buffer stays bounded, dropping its oldest entries and counting them."""
+    log = AuditLog(max_buffer=2)
+    for holder in ("alice", "bob", "carol"):
+        __reserve(log, "o1", holder)
+
+    assert [entry["holder"] for entry in log._buffer] == ["bob", "carol"]
+    assert log.stats()["dropped"] == 1
+
+
+def test_background_task_flushes_full_batches():
+    """Test that the background task flushes as soon as a batch is full, without waiting for the interval."""
+    async def scenario():
+        db = InMemoryDatabase()
+        log = AuditLog(flush_interval=60, batch_size=2)
+        await log.start(db)
+        __reserve(log, "o1", "alice")
+        __reserve(log, "o1", "bob")
+        await asyncio.sleep(0.01)
+        assert log.stats()["written"] == 2
+
+        __reserve(log, "o1", "carol")
+        await log.stop(db)
+        assert log.stats()["written"] == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from src import constraints
+from src.repository import InMemoryDatabase
+
+
+def __schema(unique: bool = True) -> dict:
+    """Helper function to create a SIM schema document whose msisdn field may be unique."""
+    return {"_id": ObjectId(), "fields": {"msisdn": {"type": "str", "unique": unique}, "note": {"type": "str"}}}
+
+
+def __sim(schema: dict, **fields) -> dict:
+    """Helper function to create an object document of a schema, marked as the API would write it."""
+    document = {"schema_id": str(schema["_id"]), "fields": fields}
+    if constraints.unique_marker(schema):
+        document[constraints.UNIQUE_MARKER] = constraints.unique_marker(schema)
+    return document
+
+
+def test_unique_index_is_scoped_to_schema_and_present_values():
+    """Test that a unique field rejects a repeated value within its schema only, and allows objects without it."""
+    async def scenario():
+        db, schema, other = InMemoryDatabase(), __schema(), __schema()
+        await constraints.ensure_unique_indexes(db, constraints.unique_fields(schema))
+
+        await db.objects.insert_one(__sim(schema, msisdn="44123"))
+        await db.objects.insert_one(__sim(other, msisdn="44123"))
+        await db.objects.insert_one(__sim(__schema(unique=False), msisdn="44123"))
+        await db.objects.insert_many([__sim(schema, note="spare") for _ in range(2)])
+        with pytest.raises(DuplicateKeyError) as error:
+            await db.objects.insert_one(__sim(schema, msisdn="44123"))
+        assert constraints.duplicate_message(error.value.details) == "Duplicate value for unique field msisdn"
+
+    asyncio.run(scenario())
+
+
+def test_marking_objects_with_duplicates_is_undone():
+    """Test that a field can't be made unique while objects share a value of it, leaving the objects unmarked."""
+    async def scenario():
+        db, previous = InMemoryDatabase(), __schema(unique=False)
+        schema = {**__schema(), "_id": previous["_id"]}
+        await db.objects.insert_many([__sim(previous, msisdn="44123") for _ in range(2)])
+
+        with pytest.raises(constraints.ConstraintError, match="msisdn"):
+            await constraints.mark_objects(db, str(schema["_id"]), previous, schema)
+        assert await db.objects.count_documents({constraints.UNIQUE_MARKER: {"$exists": True}}) == 0
+
+    asyncio.run(scenario())
+
+
+def test_unmarked_objects_accept_repeated_values():
+    """Test that objects of a schema no longer declaring a field unique may share its values again."""
+    async def scenario():
+        db, previous = InMemoryDatabase(), __schema()
+        schema = {**__schema(unique=False), "_id": previous["_id"]}
+        await constraints.ensure_unique_indexes(db, constraints.unique_fields(previous))
+        await db.objects.insert_one(__sim(previous, msisdn="44123"))
+
+        await constraints.mark_objects(db, str(schema["_id"]), previous, schema)
+        await db.objects.insert_one(__sim(schema, msisdn="44123"))
+        assert await db.objects.count_documents({"fields.msisdn": "44123"}) == 2
+
+    asyncio.run(scenario())
+
+
+def test_indexes_are_shared_and_dropped_when_unused():
+    """Test that schemas declaring the same unique field share one index, dropped with the last of them."""
+    async def scenario():
+        db, first, second = InMemoryDatabase(), __schema(), __schema()
+        await constraints.ensure_unique_indexes(db, ["msisdn", "msisdn"])
+
+        await constraints.drop_unused_indexes(db, first, [second])
+        await db.objects.insert_one(__sim(second, msisdn="44123"))
+        with pytest.raises(DuplicateKeyError):
+            await db.objects.insert_one(__sim(second, msisdn="44123"))
+
+        await constraints.drop_unused_indexes(db, second, [])
+        await db.objects.insert_one(__sim(second, msisdn="44123"))
+        # Dropped already, e.g. by another worker
+        await constraints.drop_unused_indexes(db, second, [])
+
+    asyncio.run(scenario())
+
+
+def test_conflicting_field_from_message():
+    """Test that the field is found from the index name when the error has no key pattern."""
+    details = {"code": 11000, "errmsg": "E11000 duplicate key error collection: db.objects index: "
+                                        "unique_imsi dup key: { : \"6650\", : \"1\" }"}
+    assert constraints.conflicting_field(details) == "imsi"
+    assert constraints.duplicate_message({"code": 11000, "keyPattern": {"_id": 1}}) == "Duplicate key"
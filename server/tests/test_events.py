@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from src.events import EventBroker, ResumeTokenExpired
+
+
+def test_event_is_fanned_out_to_every_subscriber():
+    """Test that one published event is delivered to every subscriber."""
+    async def scenario():
+        broker = EventBroker()
+        first, second = broker.subscribe(), broker.subscribe()
+        broker.publish("created", "schema-1", "object-1", {"name": "a"})
+
+        for subscription in (first, second):
+            event = await subscription.next(timeout=1)
+            assert event["type"] == "created"
+            assert event["object_id"] == "object-1"
+            assert event["data"] == {"name": "a"}
+
+    asyncio.run(scenario())
+
+
+def test_subscription_filters_by_schema():
+    """Test that a subscription only receives events for the schemas it asked for."""
+    async def scenario():
+        broker = EventBroker()
+        subscription = broker.subscribe(["schema-2"])
+        broker.publish("created", "schema-1", "object-1")
+        broker.publish("created", "schema-2", "object-2")
+
+        event = await subscription.next(timeout=1)
+        assert event["object_id"] == "object-2"
+        assert await subscription.next(timeout=0.01) is None
+
+    asyncio.run(scenario())
+
+
+def test_resume_replays_missed_events():
+    """Test that subscribing with a resume token replays only the events published after it."""
+    async def scenario():
+        broker = EventBroker()
+        broker.unsubscribe(broker.subscribe())
+        first = broker.publish("created", "schema-1", "object-1")
+        broker.publish("updated", "schema-1", "object-1")
+        broker.publish("deleted", "schema-1", "object-1")
+
+        subscription = broker.subscribe(after=first["id"])
+        assert (await subscription.next(timeout=1))["type"] == "updated"
+        assert (await subscription.next(timeout=1))["type"] == "deleted"
+
+    asyncio.run(scenario())
+
+
+def test_resume_token_outside_history_is_rejected():
+    """Test that resuming from an event that has left the bounded history raises ResumeTokenExpired."""
+    broker = EventBroker(history_size=2)
+    broker.unsubscribe(broker.subscribe())
+    for i in range(5):
+        broker.publish("created", "schema-1", f"object-{i}")
+
+    with pytest.raises(ResumeTokenExpired):
+        broker.subscribe(after=f"{broker.epoch}-1")
+    with pytest.raises(ResumeTokenExpired):
+        broker.subscribe(after=f"{broker.epoch}-99")
+
+
+def test_resume_token_of_another_broker_is_rejected():
+    """Test that a token from another worker's broker expires even if its sequence number is in this history."""
+    broker, other = EventBroker(), EventBroker()
+    broker.unsubscribe(broker.subscribe())
+    for _ in range(3):
+        broker.publish("created", "schema-1", "object-1")
+
+    with pytest.raises(ResumeTokenExpired, match="another worker"):
+        broker.subscribe(after=f"{other.epoch}-1")
+    with pytest.raises(ResumeTokenExpired):
+        broker.subscribe(after="1")
+
+
+def test_events_are_not_kept_while_nobody_can_resume():
+    """Test that events published with no subscribers past the resume window are dropped, expiring older tokens."""
+    async def scenario():
+        broker = EventBroker(resume_window=0)
+        subscription = broker.subscribe()
+        last = broker.publish("created", "schema-1", "object-1")
+        broker.unsubscribe(subscription)
+        assert broker.publish("updated", "schema-1", "object-1") is None
+
+        with pytest.raises(ResumeTokenExpired):
+            broker.subscribe(after=last["id"])
+        resumed = broker.subscribe()
+        broker.publish("deleted", "schema-1", "object-1")
+        assert (await resumed.next(timeout=1))["type"] == "deleted"
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_is_dropped():
+    """Test that a subscriber whose buffer overflows is dropped after draining what it already buffered."""
+    async def scenario():
+        broker = EventBroker(buffer_size=2)
+        slow = broker.subscribe()
+        for i in range(3):
+            broker.publish("created", "schema-1", f"object-{i}")
+
+        assert slow.dropped
+        assert (await slow.next(timeout=1))["object_id"] == "object-0"
+        assert (await slow.next(timeout=1))["object_id"] == "object-1"
+        assert slow.finished
+        assert await slow.next(timeout=1) is None
+
+    asyncio.run(scenario())
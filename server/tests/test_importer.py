@@ -0,0 +1,183 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from bson import ObjectId
+
+from src import constraints, importer
+from src.importer import ImportPipeline, ImportRejected, RecordReader, coerce_value, validate_chunk
+from src.repository import InMemoryDatabase
+
+SCHEMA = {
+    "_id": ObjectId(),
+    "schema_name": "SIM",
+    "fields": {
+        "msisdn": {"type": "str", "required": True, "regex": r"44\d{9}"},
+        "use_count": {"type": "int", "required": True, "min": 0},
+        "active": {"type": "boolean", "required": False},
+    },
+}
+
+
+def __read(reader: RecordReader, pieces: list) -> list:
+    """Helper function to feed an upload to a reader in pieces, returning every row it yields."""
+    records = [record for piece in pieces for record in reader.feed(piece)]
+    return records + list(reader.feed(b"", final=True))
+
+
+def test_reader_rows_split_across_reads():
+    """Test that rows are reassembled however the upload is split, including inside multi-byte characters."""
+    data = "msisdn,note\r\n447000000001,\"multi\nline\"\n447000000002,café".encode()
+    whole = __read(RecordReader("csv"), [data])
+    assert whole == ["msisdn,note", '447000000001,"multi\nline"', "447000000002,café"]
+    assert __read(RecordReader("csv"), [data[i:i + 1] for i in range(len(data))]) == whole
+
+
+def test_coerce_value():
+    """Test that CSV cells are converted to their field's type."""
+    assert coerce_value({"type": "int"}, "42") == 42
+    assert coerce_value({"type": "float"}, "0.5") == 0.5
+    assert coerce_value({"type": "boolean"}, "Yes") is True
+    assert coerce_value({"type": "str", "enum": ["1", "2"]}, "1") == "1"
+    with pytest.raises(ValueError):
+        coerce_value({"type": "int"}, "many")
+
+
+def test_validate_chunk_reports_bad_rows():
+    """Test that a chunk is split into valid documents and rejected rows with reasons."""
+    header = ["msisdn", "use_count", "active"]
+    documents, errors = validate_chunk(SCHEMA, "csv", header, [
+        (1, "447000000001,3,true"),
+        (2, "447000000002,-1,"),
+        (3, "447000000003,x,"),
+        (4, "447000000004,1"),
+    ])
+    assert [(row, document["fields"]) for row, document in documents] == [
+        (1, {"msisdn": "447000000001", "use_count": 3, "active": True})
+    ]
+    assert documents[0][1]["schema_id"] == str(SCHEMA["_id"])
+    assert [row for row, _ in errors] == [2, 3, 4]
+
+
+def test_pipeline_streams_in_chunks_and_keeps_progress(monkeypatch):
+    """Test that an upload larger than one chunk is fully imported and its progress saved to the job document."""
+    monkeypatch.setattr(importer, "IMPORT_CHUNK_SIZE", 10)
+    monkeypatch.setattr(importer, "IMPORT_MAX_PENDING_CHUNKS", 2)
+
+    async def upload():
+        yield b"msisdn,use_count\n"
+        for i in range(95):
+            yield f"4470000{i:05d},{i if i % 10 else -1}\n".encode()
+
+    async def scenario():
+        db = InMemoryDatabase()
+        with ThreadPoolExecutor(2) as pool:
+            job = await ImportPipeline(db, SCHEMA, "csv", pool=pool).run(upload())
+        assert (job.status, job.rows, job.inserted, job.failed) == ("completed", 95, 85, 10)
+        assert [error.row for error in job.errors] == list(range(1, 96, 10))
+        assert await db.objects.count_documents({"schema_id": str(SCHEMA["_id"])}) == 85
+
+        stored = await db[importer.IMPORT_COLLECTION].find_one({"_id": job.id})
+        assert stored["status"] == "completed" and stored["inserted"] == 85
+
+    asyncio.run(scenario())
+
+
+def test_pipeline_rejects_unknown_columns():
+    """Test that a CSV header naming fields the schema doesn't have fails the import."""
+    async def upload():
+        yield b"msisdn,colour\n447000000001,red\n"
+
+    async def scenario():
+        db = InMemoryDatabase()
+        with pytest.raises(ImportRejected):
+            await ImportPipeline(db, SCHEMA, "csv", pool=ThreadPoolExecutor(1)).run(upload())
+        assert (await db[importer.IMPORT_COLLECTION].find_one({}))["status"] == "failed"
+
+    asyncio.run(scenario())
+
+
+def test_pipeline_reports_unique_conflicts_per_row():
+    """Test that rows repeating a unique field's value are rejected individually, naming the field."""
+    schema = {**SCHEMA, "_id": ObjectId(), "fields": {**SCHEMA["fields"], "msisdn": {"type": "str", "unique": True}}}
+
+    async def upload():
+        yield b"msisdn,use_count\n447000000001,1\n447000000002,2\n447000000001,3\n"
+
+    async def scenario():
+        db = InMemoryDatabase()
+        await constraints.ensure_unique_indexes(db, constraints.unique_fields(schema))
+        job = await ImportPipeline(db, schema, "csv", pool=ThreadPoolExecutor(1)).run(upload())
+        assert (job.inserted, job.failed) == (2, 1)
+        assert [(error.row, error.error) for error in job.errors] == [(3, "Duplicate value for unique field msisdn")]
+
+    asyncio.run(scenario())
+
+
+def test_reader_rejects_unterminated_quote(monkeypatch):
+    """Test that a quote left open fails the row once it outgrows the record limit, instead of buffering the upload."""
+    monkeypatch.setattr(importer, "IMPORT_MAX_RECORD_SIZE", 100)
+    reader = RecordReader("csv")
+    pieces = [b'msisdn,note\n447000000001,"open\n'] + [b"447000000002,closed\n"] * 10
+    with pytest.raises(ImportRejected, match="quote"):
+        __read(reader, pieces)
+
+
+def test_pipeline_publishes_created_events(monkeypatch):
+    """Test that imported objects are published on the event feed, like objects created through the API."""
+    events = []
+    monkeypatch.setattr(importer.broker, "publish", lambda *event: events.append(event))
+
+    async def upload():
+        yield b'{"msisdn": "447000000001", "use_count": 1}\n{"msisdn": "447000000002", "use_count": 2}\n'
+
+    async def scenario():
+        db = InMemoryDatabase()
+        await ImportPipeline(db, SCHEMA, "ndjson", pool=ThreadPoolExecutor(1)).run(upload())
+        stored = [obj async for obj in db.objects.find({})]
+        assert [(event[0], event[1], event[2]) for event in events] == \
+            [("created", str(SCHEMA["_id"]), obj["_id"]) for obj in stored]
+
+    asyncio.run(scenario())
+
+
+def test_start_imports_while_the_upload_arrives(monkeypatch):
+    """Test that rows are stored and progress saved while the upload is still arriving, and the rest after it."""
+    monkeypatch.setattr(importer, "IMPORT_CHUNK_SIZE", 10)
+    monkeypatch.setattr(importer, "IMPORT_PROGRESS_INTERVAL", 0)
+
+    async def scenario():
+        db = InMemoryDatabase()
+
+        async def stored() -> dict:
+            return await db[importer.IMPORT_COLLECTION].find_one({})
+
+        async def upload():
+            yield b"msisdn,use_count\n" + b"".join(f"4470000{i:05d},{i}\n".encode() for i in range(25))
+            for _ in range(200):
+                if (await stored())["inserted"] >= 10:
+                    break
+                await asyncio.sleep(0.01)
+            progress = await stored()
+            assert progress["status"] == "running" and progress["inserted"] >= 10 and progress["bytes_read"] > 0
+            yield b"447000000025,25\n"
+
+        await ImportPipeline(db, SCHEMA, "csv", pool=ThreadPoolExecutor(1)).start(upload())
+        await asyncio.gather(*importer._imports)
+        assert ((await stored())["status"], (await stored())["inserted"]) == ("completed", 26)
+
+    asyncio.run(scenario())
+
+
+def test_start_rejects_an_unknown_header():
+    """Test that a bad CSV header is reported by start, stopping the import."""
+    async def upload():
+        yield b"msisdn,colour\n447000000001,red\n"
+
+    async def scenario():
+        db = InMemoryDatabase()
+        with pytest.raises(ImportRejected):
+            await ImportPipeline(db, SCHEMA, "csv", pool=ThreadPoolExecutor(1)).start(upload())
+        assert (await db[importer.IMPORT_COLLECTION].find_one({}))["status"] == "failed"
+
+    asyncio.run(scenario())
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+import pytest
+from bson import ObjectId
+
+from src.invalidation import InvalidationChannel
+from src.schema_cache import SchemaCache
+from src.repository import InMemoryDatabase
+
+SERVER_DIR = Path(__file__).resolve().parents[1]
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017")
+
+
+def __schema_doc(_id: ObjectId, enum: list) -> dict:
+    """Helper function to create a schema document as stored in the database."""
+    return {
+        "_id": _id,
+        "schema_name": "SIM",
+        "fields": {"environment": {"type": "str", "required": True, "enum": enum}},
+    }
+
+
+def __worker(db) -> tuple:
+    """Helper function to create the channel and schema cache owned by one worker process."""
+    worker_channel = InvalidationChannel(poll_interval=0.01)
+    cache = SchemaCache()
+    worker_channel.subscribe("schema", cache.invalidate)
+    return worker_channel, cache
+
+
+def test_schema_change_is_seen_by_other_worker():
+    """Test that a schema published by one worker is evicted from another worker's cache on its next poll."""
+    async def scenario():
+        db = InMemoryDatabase()
+        schema_id = ObjectId()
+        await db["schemas"].insert_one(__schema_doc(schema_id, ["Dev_1"]))
+
+        channel_a, cache_a = __worker(db)
+        channel_b, cache_b = __worker(db)
+        await channel_b.poll_once(db)
+
+        stale = await cache_b.get(schema_id, db["schemas"])
+        assert stale.schema["fields"]["environment"]["enum"] == ["Dev_1"]
+
+        await db["schemas"].update_one({"_id": schema_id}, {"$set": {"fields.environment.enum": ["Dev_2"]}})
+        await channel_a.publish(db, "schema", str(schema_id))
+        await channel_b.poll_once(db)
+
+        fresh = await cache_b.get(schema_id, db["schemas"])
+        assert fresh.schema["fields"]["environment"]["enum"] == ["Dev_2"]
+
+    asyncio.run(scenario())
+
+
+def test_own_messages_are_not_dispatched_twice():
+    """Test that a worker applies its own messages once, at publish time, and not again when polling."""
+    async def scenario():
+        db = InMemoryDatabase()
+        worker_channel = InvalidationChannel()
+        received = []
+        worker_channel.subscribe("schema", received.append)
+
+        await worker_channel.poll_once(db)
+        await worker_channel.publish(db, "schema", "abc")
+        await worker_channel.poll_once(db)
+        await worker_channel.poll_once(db)
+        assert received == ["abc"]
+
+    asyncio.run(scenario())
+
+
+def __mongo_available() -> bool:
+    """Helper function to check whether a real MongoDB server is reachable."""
+    from pymongo import MongoClient
+    try:
+        MongoClient(MONGO_URI, serverSelectionTimeoutMS=300).admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+
+CHILD_WORKER = textwrap.dedent("""
+    import asyncio, sys
+    from bson import ObjectId
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from src.invalidation import InvalidationChannel
+    from src.repository import MongoDatabase
+
+    async def main():
+        db = MongoDatabase(AsyncIOMotorClient(sys.argv[1])[sys.argv[2]])
+        worker_channel = InvalidationChannel(poll_interval=0.05)
+        done = asyncio.Event()
+        worker_channel.subscribe("schema", lambda key: key == sys.argv[3] and done.set())
+        await worker_channel.start(db)
+        print("ready", flush=True)
+        await asyncio.wait_for(done.wait(), timeout=10)
+        print("invalidated", flush=True)
+        await worker_channel.stop()
+
+    asyncio.run(main())
+""")
+
+
+@pytest.mark.skipif(not __mongo_available(), reason="requires a running MongoDB server")
+def test_schema_change_is_seen_across_processes():
+    """Test that a schema change published in this process reaches a separate worker process in bounded time."""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from src.repository import MongoDatabase
+
+    db_name = f"invalidation-test-{ObjectId()}"
+    key = str(ObjectId())
+    child = subprocess.Popen(
+        [sys.executable, "-c", CHILD_WORKER, MONGO_URI, db_name, key],
+        cwd=SERVER_DIR, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        assert child.stdout.readline().strip() == "ready"
+
+        async def publish():
+            client = AsyncIOMotorClient(MONGO_URI)
+            await InvalidationChannel().publish(MongoDatabase(client[db_name]), "schema", key)
+            return time.monotonic()
+
+        published_at = asyncio.run(publish())
+        assert child.stdout.readline().strip() == "invalidated"
+        assert time.monotonic() - published_at < 2
+        assert child.wait(timeout=5) == 0
+    finally:
+        child.kill()
+        from pymongo import MongoClient
+        MongoClient(MONGO_URI).drop_database(db_name)
+
+
+def test_notifications_reach_other_workers_once():
+    """Test that repeated notifications are sent as one message on the next flush, and not dispatched locally."""
+    async def scenario():
+        db = InMemoryDatabase()
+        channel_a, channel_b = InvalidationChannel(), InvalidationChannel()
+        received_a, received_b = [], []
+        channel_a.subscribe("objects", received_a.append)
+        channel_b.subscribe("objects", received_b.append)
+        await channel_b.poll_once(db)
+
+        for _ in range(3):
+            channel_a.notify("objects", "abc")
+        await channel_a.flush(db)
+        await channel_a.flush(db)
+        await channel_b.poll_once(db)
+        assert (received_a, received_b) == ([], ["abc"])
+
+    asyncio.run(scenario())
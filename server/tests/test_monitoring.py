@@ -0,0 +1,75 @@
+import logging
+import threading
+from types import SimpleNamespace
+
+from src.metrics import Metrics, metrics
+from src.monitoring import CommandTimer, PoolTimer, command_shape, request_id
+
+
+def __event(command_name: str, command: dict = None, micros: int = 0) -> SimpleNamespace:
+    """Helper function to create a command event with the attributes the listener reads."""
+    return SimpleNamespace(command_name=command_name, command=command or {}, connection_id=("db", 27017),
+                           request_id=1, duration_micros=micros)
+
+
+def test_command_shape_redacts_values():
+    """Test that filter shapes keep field names and operators but no values."""
+    command = {"find": "objects", "filter": {"schema_id": "s", "fields.msisdn": {"$regex": "^44123"},
+                                             "$or": [{"reserved_by": None}, {"reserved_until": {"$lte": 1}}]}}
+    assert command_shape("find", command) == {"schema_id": "?", "fields.msisdn": {"$regex": "?"},
+                                              "$or": [{"reserved_by": "?"}, {"reserved_until": {"$lte": "?"}}]}
+    assert command_shape("update", {"update": "objects", "updates": [{"q": {"_id": 1}, "u": {"$set": {"a": 2}}}]}) \
+        == [{"_id": "?"}]
+    assert command_shape("insert", {"insert": "objects", "documents": [{"a": 1}]}) is None
+
+
+def test_command_timer_records_and_logs_slow_commands(caplog):
+    """Test that command latencies are recorded per collection and slow ones logged with the request id."""
+    metrics.reset()
+    timer = CommandTimer(slow_seconds=0.1)
+    token = request_id.set("req-1")
+    try:
+        timer.started(__event("find", {"find": "objects", "filter": {"fields.imsi": "234300000000000"}}))
+    finally:
+        request_id.reset(token)
+
+    with caplog.at_level(logging.WARNING, logger="src.monitoring"):
+        timer.succeeded(__event("find", micros=250000))
+    histogram = metrics.report()["histograms"]["db_command_seconds"][0]
+    assert histogram["labels"] == {"collection": "objects", "command": "find"}
+    assert histogram["count"] == 1
+    assert "req-1" in caplog.text and "fields.imsi" in caplog.text and "234300000000000" not in caplog.text
+
+    caplog.clear()
+    timer.started(__event("insert", {"insert": "objects"}))
+    timer.failed(__event("insert", micros=1000))
+    assert metrics.counter("db_command_failures", collection="objects", command="insert") == 1
+    assert caplog.text == ""
+
+
+def test_pool_timer_records_waits():
+    """Test that connection checkout waits are recorded."""
+    metrics.reset()
+    PoolTimer().connection_checked_out(SimpleNamespace(duration=0.002, address=("db", 27017)))
+    assert metrics.report()["histograms"]["db_pool_wait_seconds"][0]["count"] == 1
+
+
+def test_metrics_recorded_from_threads_while_reported():
+    """Test that listener threads can record metrics while they are reported, without errors or lost updates."""
+    registry = Metrics()
+
+    def record(thread: int):
+        for i in range(2000):
+            registry.observe("db_command_seconds", 0.001, command=f"find{thread}-{i % 50}")
+            registry.increment("db_command_failures", command="find")
+
+    threads = [threading.Thread(target=record, args=(thread,)) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        registry.report()
+    for thread in threads:
+        thread.join()
+
+    assert registry.counter("db_command_failures", command="find") == 8000
+    assert sum(entry["count"] for entry in registry.report()["histograms"]["db_command_seconds"]) == 8000
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from src.read_cache import ReadThroughCache
+
+
+def __counting_loader(calls: list, value, delay: float = 0):
+    """Helper function to create a loader that records each call and returns ``value``."""
+    async def load():
+        calls.append(value)
+        await asyncio.sleep(delay)
+        return value
+    return load
+
+
+def test_concurrent_misses_share_one_load():
+    """Test that concurrent misses for one key make a single loader call."""
+    async def scenario():
+        cache = ReadThroughCache("test", max_size=10, max_age=60)
+        calls = []
+        results = await asyncio.gather(*(cache.get("a", __counting_loader(calls, {"n": 1}, 0.01)) for _ in range(50)))
+        assert calls == [{"n": 1}]
+        assert all(result == {"n": 1} for result in results)
+        assert await cache.get("a", __counting_loader(calls, {"n": 2})) == {"n": 1}
+
+        stats = cache.stats()
+        assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 49, 1)
+
+    asyncio.run(scenario())
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Test that a full cache evicts the entry read least recently."""
+    async def scenario():
+        cache = ReadThroughCache("test", max_size=2, max_age=60)
+        calls = []
+        await cache.get("a", __counting_loader(calls, "a"))
+        await cache.get("b", __counting_loader(calls, "b"))
+        await cache.get("a", __counting_loader(calls, "a"))
+        await cache.get("c", __counting_loader(calls, "c"))
+
+        assert cache.peek("a") == "a"
+        assert cache.peek("b") is None
+        assert cache.stats()["evictions"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_invalidation_during_load_discards_result():
+    """Test that a value loaded before a concurrent write is not cached once the write invalidates it."""
+    async def scenario():
+        cache = ReadThroughCache("test", max_size=10, max_age=60)
+        calls = []
+        load = asyncio.ensure_future(cache.get("a", __counting_loader(calls, "stale", 0.01)))
+        await asyncio.sleep(0)
+        cache.invalidate("a")
+        assert await load == "stale"
+
+        assert await cache.get("a", __counting_loader(calls, "fresh")) == "fresh"
+        assert calls == ["stale", "fresh"]
+
+    asyncio.run(scenario())
+
+
+def test_failed_and_missing_loads_are_not_cached():
+    """Test that loader errors reach every waiter and neither errors nor None are cached."""
+    async def scenario():
+        cache = ReadThroughCache("test", max_size=10, max_age=60)
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("database down")
+
+        results = await asyncio.gather(cache.get("a", fail), cache.get("a", fail), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert await cache.get("a", __counting_loader([], None)) is None
+        assert await cache.get("a", __counting_loader([], "a")) == "a"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_shared_load():
+    """Test that a caller giving up leaves the load running for the other callers."""
+    async def scenario():
+        cache = ReadThroughCache("test", max_size=10, max_age=60)
+        calls = []
+        first = asyncio.ensure_future(cache.get("a", __counting_loader(calls, "a", 0.01)))
+        second = asyncio.ensure_future(cache.get("a", __counting_loader(calls, "a", 0.01)))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "a"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert calls == ["a"]
+
+    asyncio.run(scenario())
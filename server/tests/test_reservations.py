@@ -0,0 +1,143 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from src import reservations
+from src.repository import InMemoryDatabase
+
+
+@pytest.fixture(autouse=True)
+def slow_polls(monkeypatch):
+    """Fixture making the waitlist rely on release events, not its periodic retries."""
+    monkeypatch.setattr(reservations.waitlist, "poll_interval", 10)
+
+
+async def __setup(environments: list) -> tuple:
+    """Helper function to create a SIM schema with one object per environment, all reserved by "owner"."""
+    db = InMemoryDatabase()
+    schema_id = (await db.schemas.insert_one({
+        "schema_name": "SIM", "fields": {"environment": {"type": "str"}}, "updated_at": datetime.now()
+    })).inserted_id
+    ids = []
+    for environment in environments:
+        result = await db.objects.insert_one({"schema_id": str(schema_id), "fields": {"environment": environment},
+                                              "reserved_by": "owner"})
+        ids.append(str(result.inserted_id))
+    return db, schema_id, ids
+
+
+def __allocate(db, schema_id, holder: str, environment: str = "Dev_1", wait: float = 2) -> asyncio.Task:
+    """Helper function to start a waiting allocation in the background."""
+    return asyncio.create_task(reservations.allocate(db, schema_id, holder, {"environment": environment}, wait=wait))
+
+
+def test_released_objects_go_to_waiters_in_order():
+    """Test that each release hands one object to the longest-waiting allocation."""
+    async def scenario():
+        db, schema_id, ids = await __setup(["Dev_1", "Dev_1"])
+        waiters = [__allocate(db, schema_id, f"rig-{i}") for i in range(3)]
+        await asyncio.sleep(0.01)
+        assert reservations.waitlist.waiting() == 3
+
+        await reservations.release(db, ids[1], "owner")
+        assert (await waiters[0])["_id"] == ObjectId(ids[1])
+        await reservations.release(db, ids[0], "owner")
+        assert (await waiters[1])["_id"] == ObjectId(ids[0])
+        assert not waiters[2].done()
+
+        waiters[2].cancel()
+        await asyncio.gather(waiters[2], return_exceptions=True)
+        assert reservations.waitlist.waiting() == 0
+
+    asyncio.run(scenario())
+
+
+def test_release_wakes_only_matching_waiters():
+    """Test that a released object goes to a waiter whose filter it matches, even one that arrived later."""
+    async def scenario():
+        db, schema_id, ids = await __setup(["Dev_1", "Dev_2"])
+        dev_2 = __allocate(db, schema_id, "rig-1", "Dev_2")
+        dev_1 = __allocate(db, schema_id, "rig-2", "Dev_1")
+        await asyncio.sleep(0.01)
+
+        await reservations.release(db, ids[0], "owner")
+        assert (await dev_1)["reserved_by"] == "rig-2"
+        assert not dev_2.done()
+        dev_2.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_wait_times_out():
+    """Test that a waiting allocation fails with 409 once its wait is over, leaving the waitlist empty."""
+    async def scenario():
+        db, schema_id, _ = await __setup(["Dev_1"])
+        with pytest.raises(reservations.ReservationError) as error:
+            await __allocate(db, schema_id, "rig-1", wait=0.05)
+        assert error.value.status_code == 409
+        assert reservations.waitlist.waiting() == 0
+
+    asyncio.run(scenario())
+
+
+def test_expired_lease_is_noticed_by_polling(monkeypatch):
+    """Test that a lease running out, which publishes no event, is picked up by the waiting allocation's retry."""
+    async def scenario():
+        monkeypatch.setattr(reservations.waitlist, "poll_interval", 0.02)
+        db, schema_id, ids = await __setup(["Dev_1"])
+        await db.objects.update_one({"_id": ObjectId(ids[0])},
+                                    {"$set": {"reserved_until": datetime.now() + timedelta(seconds=0.1)}})
+        obj = await __allocate(db, schema_id, "rig-1")
+        assert obj["reserved_by"] == "rig-1"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_allocation_gives_object_back():
+    """Test that an allocation cancelled while taking its object releases it and passes the wakeup on."""
+    async def scenario():
+        db, schema_id, ids = await __setup(["Dev_1"])
+        objects = db.objects
+        find_one_and_update = objects.find_one_and_update
+
+        async def slow_find_one_and_update(*args, **kwargs):
+            await asyncio.sleep(0.05)
+            return await find_one_and_update(*args, **kwargs)
+
+        first = __allocate(db, schema_id, "rig-1")
+        await asyncio.sleep(0.1)
+        second = __allocate(db, schema_id, "rig-2")
+        await asyncio.sleep(0.01)
+        objects.find_one_and_update = slow_find_one_and_update
+        await reservations.release(db, ids[0], "owner")
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        obj = await second
+        assert obj["reserved_by"] == "rig-2"
+        assert reservations.waitlist.waiting() == 0
+
+    asyncio.run(scenario())
+
+
+def test_wakeup_as_the_wait_times_out(monkeypatch):
+    """Test that a waiter woken in the same step its wait times out takes the object, leaving no queue behind."""
+    async def scenario():
+        db, schema_id, ids = await __setup(["Dev_1"])
+        wait_for = asyncio.wait_for
+
+        async def woken_as_it_times_out(awaitable, timeout):
+            monkeypatch.setattr(asyncio, "wait_for", wait_for)
+            awaitable.close()
+            await db.objects.update_one({"_id": ObjectId(ids[0])}, {"$set": {"reserved_by": None}})
+            reservations.waitlist.notify(str(schema_id), await db.objects.find_one({"_id": ObjectId(ids[0])}))
+            raise asyncio.TimeoutError
+
+        monkeypatch.setattr(asyncio, "wait_for", woken_as_it_times_out)
+        obj = await __allocate(db, schema_id, "rig-1")
+        assert obj["reserved_by"] == "rig-1"
+        assert reservations.waitlist._queues == {}
+
+    asyncio.run(scenario())
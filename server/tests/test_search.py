@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from src import search
+from src.repository import InMemoryDatabase
+
+
+def __schema(searchable: bool = True) -> dict:
+    """Helper function to create a SIM schema document with a searchable msisdn field."""
+    return {"_id": ObjectId(), "fields": {"msisdn": {"type": "str", "searchable": searchable}, "use_count": {"type": "int"}}}
+
+
+async def __load(db, schema: dict, msisdns: list) -> list:
+    """Helper function to store SIMs with the given MSISDNs and index them, returning their documents."""
+    objects = [{"schema_id": str(schema["_id"]), "fields": {"msisdn": msisdn}} for msisdn in msisdns]
+    await db.objects.insert_many(objects)
+    await search.index_objects(db, schema, objects)
+    return objects
+
+
+def test_ngrams():
+    """Test that n-grams are the lower-cased substrings of the configured size."""
+    assert search.ngrams("AbcD", 3) == {"abc", "bcd"}
+    assert search.ngrams("ab", 3) == set()
+
+
+def test_substring_search_checks_candidates():
+    """Test that a substring search only returns objects containing the term, not just all of its n-grams."""
+    async def scenario():
+        db, schema = InMemoryDatabase(), __schema()
+        await search.ensure_indexes(db, schema)
+        # The second SIM has both n-grams of "1234", but apart
+        await __load(db, schema, ["44123456789", "44912399234", "44999123999"])
+
+        found, cursor = await search.search(db, schema, "msisdn", contains="1234")
+        assert [obj["fields"]["msisdn"] for obj in found] == ["44123456789"]
+        assert cursor is None
+
+    asyncio.run(scenario())
+
+
+def test_search_pages():
+    """Test that prefix and substring searches return every match once across pages."""
+    async def scenario():
+        db, schema = InMemoryDatabase(), __schema()
+        msisdns = [f"44{i:09d}" for i in range(25)]
+        await __load(db, schema, list(reversed(msisdns)))
+
+        for kind, term, expected in (("prefix", "4400000001", msisdns[10:20]),
+                                     ("contains", "0000001", msisdns[1:2] + msisdns[10:20])):
+            found, cursor = [], None
+            while True:
+                page, cursor = await search.search(db, schema, "msisdn", limit=4, cursor=cursor, **{kind: term})
+                found.extend(obj["fields"]["msisdn"] for obj in page)
+                if cursor is None:
+                    break
+            assert sorted(found) == expected
+        # Prefix results come in field order
+        page, _ = await search.search(db, schema, "msisdn", prefix="440000000", limit=3)
+        assert [obj["fields"]["msisdn"] for obj in page] == msisdns[:3]
+
+    asyncio.run(scenario())
+
+
+def test_index_follows_writes():
+    """Test that re-indexing after an update replaces an object's n-grams and unindexing removes them."""
+    async def scenario():
+        db, schema = InMemoryDatabase(), __schema()
+        obj, = await __load(db, schema, ["44123456789"])
+        obj["fields"]["msisdn"] = "44987654321"
+        await search.index_objects(db, schema, [obj])
+        assert await db[search.SEARCH_COLLECTION].count_documents({"grams": "msisdn:123"}) == 0
+        assert await db[search.SEARCH_COLLECTION].count_documents({"grams": "msisdn:987"}) == 1
+
+        await search.unindex_objects(db, schema, [obj["_id"]])
+        assert await db[search.SEARCH_COLLECTION].count_documents({}) == 0
+
+    asyncio.run(scenario())
+
+
+def test_rebuild_indexes_existing_objects():
+    """Test that making a field searchable indexes the objects written before."""
+    async def scenario():
+        db, schema = InMemoryDatabase(), __schema(searchable=False)
+        await __load(db, schema, ["44123456789", "44555555555"])
+        assert await db[search.SEARCH_COLLECTION].count_documents({}) == 0
+
+        schema["fields"]["msisdn"]["searchable"] = True
+        await search.rebuild(db, schema)
+        found, _ = await search.search(db, schema, "msisdn", contains="555")
+        assert [obj["fields"]["msisdn"] for obj in found] == ["44555555555"]
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("name, terms, message", [
+    ("use_count", {"prefix": "1"}, "not a string field"),
+    ("msisdn", {}, "either prefix or contains"),
+    ("msisdn", {"contains": "12"}, "at least 3 characters"),
+    ("msisdn", {"prefix": "44", "cursor": "nonsense"}, "Invalid search cursor"),
+])
+def test_invalid_searches(name, terms, message):
+    """Test that searches the index can't answer are rejected."""
+    async def scenario():
+        with pytest.raises(search.SearchError, match=message):
+            await search.search(InMemoryDatabase(), __schema(), name, **terms)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("terms", [{"contains": "123"}, {"prefix": "44"}])
+def test_search_needs_searchable_field(terms):
+    """Test that searches are refused on fields that aren't declared searchable, rather than scanning objects."""
+    async def scenario():
+        with pytest.raises(search.SearchError, match="not searchable"):
+            await search.search(InMemoryDatabase(), __schema(searchable=False), "msisdn", **terms)
+
+    asyncio.run(scenario())
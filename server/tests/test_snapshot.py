@@ -0,0 +1,160 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from src import snapshot as snapshot_module
+from src.schema_cache import SchemaCache
+from src.snapshot import SchemaSnapshot, SnapshotManager
+from src.repository import InMemoryDatabase
+
+FIELDS = {
+    "msisdn": {"type": "str", "regex": r"44\d{9}"},
+    "environment": {"type": "str", "enum": ["Dev_1", "Dev_2", "Production"]},
+    "use_count": {"type": "int", "min": 0},
+    "active": {"type": "boolean"},
+}
+
+
+def __sim(environment: str, use_count: int, reserved_by: str = None, **extra) -> dict:
+    """Helper function to create a SIM object document as stored in the database."""
+    return {
+        "_id": ObjectId(),
+        "fields": {"msisdn": "44123456789", "environment": environment, "use_count": use_count, "active": True},
+        "reserved_by": reserved_by,
+        **extra
+    }
+
+
+def test_count_with_filters():
+    """Test that enum, numeric and availability filters are combined into one count."""
+    snapshot = SchemaSnapshot("schema-1", FIELDS)
+    for i in range(10):
+        snapshot.apply(__sim("Dev_1" if i % 2 else "Dev_2", i * 20, reserved_by="rig" if i < 2 else None))
+
+    assert snapshot.count({}) == 10
+    assert snapshot.count({"environment": "Dev_1"}) == 5
+    assert snapshot.count({"environment": "Dev_1", "use_count": {"$lt": 100}}) == 2
+    assert snapshot.count({"environment": "Dev_1", "use_count": {"$lt": 100}}, available=True) == 1
+    assert snapshot.count({"environment": {"$in": ["Dev_2", "Production"]}}, available=False) == 1
+    assert snapshot.count({"environment": "Staging"}) == 0
+    assert snapshot.count({"active": True, "use_count": {"$gte": 100, "$ne": 120}}) == 4
+
+
+def test_expired_lease_counts_as_available():
+    """Test that an object whose lease has run out is counted as free."""
+    snapshot = SchemaSnapshot("schema-1", FIELDS)
+    snapshot.apply(__sim("Dev_1", 0, reserved_by="rig", reserved_until=datetime.now() - timedelta(seconds=1)))
+    snapshot.apply(__sim("Dev_1", 0, reserved_by="rig", reserved_until=datetime.now() + timedelta(hours=1)))
+    assert snapshot.count({}, available=True) == 1
+
+
+def test_unsupported_filter_falls_back():
+    """Test that filters on fields or operators the snapshot does not hold return None."""
+    snapshot = SchemaSnapshot("schema-1", FIELDS)
+    snapshot.apply(__sim("Dev_1", 0))
+    assert snapshot.count({"msisdn": "44123456789"}) is None
+    assert snapshot.count({"use_count": {"$lt": "ten"}}) is None
+
+
+def test_updates_deletes_and_growth():
+    """Test that overwriting, removing and growing past the initial capacity keep counts correct."""
+    snapshot = SchemaSnapshot("schema-1", FIELDS)
+    objects = [__sim("Dev_1", i) for i in range(3000)]
+    for obj in objects:
+        snapshot.apply(obj)
+    for obj in objects[:1000]:
+        snapshot.remove(obj["_id"])
+    snapshot.apply({**objects[1500], "fields": {**objects[1500]["fields"], "environment": "Production"}})
+
+    assert len(snapshot) == 2000
+    assert snapshot.count({"environment": "Production"}) == 1
+    assert snapshot.count({"use_count": {"$lt": 1000}}) == 0
+    assert snapshot.stats()["bytes_per_object"] > 0
+
+
+def test_manager_builds_and_follows_writes():
+    """Test that a built snapshot is returned while fresh and follows write events, going stale on bulk writes."""
+    async def scenario():
+        db = InMemoryDatabase()
+        schema = {"_id": ObjectId(), "schema_name": "SIM", "fields": FIELDS, "snapshot": True}
+        schema_id = str(schema["_id"])
+        await db["objects"].insert_one({**__sim("Dev_1", 1), "schema_id": schema_id})
+
+        manager = SnapshotManager()
+        assert manager.get(schema, db["objects"]) is None
+        await asyncio.sleep(0.01)
+        snapshot = manager.get(schema, db["objects"])
+        assert snapshot.count({}) == 1
+
+        created = __sim("Dev_2", 5)
+        manager.on_event("created", schema_id, created["_id"], created)
+        assert snapshot.count({"environment": "Dev_2"}) == 1
+        manager.on_event("deleted", schema_id, created["_id"], None)
+        assert snapshot.count({"environment": "Dev_2"}) == 0
+
+        manager.on_event("updated", schema_id, ObjectId(), None)
+        assert manager.get(schema, db["objects"]) is None
+        assert manager.get({**schema, "snapshot": False}, db["objects"]) is None
+
+    asyncio.run(scenario())
+
+
+def test_writes_of_other_workers_make_snapshots_stale(monkeypatch):
+    """Test that writes of snapshot schemas are announced to other workers, whose snapshots then go stale."""
+    notified = []
+    monkeypatch.setattr(snapshot_module.channel, "notify", lambda kind, key: notified.append((kind, key)))
+    cache = SchemaCache()
+    monkeypatch.setattr(snapshot_module, "schema_cache", cache)
+
+    async def scenario():
+        db = InMemoryDatabase()
+        schema = {"_id": ObjectId(), "schema_name": "SIM", "fields": FIELDS, "snapshot": True}
+        plain = {**schema, "_id": ObjectId(), "snapshot": False}
+        schema_id = str(schema["_id"])
+        cache.put(schema)
+        cache.put(plain)
+        writer, reader = SnapshotManager(), SnapshotManager()
+        await reader.build(schema, db["objects"])
+
+        created = {**__sim("Dev_1", 1), "schema_id": schema_id}
+        await db["objects"].insert_one(created)
+        writer.on_event("created", schema_id, created["_id"], created)
+        writer.on_event("created", str(plain["_id"]), ObjectId(), created)
+        assert notified == [("objects", schema_id)]
+
+        assert reader.get(schema, db["objects"]).count({}) == 0
+        reader.mark_stale(schema_id)
+        assert reader.get(schema, db["objects"]) is None
+        await asyncio.sleep(0.01)
+        assert reader.get(schema, db["objects"]).count({}) == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_build_is_retried(caplog):
+    """Test that a background build that fails is logged, answered from the database, and retried on the next use."""
+    class FailingOnce:
+        def __init__(self, collection):
+            self.collection, self.calls = collection, 0
+
+        def find(self, *args, **kwargs):
+            self.calls += 1
+            if self.calls == 1:
+                raise ConnectionError("database unavailable")
+            return self.collection.find(*args, **kwargs)
+
+    async def scenario():
+        db = InMemoryDatabase()
+        schema = {"_id": ObjectId(), "schema_name": "SIM", "fields": FIELDS, "snapshot": True}
+        await db["objects"].insert_one({**__sim("Dev_1", 1), "schema_id": str(schema["_id"])})
+        collection, manager = FailingOnce(db["objects"]), SnapshotManager()
+
+        assert manager.get(schema, collection) is None
+        await asyncio.sleep(0.01)
+        assert "answered from the database" in caplog.text
+        assert manager.get(schema, collection) is None
+        await asyncio.sleep(0.01)
+        assert manager.get(schema, collection).count({}) == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from src import validation
+from src.metrics import metrics
+from src.schema_cache import SchemaCache
+from src.validation import ValidationFailed, validate_fields, validation_mode
+
+FIELDS = {"msisdn": {"type": "str", "required": True, "regex": r"44\d{9}"}, "use_count": {"type": "int"}}
+
+
+def __schema(mode=None) -> dict:
+    """Helper function to create a schema document, optionally with a validation mode."""
+    schema = {"_id": ObjectId(), "schema_name": "SIM", "fields": FIELDS}
+    if mode is not None:
+        schema["validation"] = mode
+    return schema
+
+
+def test_validation_mode(monkeypatch):
+    """Test that a schema's setting wins and otherwise only payloads over the threshold are offloaded."""
+    monkeypatch.setattr(validation, "VALIDATION_OFFLOAD_BYTES", 100)
+    monkeypatch.setattr(validation, "VALIDATION_OFFLOAD_MODE", "process")
+    assert validation_mode(__schema(), 100) == "inline"
+    assert validation_mode(__schema(), 101) == "process"
+    assert validation_mode(__schema("inline"), 10 ** 6) == "inline"
+    assert validation_mode(__schema("thread"), 0) == "thread"
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+def test_validate_fields_in_every_mode(mode):
+    """Test that valid fields pass, invalid ones fail with the model's message, and the time is recorded per mode."""
+    async def scenario():
+        cached = SchemaCache().put(__schema(mode))
+        before = sum(entry["count"] for entry in metrics.report()["histograms"].get("validation_seconds", [])
+                     if entry["labels"] == {"mode": mode})
+
+        await validate_fields(cached, {"msisdn": "44123456789", "use_count": 1})
+        await validate_fields(cached, {"use_count": 2}, partial=True)
+        with pytest.raises(ValidationFailed, match="msisdn"):
+            await validate_fields(cached, {"msisdn": "07123", "use_count": 1})
+
+        after = sum(entry["count"] for entry in metrics.report()["histograms"]["validation_seconds"]
+                    if entry["labels"] == {"mode": mode})
+        assert after - before == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+from bson import ObjectId
+
+from src.schema_cache import SchemaCache
+from src import warmup
+from src.repository import InMemoryDatabase
+
+
+def test_warm_up_compiles_every_schema(monkeypatch):
+    """Test that warm-up compiles a model for every stored schema, caching it on the event loop, and marks the worker ready."""
+    async def scenario():
+        db = InMemoryDatabase()
+        ids = [ObjectId(), ObjectId()]
+        for i, _id in enumerate(ids):
+            await db["schemas"].insert_one({"_id": _id, "schema_name": f"S{i}", "fields": {"n": {"type": "int"}}})
+
+        cache = SchemaCache()
+        threads = []
+        store = cache.store
+        monkeypatch.setattr(cache, "store", lambda entry: threads.append(threading.current_thread()) or store(entry))
+        monkeypatch.setattr(warmup, "schema_cache", cache)
+        monkeypatch.setattr(warmup, "readiness", warmup.Readiness())
+        assert warmup.readiness.report()["status"] == "warming_up"
+
+        await warmup.run_warm_up(db)
+
+        assert warmup.readiness.ready
+        assert warmup.readiness.report()["schemas"] == 2
+        assert threads == [threading.current_thread()] * 2
+        for _id in ids:
+            # A database that no longer has the schema proves the entry is served from the cache
+            entry = await cache.get(_id, InMemoryDatabase()["schemas"])
+            assert entry.model(n=1).n == 1
+
+    asyncio.run(scenario())